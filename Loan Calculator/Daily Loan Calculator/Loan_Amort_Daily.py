@@ -1,21 +1,134 @@
+import time
+rerun_started = time.perf_counter()
+
+import os
 import streamlit as st
-import pandas as pd
+from contextlib import ExitStack
+from dataclasses import replace
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import io
 
-# ───────────────────────────────────────────────────────────────
-# PMT FUNCTION
-# ───────────────────────────────────────────────────────────────
-def calculate_pmt(annual_rate, nper, pv, fv=0):
-    """Calculate payment for annuity with optional future value (residual)."""
-    if annual_rate == 0:
-        return -(pv + fv) / nper
-    r = annual_rate / 12
-    z = (1 + r) ** nper
-    pmt = -r * (pv * z + fv) / (z - 1)
-    return round(pmt, 2)
+from amortisation import (
+    Deal, DealError, REPAYMENT_STRUCTURES, RATE_STRUCTURES, DRAWDOWN_STRUCTURES, FEE_TYPES, DAY_COUNTS, ROUNDING_MODES,
+    compile_deal, deal_key, fee_amount as resolve_fee,
+    suggested_payment as compute_suggested_payment,
+)
+from compare import COMPARISON_COLUMNS, DIFF_MEASURES, compare_variants, comparison_rows, default_variants, period_diff
+from deal_store import DealStore
+from export import EXPORT_FORMATS, comparison_bytes, export_bytes, export_filename, table_bytes
+from goal_seek import solve_payment
+from instrumentation import collect, phase, record_span, start_phase, summarise_phases
+from schedule_cache import get_or_compute, session_artifact, session_cache
+from schedule_view import render_schedule
+from montecarlo import PERCENTILES as MC_PERCENTILES, simulate
+from payment_calendar import BUSINESS_DAY_CONVENTIONS, HOLIDAY_CALENDARS, MONTH_END_RULES, add_months
+from sensitivity import GRID_COLUMNS, GRID_METRICS, grid_pivot, sensitivity_grid
+from settlement import SETTLEMENT_COLUMNS, settlement_quotes
+
+# Phase timings for this rerun, shown at the bottom of the sidebar when its checkbox is ticked.
+# Imports are only slow on a server's first render; pandas and openpyxl wait for a schedule or export.
+perf = ExitStack()
+timings = perf.enter_context(collect(memory=True)) if st.session_state.get("debug_perf") else None
+record_span("imports", time.perf_counter() - rerun_started)
+
+
+def stop_page():
+    """``st.stop()`` that first closes this rerun's timing collector (and tracemalloc with it)."""
+    perf.close()
+    st.stop()
+
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+LOGO_FILES = ["fedgroup_logo.svg", "fedgroup_logo.png"]  # the brand artwork, whichever format is bundled
+
+
+@st.cache_resource
+def load_logo(directory=ASSETS_DIR):
+    """The bundled logo (SVG markup or PNG bytes), read from disk once per server process; ``None`` if absent."""
+    for name in LOGO_FILES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            return data.decode("utf-8") if name.endswith(".svg") else data
+    return None
+
+
+@st.cache_resource
+def open_store():
+    """The saved-deal store (``deal_store``), shared by every session on this server."""
+    return DealStore()
+
 
+def widget_state(deal, page_inputs=None):
+    """Session-state values that put every input widget back to ``deal``.
+
+    ``page_inputs`` (saved with the deal) restore the prime / margin split and
+    fee percentages exactly; without them they are worked back from the deal.
+    """
+    state = {
+        "client_name": deal.client_name, "facility_name": deal.facility_name,
+        "facility_amount": float(deal.facility_amount), "residual": float(deal.residual),
+        "repayment_structure": deal.repayment_structure, "term_months": int(deal.term_months),
+        "capitalise_fees": deal.capitalise_fees, "drawdown_structure": deal.drawdown_structure,
+        "month_end": deal.month_end,
+        "business_day": deal.business_day, "rate_structure": deal.rate_structure,
+        "day_count": deal.day_count, "rounding": deal.rounding,
+        "use_custom_capital": bool(deal.custom_capital_schedule),
+        "override": False, "goal_seek": False,
+    }
+    if deal.business_day != "Unadjusted":
+        state["holidays"] = deal.holidays
+    if deal.capitalise_fees and deal.custom_fees:
+        state["num_fees"] = len(deal.custom_fees)
+        for i, fee in enumerate(deal.custom_fees):
+            state.update({f"fee_name_{i}": fee['name'], f"fee_type_{i}": fee['type']})
+            if fee['type'] == "Nominal Amount":
+                state[f"fee_amount_{i}"] = float(fee['amount'])
+            else:
+                state[f"fee_pct_{i}"] = fee['amount'] / deal.facility_amount * 100
+    if deal.drawdown_structure == "Single Drawdown":
+        state.update({"drawdown_date": deal.drawdown_date or deal.first_payment_date,
+                      "first_payment_date": deal.first_payment_date})
+    else:
+        state["num_drawdowns"] = len(deal.drawdown_schedule)
+        for i, dd in enumerate(deal.drawdown_schedule):
+            state.update({f"dd_date_{i}": dd['date'], f"dd_amount_{i}": float(dd['amount'])})
+        state[f"first_payment_date:{min(dd['date'] for dd in deal.drawdown_schedule)}"] = deal.first_payment_date
+    if deal.rate_structure == "Fixed Rate":
+        # Keep the default margin where prime + margin gives back exactly the saved rate
+        margin = 2.0 if (deal.interest_rate - 2.0) + 2.0 == deal.interest_rate else 0.0
+        state.update({"prime_rate": deal.interest_rate - margin, "delta_margin": margin})
+    else:
+        state["num_rate_periods"] = len(deal.rate_schedule)
+        for i, rp in enumerate(deal.rate_schedule):
+            state.update({f"from_{i}": int(rp['from_period']), f"to_{i}": int(rp['to_period']),
+                          f"prime_{i}": float(rp['prime']), f"margin_{i}": float(rp['margin'])})
+    if deal.custom_capital_schedule:
+        state["num_custom_payments"] = len(deal.custom_capital_schedule)
+        for i, cc in enumerate(deal.custom_capital_schedule):
+            state.update({f"custom_date_{i}": cc['date'], f"custom_amount_{i}": float(cc['amount'])})
+    if deal.repayment_structure == "Capitalised Interest":
+        state["capitalisation_months"] = int(deal.capitalisation_months)
+    if deal.structured_payments:
+        state["num_payment_periods"] = len(deal.structured_payments)
+        for i, sp in enumerate(deal.structured_payments):
+            state.update({f"pay_from_{i}": int(sp['from_period']), f"pay_to_{i}": int(sp['to_period']),
+                          f"payment_{i}": float(sp['payment'])})
+    state.update(page_inputs or {})
+    suggested = compute_suggested_payment(deal)
+    if deal.repayment_structure != "Structured Capital" and deal.monthly_payment not in (None, suggested):
+        state.update({"override": True, f"monthly_payment:{suggested}": float(deal.monthly_payment)})
+    return state
+
+
+def open_saved_deal():
+    """Button callback: load the selected saved deal into the inputs and show its schedule."""
+    key = st.session_state.saved_deal
+    store = open_store()
+    deal = store.load_deal(key)
+    if deal is not None:
+        st.session_state.update(widget_state(deal, store.load_page_inputs(key)))
+        st.session_state.result_key = key
 
 # ───────────────────────────────────────────────────────────────
 # STREAMLIT CONFIG
@@ -56,10 +169,9 @@ st.markdown("""
 # Header
 logo_col, title_col = st.columns([1, 5])
 with logo_col:
-    st.image(
-        "https://www.fedgroup.co.za/wp-content/uploads/2023/05/FEDGROUP-Logo.png",
-        width=180
-    )
+    logo = load_logo()
+    if logo is not None:
+        st.image(logo, width=180)
 with title_col:
     st.markdown('<h1 class="fed-title">Shpitz Loan Generator</h1>', unsafe_allow_html=True)
     st.markdown('<p class="fed-subtitle">Powered by <span class="fed-accent">FEDGROUP</span></p>', unsafe_allow_html=True)
@@ -70,37 +182,56 @@ st.markdown("<hr>", unsafe_allow_html=True)
 if 'df' not in st.session_state:
     st.session_state.df = None
 
+st.sidebar.checkbox("Performance debug panel", key="debug_perf")
+
+# Saved deals: reopening one restores every input and reads its schedule back from the store
+with st.sidebar:
+    st.subheader("Saved Deals")
+    saved = {row["deal_key"]: row for row in open_store().find(limit=200)}
+    if saved:
+        st.selectbox(
+            "Deal", list(saved), key="saved_deal",
+            format_func=lambda k: f"{saved[k]['client_name']} – {saved[k]['facility_name']} ({saved[k]['saved_at'][:10]}, {k[:8]})"
+        )
+        st.button("Open saved deal", on_click=open_saved_deal)
+    else:
+        st.caption("Deals you save appear here.")
+
 # ───────────────────────────────────────────────────────────────
 # INPUT SECTIONS
 # ───────────────────────────────────────────────────────────────
+inputs_timer = start_phase("inputs")
 
 st.header("Deal Information")
 col_client, col_fac = st.columns(2)
 with col_client:
-    client_name = st.text_input("Client Name", value="Client XYZ")
+    client_name = st.text_input("Client Name", value="Client XYZ", key="client_name")
 with col_fac:
-    facility_name = st.text_input("Facility / Deal Name", value="Development Facility A")
+    facility_name = st.text_input("Facility / Deal Name", value="Development Facility A", key="facility_name")
 
 st.header("Loan Parameters")
 col1, col2 = st.columns([1, 1])
 with col1:
-    facility_amount = st.number_input("Facility Amount", value=100_000_000.0, step=1_000_000.0, format="%.0f")
-    residual = st.number_input("Residual / Balloon Amount", value=0.0, step=1_000_000.0, format="%.0f")
+    facility_amount = st.number_input("Facility Amount", value=100_000_000.0, step=1_000_000.0, format="%.0f", key="facility_amount")
+    residual = st.number_input("Residual / Balloon Amount", value=0.0, step=1_000_000.0, format="%.0f", key="residual")
 with col2:
     repayment_structure = st.selectbox(
         "Repayment Structure",
-        ["Equal Installments", "Interest Only", "Capitalised Interest", "Structured Capital"]
+        REPAYMENT_STRUCTURES,
+        key="repayment_structure"
     )
-    term_months = st.number_input("Term (Months)", value=120, step=1, min_value=1)
+    term_months = st.number_input("Term (Months)", value=120, step=1, min_value=1, key="term_months")
 
 # Capitalised Fees
+fees_timer = start_phase("fees")
 st.header("Capitalised Fees")
-capitalise_fees = st.checkbox("Capitalise fees into principal?", value=True)
+capitalise_fees = st.checkbox("Capitalise fees into principal?", value=True, key="capitalise_fees")
 custom_fees = []
+page_inputs = {}  # widget values the Deal does not keep, saved with it so reopening is exact
 
 if capitalise_fees:
     st.info("Define custom fees to capitalise into the loan")
-    num_fees = st.number_input("Number of fee items", min_value=1, max_value=10, value=2, step=1)
+    num_fees = st.number_input("Number of fee items", min_value=1, max_value=10, value=2, step=1, key="num_fees")
     
     for i in range(num_fees):
         col_f1, col_f2, col_f3 = st.columns(3)
@@ -111,7 +242,7 @@ if capitalise_fees:
                 key=f"fee_name_{i}"
             )
         with col_f2:
-            fee_type = st.selectbox(f"Type {i+1}", ["Nominal Amount", "% of Facility"], key=f"fee_type_{i}")
+            fee_type = st.selectbox(f"Type {i+1}", FEE_TYPES, key=f"fee_type_{i}")
         with col_f3:
             if fee_type == "Nominal Amount":
                 fee_amount = st.number_input(
@@ -123,25 +254,25 @@ if capitalise_fees:
                 )
             else:
                 fee_pct = st.number_input(f"Percentage {i+1}", value=2.3, step=0.1, format="%.2f", key=f"fee_pct_{i}")
-                fee_amount = round(facility_amount * fee_pct / 100, 2)
+                fee_amount = resolve_fee(facility_amount, fee_type, fee_pct)
+                page_inputs[f"fee_pct_{i}"] = fee_pct
                 st.caption(f"Amount: R{fee_amount:,.2f}")
         
         custom_fees.append({'name': fee_name, 'type': fee_type, 'amount': fee_amount})
+fees_timer.stop()
 
-total_fees = sum(f['amount'] for f in custom_fees) if capitalise_fees else 0.0
-full_capital = round(facility_amount + total_fees, 2) if capitalise_fees else facility_amount
 
 # Drawdown Structure
 st.header("Drawdown Structure")
-drawdown_structure = st.selectbox("Drawdown Type", ["Single Drawdown", "Multiple Drawdowns"])
+drawdown_structure = st.selectbox("Drawdown Type", DRAWDOWN_STRUCTURES, key="drawdown_structure")
 drawdown_schedule = None
 
 if drawdown_structure == "Single Drawdown":
-    drawdown_date = st.date_input("Drawdown Date", value=datetime(2025, 3, 1))
-    first_payment_date = st.date_input("First Payment Date", value=datetime(2025, 4, 1))
+    drawdown_date = st.date_input("Drawdown Date", value=datetime(2025, 3, 1), key="drawdown_date")
+    first_payment_date = st.date_input("First Payment Date", value=datetime(2025, 4, 1), key="first_payment_date")
 else:
     st.info("Define multiple drawdown tranches")
-    num_drawdowns = st.number_input("Number of drawdowns", min_value=1, max_value=20, value=2, step=1)
+    num_drawdowns = st.number_input("Number of drawdowns", min_value=1, max_value=20, value=2, step=1, key="num_drawdowns")
     
     drawdown_schedule = []
     for i in range(num_drawdowns):
@@ -149,7 +280,7 @@ else:
         with col_d1:
             dd_date = st.date_input(
                 f"Drawdown Date {i+1}", 
-                value=datetime(2025, 3, 1) + relativedelta(months=i*3), 
+                value=add_months(datetime(2025, 3, 1), i*3), 
                 key=f"dd_date_{i}"
             )
         with col_d2:
@@ -166,25 +297,55 @@ else:
     drawdown_schedule = sorted(drawdown_schedule, key=lambda x: x['date'])
     first_payment_date = st.date_input(
         "First Payment Date", 
-        value=drawdown_schedule[0]['date'] + relativedelta(months=1)
+        value=add_months(drawdown_schedule[0]['date'], 1),
+        key=f"first_payment_date:{drawdown_schedule[0]['date']}"  # follows the first drawdown until edited
+    )
+
+col_pd1, col_pd2, col_pd3 = st.columns(3)
+with col_pd1:
+    month_end = st.selectbox(
+        "Payment Day Rule",
+        MONTH_END_RULES,
+        help="Add Month steps a month from the previous payment (31 Jan, 28 Feb, 28 Mar). "
+             "Anchor Day keeps the first payment's day where the month allows; Month End pays on the last day.",
+        key="month_end"
     )
+with col_pd2:
+    business_day = st.selectbox("Business Day Convention", list(BUSINESS_DAY_CONVENTIONS), key="business_day")
+with col_pd3:
+    holidays = st.selectbox("Holiday Calendar", HOLIDAY_CALENDARS, index=1, disabled=business_day == "Unadjusted", key="holidays")
 
 # Interest Rate Structure
 st.header("Interest Rate Structure")
-rate_structure = st.selectbox("Rate Structure", ["Fixed Rate", "Variable Rate"])
+rate_structure = st.selectbox("Rate Structure", RATE_STRUCTURES, key="rate_structure")
+day_count = st.selectbox(
+    "Interest Accrual",
+    DAY_COUNTS,
+    help="Monthly charges rate / 12 every period. The day counts accrue on actual days, "
+         "with drawdowns and custom capital accruing from their exact dates.",
+    key="day_count"
+)
+rounding = st.selectbox(
+    "Rounding",
+    ROUNDING_MODES,
+    help="Float rounds binary floats to the cent. Half Up / Half Even keep money in integer "
+         "cents and round interest once per period, to reconcile exactly with the ledger.",
+    key="rounding"
+)
 
 if rate_structure == "Fixed Rate":
     col_r1, col_r2 = st.columns(2)
     with col_r1:
-        prime_rate = st.number_input("Prime Rate %", value=11.75, step=0.25, format="%.2f")
+        prime_rate = st.number_input("Prime Rate %", value=11.75, step=0.25, format="%.2f", key="prime_rate")
     with col_r2:
-        delta_margin = st.number_input("Delta / Margin %", value=2.0, step=0.25, format="%.2f")
+        delta_margin = st.number_input("Delta / Margin %", value=2.0, step=0.25, format="%.2f", key="delta_margin")
     
     interest_rate = prime_rate + delta_margin
+    page_inputs.update(prime_rate=prime_rate, delta_margin=delta_margin)
     rate_schedule = None
 else:
     st.info("Define variable interest rates by period range")
-    num_rate_periods = st.number_input("Number of rate periods", min_value=1, max_value=10, value=2, step=1)
+    num_rate_periods = st.number_input("Number of rate periods", min_value=1, max_value=10, value=2, step=1, key="num_rate_periods")
     
     rate_schedule = []
     for i in range(num_rate_periods):
@@ -201,7 +362,7 @@ else:
             to_period = st.number_input(
                 f"To Period {i+1}", 
                 min_value=from_period, 
-                value=term_months if i == num_rate_periods - 1 else from_period + 11, 
+                value=max(from_period, term_months) if i == num_rate_periods - 1 else from_period + 11, 
                 step=1, 
                 key=f"to_{i}"
             )
@@ -223,12 +384,12 @@ else:
 
 # Custom Capital Repayments
 st.header("Custom Capital Repayments")
-use_custom_capital = st.checkbox("Add custom capital repayments", value=False)
+use_custom_capital = st.checkbox("Add custom capital repayments", value=False, key="use_custom_capital")
 custom_capital_schedule = None
 
 if use_custom_capital:
     st.info("Define one-off principal payments by date")
-    num_custom_payments = st.number_input("Number of custom capital payments", min_value=1, max_value=20, value=1, step=1)
+    num_custom_payments = st.number_input("Number of custom capital payments", min_value=1, max_value=20, value=1, step=1, key="num_custom_payments")
     
     custom_capital_schedule = []
     for i in range(num_custom_payments):
@@ -236,7 +397,7 @@ if use_custom_capital:
         with col_c1:
             payment_date = st.date_input(
                 f"Payment Date {i+1}", 
-                value=first_payment_date + relativedelta(months=12 * (i+1)), 
+                value=add_months(first_payment_date, 12 * (i+1)), 
                 key=f"custom_date_{i}"
             )
         with col_c2:
@@ -255,7 +416,7 @@ structured_payments = None
 if repayment_structure == "Structured Capital":
     st.header("Structured Capital Payments")
     st.info("Define custom principal payment amounts by period range")
-    num_payment_periods = st.number_input("Number of payment structures", min_value=1, max_value=10, value=2, step=1)
+    num_payment_periods = st.number_input("Number of payment structures", min_value=1, max_value=10, value=2, step=1, key="num_payment_periods")
     
     structured_payments = []
     for i in range(num_payment_periods):
@@ -272,7 +433,7 @@ if repayment_structure == "Structured Capital":
             to_p = st.number_input(
                 f"To Period {i+1}", 
                 min_value=from_p, 
-                value=term_months if i == num_payment_periods - 1 else from_p + 11, 
+                value=max(from_p, term_months) if i == num_payment_periods - 1 else from_p + 11, 
                 step=1, 
                 key=f"pay_to_{i}"
             )
@@ -295,350 +456,308 @@ if repayment_structure == "Capitalised Interest":
         "Months to Capitalise Interest", 
         min_value=1, 
         max_value=term_months, 
-        value=12, 
-        step=1
+        value=min(12, term_months), 
+        step=1,
+        key="capitalisation_months"
     )
 
 # ───────────────────────────────────────────────────────────────
 # CALCULATE SUGGESTED PAYMENT
 # ───────────────────────────────────────────────────────────────
 
-if repayment_structure == "Equal Installments":
-    suggested_payment = abs(calculate_pmt(interest_rate / 100, term_months, full_capital, -residual))
-
-elif repayment_structure == "Interest Only":
-    suggested_payment = round(full_capital * (interest_rate / 100 / 12), 2)
-
-elif repayment_structure == "Capitalised Interest":
-    # FIX #2: Use compound interest, not simple interest
-    remaining_months = term_months - capitalisation_months
-    if remaining_months > 0:
-        # Simulate actual compounding during capitalisation period
-        sim_balance = full_capital
-        for p in range(capitalisation_months):
-            # Use variable rate if applicable
-            if rate_structure == "Variable Rate":
-                sim_rate = interest_rate  # Default
-                for rp in rate_schedule:
-                    if rp['from_period'] <= (p+1) <= rp['to_period']:
-                        sim_rate = rp['total_rate']
-                        break
-            else:
-                sim_rate = interest_rate
-            
-            sim_interest = round(sim_balance * (sim_rate / 100 / 12), 2)
-            sim_balance = round(sim_balance + sim_interest, 2)
-        
-        estimated_balance = sim_balance
-        suggested_payment = abs(calculate_pmt(interest_rate / 100, remaining_months, estimated_balance, -residual))
-    else:
-        suggested_payment = 0.0
-else:
-    suggested_payment = 0.0
+deal = Deal(
+    facility_amount=facility_amount,
+    term_months=int(term_months),
+    first_payment_date=first_payment_date,
+    repayment_structure=repayment_structure,
+    residual=residual,
+    client_name=client_name,
+    facility_name=facility_name,
+    capitalise_fees=capitalise_fees,
+    custom_fees=custom_fees,
+    drawdown_structure=drawdown_structure,
+    drawdown_date=drawdown_date if drawdown_structure == "Single Drawdown" else None,
+    drawdown_schedule=drawdown_schedule,
+    rate_structure=rate_structure,
+    interest_rate=interest_rate,
+    rate_schedule=rate_schedule,
+    custom_capital_schedule=custom_capital_schedule if use_custom_capital else None,
+    structured_payments=structured_payments,
+    capitalisation_months=int(capitalisation_months),
+    day_count=day_count,
+    rounding=rounding,
+    month_end=month_end,
+    business_day=business_day,
+    holidays=holidays if business_day != "Unadjusted" else "None",
+)
+inputs_timer.stop()
+with phase("fees"):
+    total_fees = deal.total_fees
+    full_capital = deal.full_capital
+try:
+    compiled = compile_deal(deal)
+except DealError as exc:
+    st.error(f"⚠️ {exc}")
+    stop_page()
+with phase("suggested_payment"):
+    suggested_payment = compute_suggested_payment(deal, compiled)
 
 st.subheader("Monthly Payment")
 if repayment_structure != "Structured Capital":
-    override = st.checkbox("Override calculated payment", value=False)
+    override = st.checkbox("Override calculated payment", value=False, key="override")
     if override:
         monthly_payment = st.number_input(
             "Monthly Payment Amount", 
             value=suggested_payment, 
             step=1000.0, 
-            format="%.2f"
+            format="%.2f",
+            key=f"monthly_payment:{suggested_payment}"  # resets to a new suggestion when the inputs change
         )
+    elif repayment_structure != "Interest Only" and st.checkbox("Goal-seek exact payment to land on the residual", value=False, key="goal_seek"):
+        solved = solve_payment(deal)
+        monthly_payment = solved.value
+        if solved.converged:
+            st.info(
+                f"Solved payment: **R{monthly_payment:,.2f}** "
+                f"({solved.iterations} evaluations, {solved.elapsed * 1000:,.0f} ms)"
+            )
+        else:
+            st.warning("⚠️ No payment lands this deal on its residual – showing the last candidate tried")
     else:
         monthly_payment = suggested_payment
         st.info(f"Calculated payment: **R{monthly_payment:,.2f}**")
 else:
     monthly_payment = 0.0
     st.info("Using structured payment schedule defined above")
+deal.monthly_payment = monthly_payment
 
 # ───────────────────────────────────────────────────────────────
 # GENERATE AMORTISATION SCHEDULE
 # ───────────────────────────────────────────────────────────────
 
+deal_id = deal_key(deal)
 if st.button("Generate Amortisation Schedule", type="primary"):
-    schedule = []
-    balance = 0.0
-    current_date = first_payment_date
-    
-    # FIX #3: Unified drawdown lookup - handles fees in multi-drawdown mode
-    drawdown_lookup = {}
-    
-    if drawdown_structure == "Single Drawdown":
-        drawdown_lookup[1] = full_capital
-    else:
-        # Multiple drawdowns
-        for dd in drawdown_schedule:
-            months_diff = (dd['date'].year - first_payment_date.year) * 12 + \
-                         (dd['date'].month - first_payment_date.month)
-            
-            # FIX #4: Assign drawdowns before first payment to period 1
-            period_num = 1 if months_diff < 0 else months_diff + 1
-            
-            if period_num > term_months:
-                st.warning(f"Drawdown on {dd['date']} is after loan term – ignored")
-                continue
-            
-            if period_num not in drawdown_lookup:
-                drawdown_lookup[period_num] = 0.0
-            drawdown_lookup[period_num] += dd['amount']
-        
-        # Add capitalised fees to period 1 in multi-drawdown mode
-        if capitalise_fees and total_fees > 0:
-            if 1 not in drawdown_lookup:
-                drawdown_lookup[1] = 0.0
-            drawdown_lookup[1] += total_fees
-    
-    # FIX #5: Custom capital by year-month only (not exact date)
-    custom_capital_lookup = {}
-    if use_custom_capital and custom_capital_schedule:
-        for cc in custom_capital_schedule:
-            # Match by year-month only
-            key = f"{cc['date'].year}-{cc['date'].month:02d}"
-            custom_capital_lookup[key] = cc['amount']
-    
-    # Main amortisation loop
-    for period in range(1, term_months + 1):
-        opening_balance = balance
-        
-        # Apply drawdown at beginning of period
-        drawdown = drawdown_lookup.get(period, 0.0)
-        balance += drawdown
-        balance_before_interest = round(balance, 2)
-        
-        # Determine interest rate for this period
-        if rate_structure == "Variable Rate":
-            # FIX #6: Better variable rate lookup with forward-fill
-            current_rate = None
-            for rp in rate_schedule:
-                if rp['from_period'] <= period <= rp['to_period']:
-                    current_rate = rp['total_rate']
-                    break
-            
-            # If no match, forward-fill from last known rate
-            if current_rate is None:
-                for rp in reversed(rate_schedule):
-                    if rp['to_period'] < period:
-                        current_rate = rp['total_rate']
-                        break
-            
-            # Final fallback
-            if current_rate is None:
-                current_rate = rate_schedule[0]['total_rate']
-        else:
-            current_rate = interest_rate
-        
-        # Calculate interest
-        interest = round(balance_before_interest * (current_rate / 100 / 12), 2)
-        
-        # Initialize payment variables
-        regular_principal = 0.0
-        regular_payment = interest
-        is_cap_period = (repayment_structure == "Capitalised Interest" and period <= capitalisation_months)
-        
-        # Determine regular principal payment based on structure
-        if is_cap_period:
-            # Capitalise interest - negative principal
-            regular_principal = -interest
-            regular_payment = 0.0
-        
-        elif repayment_structure == "Equal Installments":
-            regular_principal = monthly_payment - interest
-            
-            # Guard against negative amortisation
-            if regular_principal < 0:
-                regular_principal = 0.0
-            
-            regular_payment = monthly_payment
-          
-          
-        elif repayment_structure == "Capitalised Interest":
-            # After capitalisation period, treat like equal installments
-            regular_principal = monthly_payment - interest
-            
-            # Guard against negative amortisation
-            if regular_principal < 0:
-                regular_principal = 0.0
-            
-            regular_payment = monthly_payment
-        
-        elif repayment_structure == "Interest Only":
-            regular_principal = 0.0
-            regular_payment = interest
-        
-        elif repayment_structure == "Structured Capital":
-            # Find applicable payment structure
-            structured_principal = 0.0
-            for pay in structured_payments:
-                if pay['from_period'] <= period <= pay['to_period']:
-                    structured_principal = pay['payment']
-                    break
-            
-            regular_principal = structured_principal
-            regular_payment = interest + regular_principal
-        
-        # FIX #7: Proper residual handling for final period - ALL structures
-        if period == term_months:
-            if repayment_structure == "Interest Only":
-                # Interest-only final period pays off balance minus residual
-                regular_principal = max(0, balance_before_interest - residual)
-                regular_payment = interest + regular_principal
-            elif residual > 0:
-                # All other structures: cap principal at balance minus residual
-                max_principal = max(0, balance_before_interest - residual)
-                regular_principal = min(regular_principal, max_principal)
-                regular_payment = interest + regular_principal
-        
-        # Apply custom capital repayments
-        custom_capital = 0.0
-        date_key = f"{current_date.year}-{current_date.month:02d}"
-        if date_key in custom_capital_lookup:
-            custom_capital = custom_capital_lookup[date_key]
-            # Cannot exceed what's left after regular repayment
-            remaining_after_regular = balance_before_interest - regular_principal
-            custom_capital = min(custom_capital, max(0, remaining_after_regular))
-        
-        # Calculate totals
-        total_principal = regular_principal + custom_capital
-        total_payment = interest + total_principal
-        
-        # Update balance
-        balance = round(balance_before_interest - total_principal, 2)
-        balance = max(0.0, balance)  # Never negative
-        
-        # Build row
-        schedule.append({
-            "Period": period,
-            "Payment Date": current_date.strftime("%Y-%m-%d"),
-            "Opening Balance": round(opening_balance, 2),
-            "Drawdown": round(drawdown, 2),
-            "Balance Before Interest": balance_before_interest,
-            "Interest Rate %": round(current_rate, 4),
-            "Interest": interest,
-            "Regular Principal": round(regular_principal, 2),
-            "Custom Capital": round(custom_capital, 2),
-            "Total Principal": round(total_principal, 2),
-            "Total Payment": round(total_payment, 2),
-            "Ending Balance": balance,
-        })
-        
-        current_date += relativedelta(months=1)
-    
-    # Final validation
-    final_balance = balance
-    if residual > 0:
-        expected_final = residual
-    else:
-        expected_final = 0.0
-    
-    if abs(final_balance - expected_final) > 1.0:  # Allow R1 rounding tolerance
-        st.warning(f"⚠️ Final balance R{final_balance:,.2f} differs from expected R{expected_final:,.2f}")
+    st.session_state.result_key = deal_id
+
+# Keep showing the last generated schedule for as long as the inputs match it
+if st.session_state.get("result_key") == deal_id:
+    result = get_or_compute(deal, session_cache(st.session_state), deal_id, compiled, store=open_store())
+    for message in result.schedule.warnings:
+        st.warning(message)
     
-    df = pd.DataFrame(schedule)
+    df = result.frame
     st.session_state.df = df
     
     # Display schedule
     st.subheader("Amortisation Schedule")
-    st.dataframe(
-        df.style.format({
-            "Drawdown": "R{:,.2f}",
-            "Opening Balance": "R{:,.2f}",
-            "Balance Before Interest": "R{:,.2f}",
-            "Interest Rate %": "{:.4f}%",
-            "Interest": "R{:,.2f}",
-            "Regular Principal": "R{:,.2f}",
-            "Custom Capital": "R{:,.2f}",
-            "Total Principal": "R{:,.2f}",
-            "Total Payment": "R{:,.2f}",
-            "Ending Balance": "R{:,.2f}",
-        }),
-        use_container_width=True,
-        height=650
-    )
+    if result.reused_periods:
+        st.caption(f"Periods 1–{result.reused_periods} reused from the previous schedule; "
+                   f"recomputed from period {result.reused_periods + 1}")
+    render_schedule(result)
     
-    # FIX #8: Corrected summary metrics (exclude negative principal)
     st.subheader("Summary")
     cols = st.columns(5)
+    for col, (label, value) in zip(cols, result.summary.items()):
+        col.metric(label, f"R{value:,.2f}")
+    cols = st.columns(5)
+    for col, (label, value) in zip(cols, result.analytics.items()):
+        col.metric(label, "n/a" if value != value else f"{value:,.2f}")
     
-    total_drawn = df['Drawdown'].sum()
-    total_interest = df['Interest'].sum()
-    
-    # Only sum positive principal (exclude capitalised interest periods)
-    total_principal_repaid = df[df['Total Principal'] > 0]['Total Principal'].sum()
-    
-    total_custom = df['Custom Capital'].sum()
-    final_bal = df['Ending Balance'].iloc[-1]
-    
-    cols[0].metric("Total Drawn", f"R{total_drawn:,.2f}")
-    cols[1].metric("Total Interest", f"R{total_interest:,.2f}")
-    cols[2].metric("Total Principal Repaid", f"R{total_principal_repaid:,.2f}")
-    cols[3].metric("Total Custom Capital", f"R{total_custom:,.2f}")
-    cols[4].metric("Final Balance", f"R{final_bal:,.2f}")
+    # Export is only built when the download is clicked, then reused for this deal in this session
+    export_format = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True)
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        f"Download {export_format}", 
+        lambda: session_artifact(st.session_state, (deal_id, export_format), lambda: export_bytes(export_format, deal, result.schedule)), 
+        file_name=export_filename(deal, extension), 
+        mime=mime
+    )
+    if st.button("Save deal", on_click=lambda: open_store().save(deal, result.schedule, deal_id, page_inputs)):
+        st.success("Saved – reopen it from Saved Deals in the sidebar")
     
-    # Excel export
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        # Input summary
-        input_fields = [
-            "Client Name", "Facility Name", "Facility Amount", "Residual", 
-            "Repayment Structure", "Rate Structure", "Drawdown Structure", 
-            "Term (Months)", "Capitalise Fees", "First Payment Date", 
-            "Custom Capital Repayments"
-        ]
-        input_values = [
-            client_name, facility_name, f"R{facility_amount:,.2f}", f"R{residual:,.2f}",
-            repayment_structure, rate_structure, drawdown_structure,
-            term_months, "Yes" if capitalise_fees else "No",
-            first_payment_date.strftime("%Y-%m-%d"),
-            "Yes" if use_custom_capital else "No"
-        ]
-        
-        if capitalise_fees:
-            for fee in custom_fees:
-                input_fields.append(f"{fee['name']} ({fee['type']})")
-                input_values.append(f"R{fee['amount']:,.2f}")
-            input_fields.append("Total Fees")
-            input_values.append(f"R{total_fees:,.2f}")
-        
-        input_fields.append("Full Capital Amount")
-        input_values.append(f"R{full_capital:,.2f}")
-        
-        inputs_df = pd.DataFrame({"Field": input_fields, "Value": input_values})
-        inputs_df.to_excel(writer, sheet_name="Inputs", index=False)
+    # ───────────────────────────────────────────────────────────────
+    # SENSITIVITY GRID
+    # ───────────────────────────────────────────────────────────────
+    st.subheader("Sensitivity")
+    with st.expander("Prime shock / margin / term grid"):
+        col_s1, col_s2, col_s3 = st.columns(3)
+        with col_s1:
+            shock_from = st.number_input("Prime shock from (bp)", value=-300, step=25)
+            shock_to = st.number_input("Prime shock to (bp)", value=300, step=25)
+            shock_step = st.number_input("Shock step (bp)", value=50, min_value=1, step=25)
+        with col_s2:
+            margin_text = st.text_input("Margin changes (bp, comma separated)", value="-50, 0, 50")
+        with col_s3:
+            terms_text = st.text_input("Terms (months, comma separated)", value=str(int(term_months)))
+            fixed_installment = st.checkbox("Keep the current installment in every cell", value=False)
         
-        # Schedule
-        df.to_excel(writer, sheet_name="Schedule", index=False)
+        try:
+            margin_changes = [int(x) for x in margin_text.split(",") if x.strip()] or [0]
+            grid_terms = [int(x) for x in terms_text.split(",") if x.strip()] or [int(term_months)]
+        except ValueError:
+            st.error("⚠️ Margin changes and terms must be whole numbers separated by commas")
+            stop_page()
+        rate_shocks = list(range(int(shock_from), int(shock_to) + 1, int(shock_step)))
+        grid_id = f"sensitivity:{rate_shocks}:{margin_changes}:{grid_terms}:{fixed_installment}"
+        # Without a fixed installment each cell is priced at its own suggested payment
+        grid_deal = deal if fixed_installment else replace(deal, monthly_payment=None)
         
-        # Additional sheets for complex structures
-        if drawdown_structure == "Multiple Drawdowns":
-            dd_df = pd.DataFrame(drawdown_schedule)
-            dd_df['date'] = dd_df['date'].apply(lambda x: x.strftime("%Y-%m-%d"))
-            dd_df.to_excel(writer, sheet_name="Drawdown Schedule", index=False)
+        if st.button("Run sensitivity grid"):
+            st.session_state.grid_key = (deal_id, grid_id)
         
-        if rate_structure == "Variable Rate":
-            rate_df = pd.DataFrame(rate_schedule)
-            rate_df.to_excel(writer, sheet_name="Rate Schedule", index=False)
+        if st.session_state.get("grid_key") == (deal_id, grid_id):
+            grid = session_artifact(st.session_state, (deal_id, grid_id), lambda: sensitivity_grid(grid_deal, rate_shocks, margin_changes, grid_terms))
+            metric = st.radio("Show", GRID_METRICS, horizontal=True)
+            pivot = grid_pivot(grid, metric)
+            pivot.columns = [f"{term}m / {margin:+d}bp" for term, margin in pivot.columns]
+            low, high = pivot.min().min(), pivot.max().max()
+            
+            def heat(value):
+                share = 0.0 if high == low else (value - low) / (high - low)
+                return f"background-color: rgba(233, 30, 99, {0.1 + 0.6 * share:.2f})"
+            
+            st.dataframe(pivot.style.map(heat).format("R{:,.2f}"), use_container_width=True)
+            
+            grid_format = st.radio("Grid export format", list(EXPORT_FORMATS), horizontal=True)
+            grid_extension, grid_mime = EXPORT_FORMATS[grid_format]
+            st.download_button(
+                f"Download grid ({grid_format})",
+                lambda: session_artifact(st.session_state, (deal_id, f"{grid_id}:{grid_format}"), lambda: table_bytes(grid_format, GRID_COLUMNS, grid, "Sensitivity")),
+                file_name=export_filename(deal, grid_extension).replace("_Amort_", "_Sensitivity_"),
+                mime=grid_mime
+            )
+    
+    # ───────────────────────────────────────────────────────────────
+    # MONTE CARLO PRIME PATHS
+    # ───────────────────────────────────────────────────────────────
+    with st.expander("Monte Carlo prime paths"):
+        start_prime = prime_rate if rate_structure == "Fixed Rate" else rate_schedule[0]['prime']
+        col_m1, col_m2, col_m3 = st.columns(3)
+        with col_m1:
+            n_paths = st.number_input("Paths", value=10_000, min_value=100, max_value=100_000, step=1_000)
+            mc_seed = st.number_input("Seed", value=42, min_value=0, step=1)
+        with col_m2:
+            long_run = st.number_input("Long-run prime %", value=float(start_prime), step=0.25, format="%.2f")
+            reversion = st.number_input("Reversion speed (per year)", value=0.5, min_value=0.0, step=0.1, format="%.2f")
+        with col_m3:
+            prime_vol = st.number_input("Prime volatility (% pts per year)", value=1.5, min_value=0.0, step=0.25, format="%.2f")
+            reprice = st.checkbox("Re-amortise the installment when prime moves", value=True)
+        mc_id = f"montecarlo:{n_paths}:{mc_seed}:{start_prime}:{long_run}:{reversion}:{prime_vol}:{reprice}"
         
-        if repayment_structure == "Structured Capital":
-            payment_df = pd.DataFrame(structured_payments)
-            payment_df.to_excel(writer, sheet_name="Payment Structure", index=False)
+        if st.button("Run simulation"):
+            st.session_state.mc_key = (deal_id, mc_id)
         
-        if use_custom_capital:
-            custom_df = pd.DataFrame(custom_capital_schedule)
-            custom_df['date'] = custom_df['date'].apply(lambda x: x.strftime("%Y-%m-%d"))
-            custom_df.to_excel(writer, sheet_name="Custom Capital", index=False)
-    
-    buffer.seek(0)
+        if st.session_state.get("mc_key") == (deal_id, mc_id):
+            try:
+                mc = session_artifact(st.session_state, (deal_id, mc_id), lambda: simulate(
+                    deal, start_prime, long_run, n_paths=int(n_paths), speed=reversion,
+                    volatility=prime_vol, seed=int(mc_seed), tick=0.25, reprice=reprice
+                ))
+            except DealError as exc:
+                st.error(f"⚠️ {exc}")
+            else:
+                import pandas as pd
+                st.caption(f"{int(n_paths):,} paths × {term_months} periods in {mc.elapsed * 1000:,.0f} ms")
+                st.dataframe(
+                    pd.DataFrame(mc.percentiles()).T.style.format("R{:,.2f}"),
+                    use_container_width=True
+                )
+                st.line_chart(pd.DataFrame(
+                    mc.balance_bands.T,
+                    columns=[f"P{p} balance" for p in MC_PERCENTILES],
+                    index=pd.Index(range(1, term_months + 1), name="Period"),
+                ))
     
-    # Smart filename
-    clean_client = "".join(c for c in client_name if c.isalnum() or c in (' ', '_')).replace(' ', '_')
-    clean_facility = "".join(c for c in facility_name if c.isalnum() or c in (' ', '_')).replace(' ', '_')
-    filename = f"{clean_client}_{clean_facility}_Amort_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    # ───────────────────────────────────────────────────────────────
+    # EARLY SETTLEMENT
+    # ───────────────────────────────────────────────────────────────
+    with st.expander("Early settlement quotes"):
+        rate_shift = st.number_input(
+            "Replacement rate shift for breakage (bp)", value=-100, step=25,
+            help="Breakage values the cancelled cash flows at each period's rate plus this shift; "
+                 "it is only charged when that value exceeds the balance repaid."
+        )
+        quotes_id = f"settlement:{int(rate_shift)}"
+        quotes = result.artifact(quotes_id, lambda: settlement_quotes(result.schedule, int(rate_shift)))
+        st.dataframe(
+            quotes,
+            column_config={
+                name: st.column_config.NumberColumn(name, format="R%,.2f")
+                for name in SETTLEMENT_COLUMNS if name not in ("Period", "Payment Date")
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+        quotes_format = st.radio("Quotes export format", list(EXPORT_FORMATS), horizontal=True)
+        quotes_extension, quotes_mime = EXPORT_FORMATS[quotes_format]
+        st.download_button(
+            f"Download quotes ({quotes_format})",
+            lambda: session_artifact(st.session_state, (deal_id, f"{quotes_id}:{quotes_format}"), lambda: table_bytes(quotes_format, SETTLEMENT_COLUMNS, quotes, "Settlement")),
+            file_name=export_filename(deal, quotes_extension).replace("_Amort_", "_Settlement_"),
+            mime=quotes_mime
+        )
     
-    st.download_button(
-        "Download Excel", 
-        buffer, 
-        file_name=filename, 
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
\ No newline at end of file
+    # ───────────────────────────────────────────────────────────────
+    # STRUCTURE COMPARISON
+    # ───────────────────────────────────────────────────────────────
+    st.subheader("Structure Comparison")
+    with st.expander("Compare this facility under other structures"):
+        variants = default_variants(deal)
+        chosen = st.multiselect(
+            "Variants", [label for label, _ in variants], default=[label for label, _ in variants],
+            help="The first variant is the baseline the differences are measured against. "
+                 "Switched structures use their own suggested payment."
+        )
+        variants = [(label, overrides) for label, overrides in variants if label in chosen]
+        compare_id = f"compare:{chosen}"
+        
+        if st.button("Compare structures", disabled=len(variants) < 2):
+            st.session_state.compare_key = (deal_id, compare_id)
+        
+        if st.session_state.get("compare_key") == (deal_id, compare_id):
+            try:
+                comparison = session_artifact(st.session_state, (deal_id, compare_id), lambda: compare_variants(deal, variants, compiled=compiled))
+            except DealError as exc:
+                st.error(f"⚠️ {exc}")
+            else:
+                import pandas as pd
+                rows = session_artifact(st.session_state, (deal_id, f"{compare_id}:rows"), lambda: comparison_rows(comparison))
+                # Variants side by side, one row per measure (the structure names are in the variant labels)
+                side_by_side = pd.DataFrame(rows, columns=COMPARISON_COLUMNS).set_index("Variant")[COMPARISON_COLUMNS[3:]].T
+                st.dataframe(side_by_side.style.format("{:,.2f}", na_rep="n/a"), use_container_width=True)
+                measure = st.radio("Per-period difference in", DIFF_MEASURES, horizontal=True)
+                diff_header, diff_rows = period_diff(comparison, measure)
+                diff = pd.DataFrame(diff_rows, columns=diff_header).set_index("Period")
+                st.line_chart(diff[[label for label, _, _ in comparison]])
+                st.dataframe(diff.style.format("R{:,.2f}", subset=diff_header[2:], na_rep=""), use_container_width=True)
+                
+                compare_format = st.radio("Comparison export format", list(EXPORT_FORMATS), horizontal=True)
+                compare_extension, compare_mime = EXPORT_FORMATS[compare_format]
+                st.download_button(
+                    f"Download comparison ({compare_format})",
+                    lambda: session_artifact(st.session_state, (deal_id, f"{compare_id}:{compare_format}"), lambda: comparison_bytes(compare_format, COMPARISON_COLUMNS, rows, comparison)),
+                    file_name=export_filename(deal, compare_extension).replace("_Amort_", "_Comparison_"),
+                    mime=compare_mime
+                )
+
+# ───────────────────────────────────────────────────────────────
+# PERFORMANCE DEBUG PANEL
+# ───────────────────────────────────────────────────────────────
+record_span("rerun", time.perf_counter() - rerun_started)
+perf.close()
+if timings is not None:
+    with st.sidebar:
+        st.subheader("Performance")
+        if timings:
+            st.dataframe(
+                summarise_phases(timings),
+                column_config={
+                    "ms": st.column_config.NumberColumn("ms", format="%.2f"),
+                    "alloc_kib": st.column_config.NumberColumn("Allocated KiB", format="%.1f"),
+                    "peak_kib": st.column_config.NumberColumn("Peak KiB", format="%.1f"),
+                },
+                hide_index=True,
+                use_container_width=True,
+            )
+        st.caption("Times for this rerun only (tracing allocations slows every phase). "
+                   "Exports are timed when downloaded and reach the metrics hooks, not this table.")
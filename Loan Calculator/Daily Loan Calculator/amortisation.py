@@ -0,0 +1,1146 @@
+"""Headless amortisation engine for the Shpitz Loan Generator.
+
+Everything here is plain Python so a deal can be priced without importing
+Streamlit. ``Loan_Amort_Daily.py`` collects the inputs, builds a ``Deal`` and
+renders whatever ``generate_schedule`` returns.
+"""
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field, fields, replace
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+
+import loop_kernel
+from instrumentation import phase
+from payment_calendar import (
+    BUSINESS_DAY_CONVENTIONS, HOLIDAY_CALENDARS, MONTH_END_RULES, add_months, payment_dates, payment_months,
+    period_of_month,
+)
+
+REPAYMENT_STRUCTURES = ["Equal Installments", "Interest Only", "Capitalised Interest", "Structured Capital"]
+RATE_STRUCTURES = ["Fixed Rate", "Variable Rate"]
+DRAWDOWN_STRUCTURES = ["Single Drawdown", "Multiple Drawdowns"]
+FEE_TYPES = ["Nominal Amount", "% of Facility"]
+# "Monthly" charges rate / 12 per period; the others accrue on actual dates
+DAY_COUNTS = ["Monthly", "Act/365F", "Act/360", "30/360"]
+YEAR_BASIS = {"Act/365F": 365, "Act/360": 360, "30/360": 360}
+# "Float" rounds binary floats with round(); the others work in integer cents
+ROUNDING_MODES = ["Float", "Half Up", "Half Even"]
+
+SCHEDULE_COLUMNS = [
+    "Period", "Payment Date", "Opening Balance", "Drawdown", "Balance Before Interest",
+    "Interest Rate %", "Interest", "Regular Principal", "Custom Capital",
+    "Total Principal", "Total Payment", "Ending Balance",
+]
+MONEY_COLUMNS = [c for c in SCHEDULE_COLUMNS if c not in ("Period", "Payment Date", "Interest Rate %")]
+
+
+# ───────────────────────────────────────────────────────────────
+# PMT FUNCTION
+# ───────────────────────────────────────────────────────────────
+def calculate_pmt(annual_rate, nper, pv, fv=0):
+    """Calculate payment for annuity with optional future value (residual)."""
+    if annual_rate == 0:
+        return -(pv + fv) / nper
+    r = annual_rate / 12
+    z = (1 + r) ** nper
+    pmt = -r * (pv * z + fv) / (z - 1)
+    return round(pmt, 2)
+
+
+def fee_amount(facility_amount, fee_type, value):
+    """Resolve a fee input to a Rand amount (nominal, or a % of the facility)."""
+    if fee_type == "% of Facility":
+        return round(facility_amount * value / 100, 2)
+    return value
+
+
+# ───────────────────────────────────────────────────────────────
+# DEAL INPUTS
+# ───────────────────────────────────────────────────────────────
+@dataclass
+class Deal:
+    """Every input the page collects for one facility.
+
+    List inputs keep the same dict shapes the page builds:
+    fees ``{'name', 'type', 'amount'}``, drawdowns and custom capital
+    ``{'date', 'amount'}``, rate bands ``{'from_period', 'to_period', 'prime',
+    'margin', 'total_rate'}`` and structured payments ``{'from_period',
+    'to_period', 'payment'}``.
+    """
+    facility_amount: float
+    term_months: int
+    first_payment_date: date
+    repayment_structure: str = "Equal Installments"
+    residual: float = 0.0
+    client_name: str = ""
+    facility_name: str = ""
+    capitalise_fees: bool = False
+    custom_fees: List[dict] = field(default_factory=list)
+    drawdown_structure: str = "Single Drawdown"
+    drawdown_date: Optional[date] = None
+    drawdown_schedule: Optional[List[dict]] = None
+    rate_structure: str = "Fixed Rate"
+    interest_rate: float = 0.0
+    rate_schedule: Optional[List[dict]] = None
+    custom_capital_schedule: Optional[List[dict]] = None
+    structured_payments: Optional[List[dict]] = None
+    capitalisation_months: int = 0
+    monthly_payment: Optional[float] = None  # None -> use the suggested payment
+    day_count: str = "Monthly"
+    rounding: str = "Float"
+    month_end: str = "Add Month"        # see payment_calendar.MONTH_END_RULES
+    business_day: str = "Unadjusted"
+    holidays: str = "None"
+
+    @property
+    def total_fees(self):
+        return sum(f['amount'] for f in self.custom_fees) if self.capitalise_fees else 0.0
+
+    @property
+    def full_capital(self):
+        return round(self.facility_amount + self.total_fees, 2) if self.capitalise_fees else self.facility_amount
+
+    @property
+    def base_rate(self):
+        """Headline rate %: the fixed rate, or the first band of a variable schedule."""
+        if self.rate_structure == "Variable Rate":
+            return self.rate_schedule[0]['total_rate'] if self.rate_schedule else 12.25
+        return self.interest_rate
+
+
+def _canonical(value):
+    """JSON fallback for dates and NumPy scalars in deal inputs."""
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot hash {type(value).__name__} in deal inputs")
+
+
+def deal_inputs(deal):
+    """Every input in ``deal`` as canonical JSON (sorted keys, dates as ``YYYY-MM-DD``)."""
+    return json.dumps(asdict(deal), sort_keys=True, separators=(",", ":"), default=_canonical)
+
+
+def deal_from_inputs(payload):
+    """The ``Deal`` that ``deal_inputs`` serialised; the round trip keeps ``deal_key``."""
+    values = json.loads(payload)
+    for name in ("first_payment_date", "drawdown_date"):
+        if values[name] is not None:
+            values[name] = date.fromisoformat(values[name])
+    for name in ("drawdown_schedule", "custom_capital_schedule"):
+        for item in values[name] or []:
+            item['date'] = date.fromisoformat(item['date'])
+    return Deal(**values)
+
+
+def deal_key(deal):
+    """Stable content hash of every input in ``deal``.
+
+    Two deals share a key exactly when every field, fee, band and dated item
+    matches, so it is safe to key cached schedules and exports by it.
+    """
+    return hashlib.sha256(deal_inputs(deal).encode()).hexdigest()
+
+
+@dataclass
+class Schedule:
+    """Output of ``generate_schedule`` plus any warnings.
+
+    ``columns`` holds one preallocated array per ``SCHEDULE_COLUMNS`` entry:
+    float64 for money and rates, int64 for ``Period`` and ``datetime64[D]``
+    for ``Payment Date``. A 360-period schedule is about 35 KB, so a whole
+    book's schedules fit in memory at once.
+    """
+    columns: dict
+    monthly_payment: float
+    expected_final: float
+    warnings: List[str] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.columns["Period"])
+
+    @property
+    def final_balance(self):
+        return float(self.columns["Ending Balance"][-1]) if len(self) else 0.0
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def iter_rows(self):
+        """Yield each period as a tuple in ``SCHEDULE_COLUMNS`` order (dates as ``YYYY-MM-DD``)."""
+        values = [self.columns[c] for c in SCHEDULE_COLUMNS]
+        values[1] = np.datetime_as_string(values[1], unit="D")
+        yield from zip(*(v.tolist() for v in values))
+
+    def to_frame(self):
+        """The schedule as a DataFrame; the numeric columns are shared, not copied."""
+        import pandas as pd
+        return pd.DataFrame(self.columns, columns=SCHEDULE_COLUMNS, copy=False)
+
+
+def _allocate_columns(n):
+    """Uninitialised float64 arrays for every schedule column but ``Period`` and ``Payment Date``."""
+    return {name: np.empty(n) for name in SCHEDULE_COLUMNS if name not in ("Period", "Payment Date")}
+
+
+def _with_periods(columns, compiled, start=0):
+    """Add the ``Period`` and ``Payment Date`` columns for periods ``start + 1`` onwards."""
+    columns["Period"] = np.arange(start + 1, compiled.deal.term_months + 1)
+    columns["Payment Date"] = compiled.payment_dates[start:]
+    return columns
+
+
+# ───────────────────────────────────────────────────────────────
+# COMPILED DEAL
+# ───────────────────────────────────────────────────────────────
+class DealError(ValueError):
+    """Deal inputs that cannot be priced (e.g. overlapping rate bands)."""
+
+
+@dataclass
+class Accrual:
+    """Day-count year fractions for a deal that accrues on actual dates.
+
+    Drawdowns and custom capital are dated flows (sorted by period, then date,
+    drawdowns first on the same day). Each one accrues from its own date to
+    the payment date of the period it falls in.
+    """
+    day_count: str
+    period_days: np.ndarray  # accrual days from the previous payment date to each payment date
+    flow_period: np.ndarray  # period index (0-based) of each dated flow
+    flow_amount: np.ndarray  # + drawdown / - custom capital
+    flow_days: np.ndarray    # accrual days from each flow's date to its period's payment date
+
+    @property
+    def basis(self):
+        return YEAR_BASIS[self.day_count]
+
+    @property
+    def period_factors(self):
+        return self.period_days / self.basis
+
+    @property
+    def flow_factors(self):
+        return self.flow_days / self.basis
+
+
+@dataclass
+class CompiledDeal:
+    """A deal flattened into one array entry per period (index 0 is period 1).
+
+    Built once by ``compile_deal``; the suggested payment, the period loop
+    and the vectorised kernel all read these instead of rescanning the
+    band and drawdown lists every period.
+    """
+    deal: Deal
+    rates: np.ndarray                 # annual rate % per period
+    structured_principal: np.ndarray  # Structured Capital principal per period
+    drawdowns: np.ndarray             # drawn at the start of the period (fees included)
+    custom_capital: np.ndarray        # requested custom capital per period
+    payment_dates: np.ndarray         # datetime64[D]
+    warnings: List[str] = field(default_factory=list)
+    accrual: Optional[Accrual] = None  # set unless the deal accrues monthly
+
+    @property
+    def term_months(self):
+        return len(self.rates)
+
+
+def round2(values):
+    """Element-wise ``round(x, 2)`` that matches Python's rounding exactly.
+
+    ``np.round`` scales by 100 before rounding, which can land a value that
+    sits on a half-cent on the other side of it; those few near-ties are
+    re-rounded with the builtin (on Python floats; ``round`` on an
+    ``np.float64`` falls back to NumPy's own rounding).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.round(values, 2)
+    scaled = values * 100
+    tolerance = np.maximum(1e-6, 4 * np.spacing(np.abs(scaled)))
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < tolerance
+    if near_tie.any():
+        out[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return out
+
+
+def day_numbers(dates, day_count):
+    """Day ordinal of each date under ``day_count``; differences are accrual days.
+
+    Act/365F and Act/360 count calendar days. 30/360 is the European (30E/360)
+    count: every month has 30 days and the 31st counts as the 30th.
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if day_count != "30/360":
+        return dates.astype(np.int64)
+    months = dates.astype("datetime64[M]")
+    day = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+    return months.astype(np.int64) * 30 + np.minimum(day, 30)
+
+
+def accrual_days(start, end, day_count):
+    """Element-wise accrual days from ``start`` to ``end`` under ``day_count``."""
+    return day_numbers(end, day_count) - day_numbers(start, day_count)
+
+
+def _compile_accrual(deal, dates, drawdown_flows, custom_flows, warnings):
+    """Place dated flows in the period whose payment date is on or after them.
+
+    Returns the ``Accrual`` plus the per-period drawdown and custom capital
+    totals. Flows after the final payment date fall outside the facility.
+    """
+    term = len(dates)
+    flows = [(when, amount) for when, amount in drawdown_flows]
+    flows += [(when, -amount) for when, amount in custom_flows]
+    flow_dates = np.array([when for when, _ in flows], dtype="datetime64[D]")
+    flow_amount = np.array([amount for _, amount in flows], dtype=np.float64)
+    flow_period = np.searchsorted(dates, flow_dates)
+
+    for when, period in zip(flow_dates[:len(drawdown_flows)].tolist(), flow_period.tolist()):
+        if period >= term:
+            warnings.append(f"Drawdown on {when} is after loan term – ignored")
+    inside = flow_period < term
+    # Same-day flows: the drawdown lands before any capital comes back
+    order = np.lexsort((flow_amount < 0, flow_dates, flow_period))
+    order = order[inside[order]]
+    flow_dates, flow_amount, flow_period = flow_dates[order], flow_amount[order], flow_period[order]
+
+    period_start = np.empty(term, dtype="datetime64[D]")
+    period_start[0] = np.datetime64(add_months(deal.first_payment_date, -1), "D")
+    period_start[1:] = dates[:-1]
+    accrual = Accrual(
+        day_count=deal.day_count,
+        period_days=accrual_days(period_start, dates, deal.day_count),
+        flow_period=flow_period,
+        flow_amount=flow_amount,
+        flow_days=accrual_days(flow_dates, dates[flow_period], deal.day_count),
+    )
+    drawdowns = np.bincount(flow_period, np.maximum(flow_amount, 0), minlength=term)
+    custom_capital = np.bincount(flow_period, np.maximum(-flow_amount, 0), minlength=term)
+    return accrual, drawdowns, custom_capital
+
+
+def _check_ranges(bands, label):
+    """Bands must start at period 1 and run on without overlaps or gaps."""
+    expected_from = 1
+    for band in sorted(bands, key=lambda x: x['from_period']):
+        from_period, to_period = band['from_period'], band['to_period']
+        if to_period < from_period:
+            raise DealError(f"{label} {from_period}–{to_period} ends before it starts")
+        if from_period < expected_from:
+            raise DealError(f"{label} starting at period {from_period} overlaps the previous band")
+        if from_period > expected_from:
+            gap = f"{expected_from}–{from_period - 1}" if from_period - 1 > expected_from else f"{expected_from}"
+            raise DealError(f"{label}s leave period {gap} uncovered")
+        expected_from = to_period + 1
+
+
+def _fill_bands(bands, key, term, fill):
+    """Spread ``band[key]`` over each band's periods; ``fill`` covers the rest."""
+    values = [fill] * term
+    for band in bands:
+        start, stop = band['from_period'] - 1, min(band['to_period'], term)
+        values[start:stop] = [band[key]] * max(0, stop - start)
+    return values
+
+
+def _structured_principal(deal):
+    """Structured Capital principal per period (zeros for every other structure)."""
+    if deal.repayment_structure == "Structured Capital" and deal.structured_payments:
+        _check_ranges(deal.structured_payments, "Payment structure")
+        return _fill_bands(deal.structured_payments, 'payment', deal.term_months, 0.0)
+    return [0.0] * deal.term_months
+
+
+# Inputs that only change how the balance is repaid, not the compiled rates, dates or flows
+STRUCTURE_FIELDS = ("repayment_structure", "structured_payments", "capitalisation_months", "monthly_payment", "residual")
+
+
+def restructure(compiled, deal):
+    """``compile_deal(deal)`` that reuses ``compiled`` when ``deal`` differs from it only in ``STRUCTURE_FIELDS``.
+
+    The rates, payment dates, drawdowns and custom capital (and any daily
+    accrual) are shared with ``compiled``; only the structured principal is
+    rebuilt. Any other change compiles ``deal`` from scratch.
+    """
+    base = compiled.deal
+    if any(getattr(base, f.name) != getattr(deal, f.name) for f in fields(deal) if f.name not in STRUCTURE_FIELDS):
+        return compile_deal(deal)
+    return replace(compiled, deal=deal, structured_principal=np.array(_structured_principal(deal), dtype=np.float64),
+                   warnings=list(compiled.warnings))
+
+
+def _check_term(deal):
+    if deal.term_months < 1:
+        raise DealError(f"Term must be at least one month (got {deal.term_months})")
+
+
+def compile_deal(deal):
+    """Validate ``deal`` and build its per-period arrays in O(term)."""
+    _check_term(deal)
+    term = deal.term_months
+    warnings = []
+    first_payment_date = deal.first_payment_date
+
+    if deal.rate_structure == "Variable Rate":
+        if not deal.rate_schedule:
+            raise DealError("Variable Rate needs at least one rate period")
+        _check_ranges(deal.rate_schedule, "Rate period")
+        bands = sorted(deal.rate_schedule, key=lambda x: x['from_period'])
+        # FIX #6: periods after the last band forward-fill its rate
+        rates = _fill_bands(bands, 'total_rate', term, bands[-1]['total_rate'])
+    else:
+        rates = [deal.interest_rate] * term
+
+    structured = _structured_principal(deal)
+
+    if deal.day_count not in DAY_COUNTS:
+        raise DealError(f"Unknown day count {deal.day_count!r}")
+    if deal.rounding not in ROUNDING_MODES:
+        raise DealError(f"Unknown rounding mode {deal.rounding!r}")
+    if deal.month_end not in MONTH_END_RULES:
+        raise DealError(f"Unknown month-end rule {deal.month_end!r}")
+    if deal.business_day not in BUSINESS_DAY_CONVENTIONS:
+        raise DealError(f"Unknown business day convention {deal.business_day!r}")
+    if deal.holidays not in HOLIDAY_CALENDARS:
+        raise DealError(f"Unknown holiday calendar {deal.holidays!r}")
+    dates = payment_dates(first_payment_date, term, deal.month_end, deal.business_day, deal.holidays)
+    if deal.day_count != "Monthly":
+        return _compile_daily(deal, dates, rates, structured, warnings)
+
+    with phase("lookups"):
+        # Periods are matched on the unadjusted payment month, so a business-day
+        # roll into the next month never moves a drawdown or repayment
+        months = payment_months(first_payment_date, term)
+
+        # FIX #3: Unified drawdown lookup - handles fees in multi-drawdown mode
+        drawdowns = np.zeros(term)
+        if deal.drawdown_structure == "Single Drawdown":
+            drawdowns[0] = deal.full_capital
+        elif deal.drawdown_schedule:
+            # FIX #4: Assign drawdowns before first payment to period 1 (the search puts them at 0)
+            periods, _ = period_of_month(months, [dd['date'] for dd in deal.drawdown_schedule])
+            for dd, period in zip(deal.drawdown_schedule, periods.tolist()):
+                if period >= term:
+                    warnings.append(f"Drawdown on {dd['date']} is after loan term – ignored")
+            inside = periods < term
+            amounts = np.array([dd['amount'] for dd in deal.drawdown_schedule], dtype=np.float64)
+            np.add.at(drawdowns, periods[inside], amounts[inside])
+
+        # Add capitalised fees to period 1 in multi-drawdown mode
+        total_fees = deal.total_fees
+        if deal.drawdown_structure != "Single Drawdown" and deal.capitalise_fees and total_fees > 0:
+            drawdowns[0] += total_fees
+
+        # FIX #5: Custom capital by year-month only (not exact date)
+        custom_capital = np.zeros(term)
+        if deal.custom_capital_schedule:
+            periods, in_term = period_of_month(months, [cc['date'] for cc in deal.custom_capital_schedule])
+            for cc, period, inside in zip(deal.custom_capital_schedule, periods.tolist(), in_term.tolist()):
+                if inside:
+                    custom_capital[period] = cc['amount']
+
+    return CompiledDeal(
+        deal=deal,
+        rates=np.array(rates, dtype=np.float64),
+        structured_principal=np.array(structured, dtype=np.float64),
+        drawdowns=drawdowns,
+        custom_capital=custom_capital,
+        payment_dates=dates,
+        warnings=warnings,
+    )
+
+
+def _compile_daily(deal, dates, rates, structured, warnings):
+    """``compile_deal`` for day-count deals: drawdowns and custom capital keep their dates."""
+    if deal.drawdown_structure == "Single Drawdown":
+        drawdown_date = deal.drawdown_date or add_months(deal.first_payment_date, -1)
+        drawdown_flows = [(drawdown_date, deal.full_capital)]
+    else:
+        drawdown_flows = sorted(((dd['date'], dd['amount']) for dd in deal.drawdown_schedule), key=lambda x: x[0])
+        # Capitalised fees are raised with the first drawdown
+        total_fees = deal.total_fees
+        if deal.capitalise_fees and total_fees > 0 and drawdown_flows:
+            drawdown_flows[0] = (drawdown_flows[0][0], drawdown_flows[0][1] + total_fees)
+    custom_flows = [(cc['date'], cc['amount']) for cc in deal.custom_capital_schedule or []]
+
+    with phase("lookups"):
+        accrual, drawdowns, custom_capital = _compile_accrual(deal, dates, drawdown_flows, custom_flows, warnings)
+    return CompiledDeal(
+        deal=deal,
+        rates=np.array(rates, dtype=np.float64),
+        structured_principal=np.array(structured, dtype=np.float64),
+        drawdowns=drawdowns,
+        custom_capital=custom_capital,
+        payment_dates=dates,
+        warnings=warnings,
+        accrual=accrual,
+    )
+
+
+# ───────────────────────────────────────────────────────────────
+# SUGGESTED PAYMENT
+# ───────────────────────────────────────────────────────────────
+def _annuity(balance, weights, residual):
+    """Level payment taking ``balance`` to ``residual`` when period k charges ``weights[k]``."""
+    if not len(weights):
+        return 0.0
+    growth = np.cumprod(1 + weights)
+    return round(float((balance * growth[-1] - residual) / np.sum(growth[-1] / growth)), 2)
+
+
+def _daily_suggested_payment(deal, compiled):
+    """Suggested payment on the deal's actual accrual periods and rates."""
+    accrual = compiled.accrual
+    weights = compiled.rates / 100 * accrual.period_factors
+    # Period 1 accrues from the first drawdown, not from a month before the first payment
+    if len(accrual.flow_period) and accrual.flow_period[0] == 0 and accrual.flow_amount[0] > 0:
+        weights[0] = compiled.rates[0] / 100 * accrual.flow_factors[0]
+    balance = deal.full_capital
+
+    if deal.repayment_structure == "Equal Installments":
+        return abs(_annuity(balance, weights, deal.residual))
+
+    if deal.repayment_structure == "Interest Only":
+        return round(balance * float(np.mean(weights)), 2)
+
+    if deal.repayment_structure == "Capitalised Interest":
+        cap = deal.capitalisation_months
+        if deal.term_months - cap <= 0:
+            return 0.0
+        for weight in weights[:cap].tolist():
+            balance = round(balance + round(balance * weight, 2), 2)
+        return abs(_annuity(balance, weights[cap:], deal.residual))
+
+    return 0.0
+
+
+def suggested_payment(deal, compiled=None):
+    """Monthly payment the page proposes before any override."""
+    _check_term(deal)
+    if deal.day_count != "Monthly":
+        return _daily_suggested_payment(deal, compiled or compile_deal(deal))
+
+    interest_rate = deal.base_rate
+    full_capital = deal.full_capital
+
+    if deal.repayment_structure == "Equal Installments":
+        return abs(calculate_pmt(interest_rate / 100, deal.term_months, full_capital, -deal.residual))
+
+    if deal.repayment_structure == "Interest Only":
+        return round(full_capital * (interest_rate / 100 / 12), 2)
+
+    if deal.repayment_structure == "Capitalised Interest":
+        # FIX #2: Use compound interest, not simple interest
+        remaining_months = deal.term_months - deal.capitalisation_months
+        if remaining_months <= 0:
+            return 0.0
+        if compiled is None:
+            compiled = compile_deal(deal)
+        # Simulate actual compounding during capitalisation period
+        sim_balance = full_capital
+        for sim_rate in compiled.rates[:deal.capitalisation_months].tolist():
+            sim_interest = round(sim_balance * (sim_rate / 100 / 12), 2)
+            sim_balance = round(sim_balance + sim_interest, 2)
+        return abs(calculate_pmt(interest_rate / 100, remaining_months, sim_balance, -deal.residual))
+
+    return 0.0
+
+
+# ───────────────────────────────────────────────────────────────
+# AMORTISATION SCHEDULE
+# ───────────────────────────────────────────────────────────────
+def generate_schedule(deal, vectorised=True, compiled=None):
+    """Build the schedule for ``deal`` and return a ``Schedule``.
+
+    Deals the NumPy kernel covers (see ``can_vectorise``) take the vectorised
+    path unless ``vectorised=False``; everything else runs the period loop,
+    compiled by Numba when ``AMORT_JIT=1`` (see ``loop_kernel``). All of them
+    produce identical output to the cent. Deals with a day count other
+    than ``Monthly`` run the daily-accrual engine. Raises ``DealError`` for
+    inputs ``compile_deal`` rejects.
+    """
+    if compiled is None:
+        compiled = compile_deal(deal)
+    monthly_payment = deal.monthly_payment
+    if monthly_payment is None:
+        with phase("suggested_payment"):
+            monthly_payment = suggested_payment(deal, compiled) if deal.repayment_structure != "Structured Capital" else 0.0
+    return run_compiled(compiled, monthly_payment, vectorised)
+
+
+def run_compiled(compiled, monthly_payment, vectorised=True):
+    """Price an already compiled deal at ``monthly_payment``."""
+    with phase("period_loop"):
+        if compiled.deal.rounding != "Float":
+            return _generate_cents(compiled, monthly_payment)
+        if compiled.accrual is not None:
+            return _generate_daily(compiled, monthly_payment)
+        if vectorised and can_vectorise(compiled):
+            return _generate_vectorised(compiled, monthly_payment)
+        if loop_kernel.JIT_AVAILABLE:
+            return _generate_jit(compiled, monthly_payment)
+        return _generate_loop(compiled, monthly_payment)
+
+
+def _final_check(balance, residual, warnings):
+    """Warn when the closing balance misses the residual by more than R1."""
+    expected_final = residual if residual > 0 else 0.0
+    if abs(balance - expected_final) > 1.0:  # Allow R1 rounding tolerance
+        warnings.append(f"⚠️ Final balance R{balance:,.2f} differs from expected R{expected_final:,.2f}")
+    return expected_final
+
+
+def _generate_loop(compiled, monthly_payment, start=0, balance=0.0):
+    """Reference period-by-period engine; handles every structure.
+
+    ``start`` / ``balance`` resume after ``start`` periods that closed on
+    ``balance`` (see ``regenerate``); the result then holds only the rest.
+    """
+    deal = compiled.deal
+    warnings = list(compiled.warnings)
+    repayment_structure = deal.repayment_structure
+    term_months = deal.term_months
+    residual = deal.residual
+    capitalisation_months = deal.capitalisation_months
+
+    # Plain Python floats: builtin round() on NumPy scalars rounds differently
+    rates = compiled.rates.tolist()
+    drawdowns = compiled.drawdowns.tolist()
+    structured = compiled.structured_principal.tolist()
+    custom_requested = compiled.custom_capital.tolist()
+
+    columns = _allocate_columns(term_months - start)
+    opening_col, drawdown_col, before_col = columns["Opening Balance"], columns["Drawdown"], columns["Balance Before Interest"]
+    rate_col, interest_col, regular_col = columns["Interest Rate %"], columns["Interest"], columns["Regular Principal"]
+    custom_col, principal_col = columns["Custom Capital"], columns["Total Principal"]
+    payment_col, ending_col = columns["Total Payment"], columns["Ending Balance"]
+
+    for period in range(start + 1, term_months + 1):
+        k = period - 1
+        row = k - start
+        opening_balance = balance
+
+        # Apply drawdown at beginning of period
+        drawdown = drawdowns[k]
+        balance += drawdown
+        balance_before_interest = round(balance, 2)
+
+        current_rate = rates[k]
+
+        # Calculate interest
+        interest = round(balance_before_interest * (current_rate / 100 / 12), 2)
+
+        # Initialize payment variables
+        regular_principal = 0.0
+        regular_payment = interest
+        is_cap_period = (repayment_structure == "Capitalised Interest" and period <= capitalisation_months)
+
+        # Determine regular principal payment based on structure
+        if is_cap_period:
+            # Capitalise interest - negative principal
+            regular_principal = -interest
+            regular_payment = 0.0
+
+        elif repayment_structure in ("Equal Installments", "Capitalised Interest"):
+            # After capitalisation period, capitalised interest amortises like equal installments
+            regular_principal = monthly_payment - interest
+
+            # Guard against negative amortisation
+            if regular_principal < 0:
+                regular_principal = 0.0
+
+            regular_payment = monthly_payment
+
+        elif repayment_structure == "Interest Only":
+            regular_principal = 0.0
+            regular_payment = interest
+
+        elif repayment_structure == "Structured Capital":
+            regular_principal = structured[k]
+            regular_payment = interest + regular_principal
+
+        # FIX #7: Proper residual handling for final period - ALL structures
+        if period == term_months:
+            if repayment_structure == "Interest Only":
+                # Interest-only final period pays off balance minus residual
+                regular_principal = max(0, balance_before_interest - residual)
+                regular_payment = interest + regular_principal
+            elif residual > 0:
+                # All other structures: cap principal at balance minus residual
+                max_principal = max(0, balance_before_interest - residual)
+                regular_principal = min(regular_principal, max_principal)
+                regular_payment = interest + regular_principal
+
+        # Apply custom capital repayments
+        custom_capital = custom_requested[k]
+        if custom_capital:
+            # Cannot exceed what's left after regular repayment
+            remaining_after_regular = balance_before_interest - regular_principal
+            custom_capital = min(custom_capital, max(0, remaining_after_regular))
+
+        # Calculate totals
+        total_principal = regular_principal + custom_capital
+        total_payment = interest + total_principal
+
+        # Update balance
+        balance = round(balance_before_interest - total_principal, 2)
+        balance = max(0.0, balance)  # Never negative
+
+        opening_col[row] = round(opening_balance, 2)
+        drawdown_col[row] = round(drawdown, 2)
+        before_col[row] = balance_before_interest
+        rate_col[row] = round(current_rate, 4)
+        interest_col[row] = interest
+        regular_col[row] = round(regular_principal, 2)
+        custom_col[row] = round(custom_capital, 2)
+        principal_col[row] = round(total_principal, 2)
+        payment_col[row] = round(total_payment, 2)
+        ending_col[row] = balance
+
+    # Final validation
+    expected_final = _final_check(balance, residual, warnings)
+
+    return Schedule(columns=_with_periods(columns, compiled, start), monthly_payment=monthly_payment,
+                    expected_final=expected_final, warnings=warnings)
+
+
+# ───────────────────────────────────────────────────────────────
+# COMPILED LOOP
+# ───────────────────────────────────────────────────────────────
+def _generate_jit(compiled, monthly_payment, start=0, balance=0.0, jit=True):
+    """``_generate_loop`` run by the Numba kernel in ``loop_kernel``; identical output to the bit.
+
+    ``jit=False`` runs the same kernel as plain Python (see ``parity.py``).
+    """
+    deal = compiled.deal
+    warnings = list(compiled.warnings)
+    out, balance = loop_kernel.run_loop(
+        REPAYMENT_STRUCTURES.index(deal.repayment_structure), compiled.rates, compiled.drawdowns,
+        compiled.structured_principal, compiled.custom_capital, monthly_payment, deal.residual,
+        deal.capitalisation_months, start, balance, jit=jit,
+    )
+    columns = dict(zip(_allocate_columns(0), out))
+    expected_final = _final_check(balance, deal.residual, warnings)
+    return Schedule(columns=_with_periods(columns, compiled, start), monthly_payment=monthly_payment,
+                    expected_final=expected_final, warnings=warnings)
+
+
+# ───────────────────────────────────────────────────────────────
+# VECTORISED KERNEL
+# ───────────────────────────────────────────────────────────────
+def can_vectorise(compiled):
+    """True for fixed-rate Equal Installments / Interest Only deals with one drawdown."""
+    deal = compiled.deal
+    return (
+        deal.repayment_structure in ("Equal Installments", "Interest Only")
+        and deal.rate_structure == "Fixed Rate"
+        and deal.drawdown_structure == "Single Drawdown"
+        and not compiled.custom_capital.any()
+        and deal.full_capital >= 0
+    )
+
+
+def _generate_vectorised(compiled, monthly_payment):
+    """Array implementation of the loop for the structures ``can_vectorise`` accepts."""
+    deal = compiled.deal
+    warnings = list(compiled.warnings)
+    n = deal.term_months
+    residual = deal.residual
+    rate_m = deal.interest_rate / 100 / 12
+
+    drawdown = np.zeros(n)
+    drawdown[0] = round(deal.full_capital, 2)
+    opening_capital = round(deal.full_capital, 2)
+
+    if deal.repayment_structure == "Interest Only":
+        # Balance never moves until the final period, so every column is a constant
+        interest = np.full(n, round(opening_capital * rate_m, 2))
+        balance_before_interest = np.full(n, opening_capital)
+        regular_principal = np.zeros(n)
+        regular_principal[-1] = max(0, opening_capital - residual)
+        ending_balance = balance_before_interest.copy()
+        ending_balance[-1] = max(0.0, round(opening_capital - regular_principal[-1], 2))
+    else:
+        # Each balance is rounded to the cent before the next period's interest is
+        # charged, so the balance chain has no closed form. Step just that
+        # recurrence with scalars; every other column is derived from it below.
+        balance_before_interest = np.empty(n)
+        interest = np.empty(n)
+        regular_principal = np.empty(n)
+        ending_balance = np.empty(n)
+        balance = opening_capital
+        for k in range(n):
+            balance_before_interest[k] = balance
+            period_interest = round(balance * rate_m, 2)
+            principal = monthly_payment - period_interest
+            if principal < 0:
+                principal = 0.0
+            if k == n - 1 and residual > 0:
+                principal = min(principal, max(0, balance - residual))
+            interest[k] = period_interest
+            regular_principal[k] = principal
+            balance = round(balance - principal, 2)
+            if balance < 0:
+                balance = 0.0
+            ending_balance[k] = balance
+
+    opening_balance = np.empty(n)
+    opening_balance[0] = 0.0
+    opening_balance[1:] = ending_balance[:-1]
+
+    total_payment = round2(interest + regular_principal)
+    regular_principal = round2(regular_principal)
+
+    columns = {
+        "Opening Balance": opening_balance,
+        "Drawdown": drawdown,
+        "Balance Before Interest": balance_before_interest,
+        "Interest Rate %": np.full(n, round(deal.interest_rate, 4)),
+        "Interest": interest,
+        "Regular Principal": regular_principal,
+        "Custom Capital": np.zeros(n),
+        "Total Principal": regular_principal,
+        "Total Payment": total_payment,
+        "Ending Balance": ending_balance,
+    }
+
+    expected_final = _final_check(float(ending_balance[-1]), residual, warnings)
+    return Schedule(columns=_with_periods(columns, compiled), monthly_payment=monthly_payment,
+                    expected_final=expected_final, warnings=warnings)
+
+
+# ───────────────────────────────────────────────────────────────
+# DAILY ACCRUAL
+# ───────────────────────────────────────────────────────────────
+def _generate_daily(compiled, monthly_payment, start=0, balance=0.0):
+    """Period engine for day-count deals.
+
+    Interest for a period is the opening balance times the period's rate and
+    year fraction, plus each dated flow times the fraction from its own date
+    to the payment date, rounded to the cent once. Every factor is computed
+    up front as an array, so the loop only does a few multiplications per
+    period and per flow however many days the facility runs.
+    """
+    deal = compiled.deal
+    accrual = compiled.accrual
+    warnings = list(compiled.warnings)
+    repayment_structure = deal.repayment_structure
+    term_months = deal.term_months
+    residual = deal.residual
+    capitalisation_months = deal.capitalisation_months
+
+    rates = compiled.rates / 100
+    period_weights = (rates * accrual.period_factors).tolist()
+    flow_weights = (rates[accrual.flow_period] * accrual.flow_factors).tolist()
+    flow_amounts = accrual.flow_amount.tolist()
+    flow_bounds = np.searchsorted(accrual.flow_period, np.arange(term_months + 1)).tolist()
+    structured = compiled.structured_principal.tolist()
+    rate_column = compiled.rates.tolist()
+
+    columns = _allocate_columns(term_months - start)
+    opening_col, drawdown_col, before_col = columns["Opening Balance"], columns["Drawdown"], columns["Balance Before Interest"]
+    rate_col, interest_col, regular_col = columns["Interest Rate %"], columns["Interest"], columns["Regular Principal"]
+    custom_col, principal_col = columns["Custom Capital"], columns["Total Principal"]
+    payment_col, ending_col = columns["Total Payment"], columns["Ending Balance"]
+
+    for k in range(start, term_months):
+        period = k + 1
+        row = k - start
+        opening_balance = balance
+        accrued = opening_balance * period_weights[k]
+        drawdown = custom_capital = 0.0
+
+        # Dated flows: a drawdown accrues from its date, custom capital stops accruing from its date
+        for i in range(flow_bounds[k], flow_bounds[k + 1]):
+            amount = flow_amounts[i]
+            if amount < 0:
+                amount = -min(-amount, max(0.0, balance))
+                custom_capital -= amount
+            else:
+                drawdown += amount
+            balance += amount
+            accrued += amount * flow_weights[i]
+
+        balance_before_interest = round(opening_balance + drawdown, 2)
+        balance = round(balance, 2)
+        interest = round(accrued, 2)
+
+        is_cap_period = (repayment_structure == "Capitalised Interest" and period <= capitalisation_months)
+        if is_cap_period:
+            regular_principal = -interest
+        elif repayment_structure in ("Equal Installments", "Capitalised Interest"):
+            regular_principal = max(0.0, monthly_payment - interest)
+        elif repayment_structure == "Structured Capital":
+            regular_principal = structured[k]
+        else:
+            regular_principal = 0.0
+
+        # FIX #7: Proper residual handling for final period - ALL structures
+        if period == term_months:
+            if repayment_structure == "Interest Only":
+                regular_principal = max(0, balance - residual)
+            elif residual > 0:
+                regular_principal = min(regular_principal, max(0, balance - residual))
+
+        total_principal = regular_principal + custom_capital
+        balance = max(0.0, round(balance - regular_principal, 2))
+
+        opening_col[row] = round(opening_balance, 2)
+        drawdown_col[row] = round(drawdown, 2)
+        before_col[row] = balance_before_interest
+        rate_col[row] = round(rate_column[k], 4)
+        interest_col[row] = interest
+        regular_col[row] = round(regular_principal, 2)
+        custom_col[row] = round(custom_capital, 2)
+        principal_col[row] = round(total_principal, 2)
+        payment_col[row] = round(interest + total_principal, 2)
+        ending_col[row] = balance
+
+    expected_final = _final_check(balance, residual, warnings)
+    return Schedule(columns=_with_periods(columns, compiled, start), monthly_payment=monthly_payment,
+                    expected_final=expected_final, warnings=warnings)
+
+
+# ───────────────────────────────────────────────────────────────
+# INTEGER CENTS
+# ───────────────────────────────────────────────────────────────
+RATE_SCALE = 10_000  # rates are held in units of 0.0001%
+
+
+def to_cents(values):
+    """Rand amounts (scalar or array) as int64 cents, rounded to the nearest cent."""
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def divide_round(numerator, denominator, mode="Half Up"):
+    """``numerator / denominator`` rounded to an integer without going through floats.
+
+    ``Half Up`` rounds halves away from zero; ``Half Even`` rounds them to the
+    even neighbour (banker's rounding). ``denominator`` must be positive.
+    """
+    sign = -1 if numerator < 0 else 1
+    quotient, remainder = divmod(abs(numerator), denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and (mode == "Half Up" or quotient % 2)):
+        quotient += 1
+    return sign * quotient
+
+
+def _generate_cents(compiled, monthly_payment, start=0, balance=0.0):
+    """Period engine on integer cents for ``Half Up`` / ``Half Even`` deals.
+
+    Balances, flows and payments are Python ints (cents) and rates are ints in
+    0.0001% steps, so interest is one exact integer division rounded the way
+    ``deal.rounding`` says. That is the only rounding point: every other
+    column is a sum of whole cents. Monthly deals charge ``rate / 12``;
+    day-count deals follow ``_generate_daily`` (dated flows first, then the
+    regular principal).
+    """
+    deal = compiled.deal
+    accrual = compiled.accrual
+    mode = deal.rounding
+    warnings = list(compiled.warnings)
+    repayment_structure = deal.repayment_structure
+    term_months = deal.term_months
+    residual = int(to_cents(deal.residual))
+    capitalisation_months = deal.capitalisation_months
+    payment = int(to_cents(monthly_payment))
+
+    # Interest for period k is round(balance * period_weights[k] / denominator)
+    rates = np.rint(compiled.rates * RATE_SCALE).astype(np.int64)
+    if accrual is None:
+        denominator = 12 * 100 * RATE_SCALE
+        period_weights = rates.tolist()
+        flow_bounds = [0] * (term_months + 1)
+        flow_weights = flow_amounts = []
+    else:
+        denominator = accrual.basis * 100 * RATE_SCALE
+        period_weights = (rates * accrual.period_days).tolist()
+        flow_weights = (rates[accrual.flow_period] * accrual.flow_days).tolist()
+        flow_amounts = to_cents(accrual.flow_amount).tolist()
+        flow_bounds = np.searchsorted(accrual.flow_period, np.arange(term_months + 1)).tolist()
+    drawdowns = to_cents(compiled.drawdowns).tolist()
+    custom_requested = to_cents(compiled.custom_capital).tolist()
+    structured = to_cents(compiled.structured_principal).tolist()
+
+    names = ["Opening Balance", "Drawdown", "Balance Before Interest", "Interest", "Regular Principal",
+             "Custom Capital", "Total Principal", "Total Payment", "Ending Balance"]
+    cents = np.empty((len(names), term_months - start), dtype=np.int64)
+    balance = int(to_cents(balance))
+
+    for k in range(start, term_months):
+        period = k + 1
+        opening_balance = balance
+
+        if accrual is None:
+            drawdown = drawdowns[k]
+            balance += drawdown
+            accrued, custom_capital = balance * period_weights[k], 0
+        else:
+            accrued = opening_balance * period_weights[k]
+            drawdown = custom_capital = 0
+            for i in range(flow_bounds[k], flow_bounds[k + 1]):
+                amount = flow_amounts[i]
+                if amount < 0:
+                    amount = -min(-amount, max(0, balance))
+                    custom_capital -= amount
+                else:
+                    drawdown += amount
+                balance += amount
+                accrued += amount * flow_weights[i]
+        balance_before_interest = opening_balance + drawdown
+        interest = divide_round(accrued, denominator, mode)
+
+        if repayment_structure == "Capitalised Interest" and period <= capitalisation_months:
+            regular_principal = -interest
+        elif repayment_structure in ("Equal Installments", "Capitalised Interest"):
+            regular_principal = max(0, payment - interest)
+        elif repayment_structure == "Structured Capital":
+            regular_principal = structured[k]
+        else:
+            regular_principal = 0
+
+        # FIX #7: Proper residual handling for final period - ALL structures
+        if period == term_months:
+            if repayment_structure == "Interest Only":
+                regular_principal = max(0, balance - residual)
+            elif residual > 0:
+                regular_principal = min(regular_principal, max(0, balance - residual))
+
+        if accrual is None and custom_requested[k]:
+            custom_capital = min(custom_requested[k], max(0, balance - regular_principal))
+            balance -= custom_capital
+        balance = max(0, balance - regular_principal)
+        total_principal = regular_principal + custom_capital
+
+        cents[:, k - start] = (opening_balance, drawdown, balance_before_interest, interest, regular_principal,
+                               custom_capital, total_principal, interest + total_principal, balance)
+
+    columns = dict(zip(names, cents / 100))
+    columns["Interest Rate %"] = rates[start:] / RATE_SCALE
+
+    expected_final = _final_check(balance / 100, residual / 100, warnings)
+    return Schedule(columns=_with_periods(columns, compiled, start), monthly_payment=payment / 100,
+                    expected_final=expected_final, warnings=warnings)
+
+
+# ───────────────────────────────────────────────────────────────
+# INCREMENTAL RECOMPUTE
+# ───────────────────────────────────────────────────────────────
+def _first_difference(a, b):
+    """First index where two equal-length arrays differ, or ``len(a)``."""
+    differs = np.flatnonzero(a != b)
+    return int(differs[0]) if differs.size else len(a)
+
+
+def _first_flow_difference(a, b):
+    """First period whose dated flows differ between two ``Accrual``s."""
+    n = min(len(a.flow_period), len(b.flow_period))
+    first = min(_first_difference(a.flow_period[:n], b.flow_period[:n]),
+                _first_difference(a.flow_amount[:n], b.flow_amount[:n]),
+                _first_difference(a.flow_days[:n], b.flow_days[:n]))
+    # Flows are sorted by period, so the first differing flow is in the first differing period
+    periods = [p[first] for p in (a.flow_period, b.flow_period) if first < len(p)]
+    return int(min(periods)) if periods else None
+
+
+def first_changed_period(old, new, old_payment, new_payment):
+    """Index of the first period whose row can differ between two compiled deals.
+
+    Every row before it depends only on inputs both deals share, so it can be
+    kept. Returns ``new.term_months`` when nothing differs, and 0 when the
+    change reaches back to period 1 (term, structure, dates, accrual or
+    rounding mode).
+    """
+    a, b = old.deal, new.deal
+    term = b.term_months
+    if (a.term_months != term or a.repayment_structure != b.repayment_structure
+            or a.first_payment_date != b.first_payment_date
+            or a.day_count != b.day_count or a.rounding != b.rounding):
+        return 0
+
+    first = min(
+        _first_difference(old.rates, new.rates),
+        _first_difference(old.drawdowns, new.drawdowns),
+        _first_difference(old.custom_capital, new.custom_capital),
+        _first_difference(old.structured_principal, new.structured_principal),
+        _first_difference(old.payment_dates, new.payment_dates),
+    )
+    if new.accrual is not None:
+        first = min(first, _first_difference(old.accrual.period_days, new.accrual.period_days))
+        flow_period = _first_flow_difference(old.accrual, new.accrual)
+        if flow_period is not None:
+            first = min(first, flow_period)
+
+    cap_months = b.capitalisation_months if b.repayment_structure == "Capitalised Interest" else 0
+    if a.capitalisation_months != b.capitalisation_months and b.repayment_structure == "Capitalised Interest":
+        # Rows differ from the shorter capitalisation period on (from period 1 when either side is 0)
+        first = min(first, a.capitalisation_months, b.capitalisation_months)
+    if old_payment != new_payment and b.repayment_structure in ("Equal Installments", "Capitalised Interest"):
+        first = min(first, cap_months)
+    if a.residual != b.residual:
+        first = min(first, term - 1)  # FIX #7 only touches the final period
+    return first
+
+
+def regenerate(previous, old_compiled, deal, compiled=None):
+    """``generate_schedule(deal)`` that reuses the unchanged start of ``previous``.
+
+    ``previous`` is the schedule priced from ``old_compiled``. Only periods
+    from the first one the edit can affect are recomputed, starting from the
+    ending balance ``previous`` checkpointed just before it, and spliced onto
+    its prefix. Returns ``(schedule, first_recomputed_index)``.
+    """
+    if compiled is None:
+        compiled = compile_deal(deal)
+    monthly_payment = deal.monthly_payment
+    if monthly_payment is None:
+        with phase("suggested_payment"):
+            monthly_payment = suggested_payment(deal, compiled) if deal.repayment_structure != "Structured Capital" else 0.0
+
+    start = first_changed_period(old_compiled, compiled, previous.monthly_payment, monthly_payment)
+    if start == 0:
+        return run_compiled(compiled, monthly_payment), 0
+    if start >= deal.term_months:
+        warnings = list(compiled.warnings)
+        _final_check(previous.final_balance, deal.residual, warnings)
+        return replace(previous, monthly_payment=monthly_payment, warnings=warnings), start
+
+    opening = previous.columns["Ending Balance"][start - 1].item()
+    with phase("period_loop"):
+        if deal.rounding != "Float":
+            suffix = _generate_cents(compiled, monthly_payment, start, opening)
+        elif compiled.accrual is not None:
+            suffix = _generate_daily(compiled, monthly_payment, start, opening)
+        elif loop_kernel.JIT_AVAILABLE:
+            suffix = _generate_jit(compiled, monthly_payment, start, opening)
+        else:
+            suffix = _generate_loop(compiled, monthly_payment, start, opening)
+
+    prefix, rest = previous.columns, suffix.columns
+    columns = {name: np.concatenate([prefix[name][:start], rest[name]]) for name in SCHEDULE_COLUMNS}
+    return replace(suffix, columns=columns), start
+
+
+# ───────────────────────────────────────────────────────────────
+# SUMMARY
+# ───────────────────────────────────────────────────────────────
+def summarise(columns):
+    """Headline totals shown under the schedule, from ``Schedule.columns`` or its DataFrame."""
+    column = lambda name: np.asarray(columns[name])
+    principal = column('Total Principal')
+    # FIX #8: Corrected summary metrics (exclude negative principal)
+    return {
+        "Total Drawn": column('Drawdown').sum(),
+        "Total Interest": column('Interest').sum(),
+        # Only sum positive principal (exclude capitalised interest periods)
+        "Total Principal Repaid": principal[principal > 0].sum(),
+        "Total Custom Capital": column('Custom Capital').sum(),
+        "Final Balance": column('Ending Balance')[-1],
+    }
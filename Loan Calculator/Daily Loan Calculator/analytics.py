@@ -0,0 +1,189 @@
+"""Yield and life analytics from a schedule's dated cashflows.
+
+Each deal's cashflows sit on its payment grid: the start of period 1 (a
+month before the first payment) followed by every payment date. Drawdowns
+go out at the start of the period they are drawn in, as the engine charges
+them a full period's interest, and installments plus any balance left at
+maturity come back on the payment dates. Capitalised fees are part of the
+first drawdown on the schedule but are never paid out in cash, so taking
+them off the first drawdown gives the facility's all-in cost.
+
+``analyse`` stacks any number of deals into one matrix and solves every
+XIRR together with a vectorised Newton iteration (bisection picks up the
+few that do not converge):
+
+    rows = analyse([(deal, schedule), ...])
+    rows[0]["Effective Rate incl. Fees %"]
+
+A caller that cannot keep the schedules until the solve (``batch`` writes
+each one out as it arrives) keeps only their ``deal_flows`` instead:
+
+    rows = analyse_flows([deal_flows(deal, schedule), ...])
+"""
+import numpy as np
+
+from payment_calendar import add_months
+
+ANALYTICS_FIELDS = [
+    "XIRR %", "Effective Rate incl. Fees %", "WAL (years)",
+    "Macaulay Duration (years)", "Modified Duration (years)",
+]
+
+DAYS_PER_YEAR = 365.0
+MIN_RATE = -0.99
+
+
+# ───────────────────────────────────────────────────────────────
+# CASHFLOWS
+# ───────────────────────────────────────────────────────────────
+def cashflows(deal, schedule):
+    """Lender-side flows on the payment grid: ``(years, lent, received, fees)``.
+
+    ``years`` runs from the start of period 1 (Act/365); ``lent`` and
+    ``received`` are the amounts out and back at each grid date; ``fees`` is
+    the capitalised fee total included in ``lent`` but never paid out.
+    """
+    columns = schedule.columns
+    n = len(schedule)
+    grid = np.empty(n + 1, dtype="datetime64[D]")
+    grid[0] = np.datetime64(add_months(deal.first_payment_date, -1), "D")
+    grid[1:] = columns["Payment Date"]
+    years = (grid - grid[0]).astype(np.float64) / DAYS_PER_YEAR
+
+    lent = np.zeros(n + 1)
+    lent[:n] = columns["Drawdown"]
+    received = np.zeros(n + 1)
+    received[1:] = columns["Total Payment"]
+    received[n] += schedule.final_balance  # residual / anything left is repaid at maturity
+    return years, lent, received, deal.total_fees
+
+
+def deal_flows(deal, schedule):
+    """``cashflows`` plus the principal repaid at each grid date: everything ``analyse_flows`` needs.
+
+    A handful of arrays per deal, so a caller can drop the schedule itself
+    as soon as it is written out.
+    """
+    years, lent, received, fees = cashflows(deal, schedule)
+    n = len(schedule)
+    principal = np.zeros(n + 1)
+    principal[1:] = np.maximum(schedule.columns["Total Principal"], 0)
+    principal[n] += schedule.final_balance
+    return years, lent, received, fees, principal
+
+
+def _stack(flows):
+    """Pad every deal's flows into ``deals x flows`` matrices (zero amounts past a deal's end)."""
+    width = max((len(years) for years, *_ in flows), default=0)
+    years = np.zeros((len(flows), width))
+    lent = np.zeros((len(flows), width))
+    received = np.zeros((len(flows), width))
+    cash_lent = np.zeros((len(flows), width))
+    principal = np.zeros((len(flows), width))
+    for row, (t, out, back, fees, repaid) in enumerate(flows):
+        n = len(t)
+        years[row, :n], lent[row, :n], received[row, :n], principal[row, :n] = t, out, back, repaid
+        cash_lent[row, :n] = out
+        drawn = np.flatnonzero(out > 0)
+        if fees and drawn.size:
+            cash_lent[row, drawn[0]] = max(0.0, out[drawn[0]] - fees)
+    return years, lent, received, cash_lent, principal
+
+
+# ───────────────────────────────────────────────────────────────
+# SOLVERS
+# ───────────────────────────────────────────────────────────────
+def _npv(rates, years, amounts):
+    """NPV of each row at its annual rate, and the derivative with respect to the rate."""
+    discount = (1 + rates[:, None]) ** -years
+    pv = amounts * discount
+    return pv.sum(axis=1), -(years * pv).sum(axis=1) / (1 + rates)
+
+
+def xirr(years, amounts, guess=0.1, tol=1e-10, max_iter=50):
+    """Annual IRR of every row of ``amounts`` dated at ``years`` (NaN where none exists).
+
+    Rows need at least one negative and one positive flow. Newton steps run
+    on all unconverged rows at once; rows it cannot settle fall back to
+    bisection on ``[MIN_RATE, 100]`` if the NPV changes sign there.
+    """
+    years = np.atleast_2d(np.asarray(years, dtype=np.float64))
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=np.float64))
+    rates = np.full(len(amounts), np.nan)
+    valid = (amounts < 0).any(axis=1) & (amounts > 0).any(axis=1)
+
+    todo = np.flatnonzero(valid)
+    rate = np.full(todo.size, float(guess))
+    for _ in range(max_iter):
+        if not todo.size:
+            break
+        npv, slope = _npv(rate, years[todo], amounts[todo])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = npv / slope
+        stepped = rate - step
+        # Keep each iterate inside the domain: halve the way towards MIN_RATE instead of crossing it
+        stepped = np.where(stepped <= MIN_RATE, (rate + MIN_RATE) / 2, stepped)
+        done = np.isfinite(step) & (np.abs(step) < tol)
+        rates[todo[done]] = stepped[done]
+        keep = ~done & np.isfinite(stepped)
+        todo, rate = todo[keep], stepped[keep]
+
+    unsolved = np.flatnonzero(valid & np.isnan(rates))
+    if unsolved.size:
+        rates[unsolved] = _bisect(years[unsolved], amounts[unsolved])
+    return rates
+
+
+def _bisect(years, amounts, high=100.0, iterations=200):
+    low = np.full(len(amounts), MIN_RATE)
+    high = np.full(len(amounts), high)
+    npv_low = _npv(low, years, amounts)[0]
+    bracketed = np.sign(npv_low) != np.sign(_npv(high, years, amounts)[0])
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        npv_mid = _npv(mid, years, amounts)[0]
+        same = np.sign(npv_mid) == np.sign(npv_low)
+        low, npv_low = np.where(same, mid, low), np.where(same, npv_mid, npv_low)
+        high = np.where(same, high, mid)
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+# ───────────────────────────────────────────────────────────────
+# ANALYTICS
+# ───────────────────────────────────────────────────────────────
+def analyse(pairs):
+    """``ANALYTICS_FIELDS`` for each ``(deal, schedule)`` pair, solved in one vectorised pass.
+
+    XIRR is the yield on the flows as scheduled; the effective rate counts
+    only the cash actually lent (net of capitalised fees). WAL weights each
+    principal repayment (and the balance repaid at maturity) by its time
+    from the start of period 1; durations discount the repayments at XIRR.
+    """
+    return analyse_flows(deal_flows(deal, schedule) for deal, schedule in pairs)
+
+
+def analyse_flows(flows):
+    """``analyse`` from each deal's ``deal_flows`` rather than its schedule."""
+    flows = list(flows)
+    if not flows:
+        return []
+    years, lent, received, cash_lent, principal = _stack(flows)
+    irr = xirr(years, received - lent)
+    all_in = xirr(years, received - cash_lent)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wal = (years * principal).sum(axis=1) / principal.sum(axis=1)
+        pv = received * (1 + irr[:, None]) ** -years
+        macaulay = (years * pv).sum(axis=1) / pv.sum(axis=1)
+    modified = macaulay / (1 + irr)
+
+    return [
+        {
+            "XIRR %": round(float(irr[i]) * 100, 4),
+            "Effective Rate incl. Fees %": round(float(all_in[i]) * 100, 4),
+            "WAL (years)": round(float(wal[i]), 4),
+            "Macaulay Duration (years)": round(float(macaulay[i]), 4),
+            "Modified Duration (years)": round(float(modified[i]), 4),
+        }
+        for i in range(len(flows))
+    ]
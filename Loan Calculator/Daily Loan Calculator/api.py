@@ -0,0 +1,264 @@
+"""Local JSON pricing API on asyncio, backed by a process pool.
+
+Deals are posted as JSON using the same fields as a batch book row (see
+``batch.py``): ``Deal`` field names plus the ``fees``, ``drawdowns``,
+``rate_periods``, ``custom_capital`` and ``structured_payments`` lists.
+
+    POST /schedule           schedule columns and rows, payment, warnings
+    POST /summary            headline totals, XIRR / WAL / duration, payment, warnings
+    POST /suggested-payment  the page's suggested monthly payment
+    POST /export?format=xlsx the export file (xlsx, csv or parquet)
+    GET  /health             pool and queue status
+
+The event loop only parses requests and writes responses; pricing runs in a
+``ProcessPoolExecutor``. At most ``max_pending`` requests are in flight and
+anything beyond that is turned away with ``503`` straight away, so a burst
+cannot queue up unbounded work. Every response carries a ``Server-Timing``
+header (queue, price and total milliseconds).
+
+    python api.py --port 8080 --workers 8 --max-pending 512
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, quote, urlsplit
+
+from amortisation import SCHEDULE_COLUMNS, DealError, suggested_payment
+from batch import deal_from_record
+from export import EXPORT_FORMATS, export_bytes, export_filename
+from schedule_cache import get_or_compute
+
+MAX_BODY = 1 << 20
+EXPORT_EXTENSIONS = {extension: (name, mime) for name, (extension, mime) in EXPORT_FORMATS.items()}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def content_disposition(filename):
+    """Attachment header for ``filename``: an ASCII ``filename`` for any client plus the exact name
+    as RFC 5987 ``filename*`` (headers go out as latin-1, so a client name in another script would not encode)."""
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace("?", "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+# ───────────────────────────────────────────────────────────────
+# WORKER
+# ───────────────────────────────────────────────────────────────
+def _schedule(deal, result):
+    schedule = result.schedule
+    return {
+        "monthly_payment": schedule.monthly_payment,
+        "expected_final": schedule.expected_final,
+        "warnings": schedule.warnings,
+        "columns": SCHEDULE_COLUMNS,
+        "rows": [list(row) for row in schedule.iter_rows()],
+    }
+
+
+def _summary(deal, result):
+    schedule = result.schedule
+    return {
+        **{name: round(float(value), 2) for name, value in result.summary.items()},
+        **{name: None if value != value else value for name, value in result.analytics.items()},
+        "monthly_payment": schedule.monthly_payment,
+        "expected_final": schedule.expected_final,
+        "warnings": schedule.warnings,
+    }
+
+
+def price(endpoint, record, fmt=None):
+    """Run one request in a worker. Returns ``(status, payload, price_seconds)``.
+
+    JSON endpoints return a dict; ``export`` returns ``(bytes, mime, filename)``.
+    Each worker keeps its own LRU of priced deals (``schedule_cache``).
+    """
+    start = time.perf_counter()
+    try:
+        deal = deal_from_record(record)
+        if endpoint == "suggested-payment":
+            payload = {"suggested_payment": suggested_payment(deal)}
+        else:
+            result = get_or_compute(deal)
+            if endpoint == "schedule":
+                payload = _schedule(deal, result)
+            elif endpoint == "summary":
+                payload = _summary(deal, result)
+            else:
+                name, mime = EXPORT_EXTENSIONS[fmt]
+                data = export_bytes(name, deal, result.schedule)  # not pinned to the cached deal
+                payload = (data, mime, export_filename(deal, fmt))
+        status = HTTPStatus.OK
+    except (DealError, KeyError, TypeError, ValueError) as exc:
+        status, payload = HTTPStatus.BAD_REQUEST, {"error": f"{type(exc).__name__}: {exc}"}
+    return status, payload, time.perf_counter() - start
+
+
+def _warm_worker():
+    """Pool initializer: pay for the export imports before the first request does."""
+    import openpyxl  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+
+
+# ───────────────────────────────────────────────────────────────
+# HTTP
+# ───────────────────────────────────────────────────────────────
+class PricingServer:
+    """Minimal HTTP/1.1 (keep-alive) server that hands pricing to a process pool."""
+
+    ENDPOINTS = {"schedule", "summary", "suggested-payment", "export"}
+
+    def __init__(self, workers=None, max_pending=256):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending
+        self.pending = 0
+        self.served = self.rejected = 0
+        self.pool = None
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        loop = asyncio.get_running_loop()
+        # Start the workers before binding so none of them inherits the listening socket
+        await asyncio.gather(*(loop.run_in_executor(self.pool, time.sleep, 0.05) for _ in range(self.workers)))
+        server = await asyncio.start_server(self._connection, host, port)
+        loop.add_signal_handler(signal.SIGTERM, server.close)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass  # SIGTERM
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                status, response_headers, payload = await self._dispatch(method, target, body)
+                total = time.perf_counter() - start
+                timing = response_headers.pop("_timing", {})
+                timing["total"] = total
+                response_headers["Server-Timing"] = ", ".join(f"{k};dur={v * 1000:.2f}" for k, v in timing.items())
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write(writer, status, response_headers, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise ConnectionError("request head too large")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise ConnectionError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        endpoint = url.path.strip("/")
+        try:
+            if endpoint == "health" and method == "GET":
+                return HTTPStatus.OK, {}, {
+                    "workers": self.workers, "pending": self.pending, "max_pending": self.max_pending,
+                    "served": self.served, "rejected": self.rejected,
+                }
+            if endpoint not in self.ENDPOINTS:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown endpoint /{endpoint}")
+            if method != "POST":
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"/{endpoint} takes POST")
+
+            fmt = None
+            if endpoint == "export":
+                fmt = parse_qs(url.query).get("format", ["xlsx"])[0].lower()
+                if fmt not in EXPORT_EXTENSIONS:
+                    raise ApiError(HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(EXPORT_EXTENSIONS)}")
+            try:
+                record = json.loads(body or b"{}")
+            except ValueError as exc:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {exc}")
+            if not isinstance(record, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object of deal inputs")
+
+            # Backpressure: refuse rather than queue without limit
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Pricing queue is full, retry shortly")
+            self.pending += 1
+            submitted = time.perf_counter()
+            try:
+                status, payload, priced = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, price, endpoint, record, fmt)
+            finally:
+                self.pending -= 1
+            self.served += 1
+            timing = {"queue": max(0.0, time.perf_counter() - submitted - priced), "price": priced}
+            headers = {"_timing": timing}
+            if isinstance(payload, tuple):
+                data, mime, filename = payload
+                headers.update({"Content-Type": mime, "Content-Disposition": content_disposition(filename)})
+                return status, headers, data
+            return status, headers, payload
+        except ApiError as exc:
+            headers = {"Retry-After": "1"} if exc.status == HTTPStatus.SERVICE_UNAVAILABLE else {}
+            return exc.status, headers, {"error": str(exc)}
+        except Exception as exc:  # a crashed worker must not take the connection down
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {}, {"error": f"{type(exc).__name__}: {exc}"}
+
+    @staticmethod
+    def _write(writer, status, headers, payload, keep_alive):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+            headers.setdefault("Content-Type", "application/json")
+        headers["Content-Length"] = str(len(payload))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the amortisation engine as a local JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="pricing processes (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=256, help="requests in flight before answering 503")
+    args = parser.parse_args(argv)
+
+    server = PricingServer(workers=args.workers, max_pending=args.max_pending)
+    print(f"Pricing API on http://{args.host}:{args.port} ({server.workers} workers)")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
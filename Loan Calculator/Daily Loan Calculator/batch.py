@@ -0,0 +1,293 @@
+"""Price a whole book of facilities from a CSV/Parquet file.
+
+One row per deal. Scalar fields use the names of the ``Deal`` fields; the
+list inputs the page collects per item are JSON columns:
+
+    fees                 [{"name", "type", "amount" | "percentage"}]
+    drawdowns            [{"date", "amount"}]
+    rate_periods         [{"from_period", "to_period", "prime", "margin"}]
+    custom_capital       [{"date", "amount"}]
+    structured_payments  [{"from_period", "to_period", "payment"}]
+
+Fixed-rate deals take ``prime_rate`` + ``margin`` (or ``interest_rate``) and
+``day_count`` is one of ``DAY_COUNTS`` (default ``Monthly``); ``rounding`` set
+to ``Half Up`` or ``Half Even`` prices the deal in integer cents. Payment
+dates follow ``month_end``, ``business_day`` and ``holidays`` (see
+``payment_calendar``), unadjusted by default.
+Deals are priced across a process pool and each finished schedule is
+appended to ``schedules.<format>`` in the output directory as it arrives, so
+neither it nor ``summary.csv`` is ever held in memory. Each summary row
+carries the deal's XIRR, effective rate including fees, WAL and durations
+(``analytics``), solved a block of deals at a time.
+
+    python batch.py book.parquet out/ --workers 16 --format parquet --store store/deals.sqlite
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from datetime import date, datetime
+from multiprocessing import Pool
+
+from amortisation import Deal, DealError, fee_amount, generate_schedule, summarise
+from analytics import ANALYTICS_FIELDS, analyse_flows, deal_flows
+from deal_store import DealStore
+from ladder import Ladder, write_ladder
+from export import BookWriter
+from payment_calendar import add_months
+
+SUMMARY_FIELDS = [
+    "deal_id", "Client Name", "Facility Name", "Total Drawn", "Total Interest",
+    "Total Principal Repaid", "Total Custom Capital", "Final Balance", "Residual Mismatch",
+    *ANALYTICS_FIELDS, "Warnings", "Error",
+]
+ANALYTICS_BLOCK = 1024  # summary rows held back (with their deals' flows) so their XIRRs are solved in one call
+SAVE_BLOCK = 64  # priced deals saved to the store (one transaction) and folded into the ladder at a time
+
+
+# ───────────────────────────────────────────────────────────────
+# INPUT PARSING
+# ───────────────────────────────────────────────────────────────
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or (isinstance(value, str) and not value.strip())
+
+
+def _get(record, key, default=None):
+    value = record.get(key)
+    return default if _missing(value) else value
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, "to_pydatetime"):  # pandas Timestamp
+        return value.to_pydatetime().date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def _json_list(record, key):
+    value = _get(record, key)
+    if value is None:
+        return None
+    items = json.loads(value) if isinstance(value, str) else list(value)
+    return items or None
+
+
+def deal_from_record(record):
+    """Build a ``Deal`` from one row of a book file."""
+    facility_amount = float(record["facility_amount"])
+
+    fees = []
+    for fee in _json_list(record, "fees") or []:
+        fee_type = fee.get("type", "Nominal Amount")
+        value = fee["percentage"] if fee_type == "% of Facility" else fee["amount"]
+        fees.append({'name': fee.get("name", ""), 'type': fee_type,
+                     'amount': fee_amount(facility_amount, fee_type, float(value))})
+
+    drawdown_schedule = _json_list(record, "drawdowns")
+    if drawdown_schedule:
+        drawdown_schedule = sorted(
+            ({'date': _as_date(dd["date"]), 'amount': float(dd["amount"])} for dd in drawdown_schedule),
+            key=lambda x: x['date'],
+        )
+    drawdown_structure = _get(record, "drawdown_structure",
+                              "Multiple Drawdowns" if drawdown_schedule else "Single Drawdown")
+
+    first_payment_date = _get(record, "first_payment_date")
+    if first_payment_date is None:
+        if drawdown_structure != "Multiple Drawdowns":
+            raise ValueError("first_payment_date is required for a single drawdown")
+        first_payment_date = add_months(drawdown_schedule[0]['date'], 1)
+
+    rate_schedule = None
+    rate_structure = _get(record, "rate_structure", "Fixed Rate")
+    if rate_structure == "Variable Rate":
+        rate_periods = _json_list(record, "rate_periods")
+        if not rate_periods:
+            raise DealError("Variable Rate needs at least one rate period (rate_periods)")
+        rate_schedule = [{
+            'from_period': int(rp["from_period"]),
+            'to_period': int(rp["to_period"]),
+            'prime': float(rp["prime"]),
+            'margin': float(rp["margin"]),
+            'total_rate': float(rp["prime"]) + float(rp["margin"]),
+        } for rp in rate_periods]
+        interest_rate = rate_schedule[0]['total_rate']
+    elif _get(record, "interest_rate") is not None:
+        interest_rate = float(record["interest_rate"])
+    else:
+        interest_rate = float(_get(record, "prime_rate", 11.75)) + float(_get(record, "margin", 2.0))
+
+    custom_capital_schedule = _json_list(record, "custom_capital")
+    if custom_capital_schedule:
+        custom_capital_schedule = [{'date': _as_date(cc["date"]), 'amount': float(cc["amount"])}
+                                   for cc in custom_capital_schedule]
+
+    structured_payments = _json_list(record, "structured_payments")
+    if structured_payments:
+        structured_payments = [{'from_period': int(p["from_period"]), 'to_period': int(p["to_period"]),
+                                'payment': float(p["payment"])} for p in structured_payments]
+
+    monthly_payment = _get(record, "monthly_payment")
+    drawdown_date = _get(record, "drawdown_date")
+
+    return Deal(
+        facility_amount=facility_amount,
+        term_months=int(record["term_months"]),
+        first_payment_date=_as_date(first_payment_date),
+        repayment_structure=_get(record, "repayment_structure", "Equal Installments"),
+        residual=float(_get(record, "residual", 0.0)),
+        client_name=str(_get(record, "client_name", "")),
+        facility_name=str(_get(record, "facility_name", "")),
+        capitalise_fees=_as_bool(_get(record, "capitalise_fees", bool(fees))),
+        custom_fees=fees,
+        drawdown_structure=drawdown_structure,
+        drawdown_date=_as_date(drawdown_date) if drawdown_date is not None else None,
+        drawdown_schedule=drawdown_schedule,
+        rate_structure=rate_structure,
+        interest_rate=interest_rate,
+        rate_schedule=rate_schedule,
+        custom_capital_schedule=custom_capital_schedule,
+        structured_payments=structured_payments,
+        capitalisation_months=int(_get(record, "capitalisation_months", 0)),
+        monthly_payment=float(monthly_payment) if monthly_payment is not None else None,
+        day_count=_get(record, "day_count", "Monthly"),
+        rounding=_get(record, "rounding", "Float"),
+        month_end=_get(record, "month_end", "Add Month"),
+        business_day=_get(record, "business_day", "Unadjusted"),
+        holidays=_get(record, "holidays", "None"),
+    )
+
+
+def read_book(path):
+    """Load a book file (``.csv`` or ``.parquet``) as a list of row dicts."""
+    import pandas as pd
+    if path.lower().endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    if "deal_id" not in df.columns:
+        df.insert(0, "deal_id", range(1, len(df) + 1))
+    return df.to_dict("records")
+
+
+# ───────────────────────────────────────────────────────────────
+# WORKER
+# ───────────────────────────────────────────────────────────────
+def price_record(record):
+    """Price one book row. Returns ``(summary, Deal or None, Schedule or None)``."""
+    summary = {
+        "deal_id": record.get("deal_id"),
+        "Client Name": _get(record, "client_name", ""),
+        "Facility Name": _get(record, "facility_name", ""),
+    }
+    try:
+        deal = deal_from_record(record)
+        result = generate_schedule(deal)
+    except Exception as exc:  # one bad row must not sink the whole book
+        summary["Error"] = f"{type(exc).__name__}: {exc}"
+        return summary, None, None
+
+    summary.update({k: round(float(v), 2) for k, v in summarise(result.columns).items()})
+    summary["Residual Mismatch"] = round(result.final_balance - result.expected_final, 2)
+    summary["Warnings"] = " | ".join(result.warnings)
+    return summary, deal, result
+
+
+# ───────────────────────────────────────────────────────────────
+# DRIVER
+# ───────────────────────────────────────────────────────────────
+def run_batch(records, out_dir, workers=None, chunksize=16, fmt="csv", store=None, ladder=None):
+    """Price ``records`` on a process pool, streaming results into ``out_dir``.
+
+    Each schedule is written as soon as it is priced, and saved to
+    ``store`` (a ``DealStore``) and folded into ``ladder`` (a
+    ``ladder.Ladder``) ``SAVE_BLOCK`` deals at a time when they are given.
+    Only its summary row and ``deal_flows`` wait, in blocks of
+    ``ANALYTICS_BLOCK``, so a block's yield analytics come from one
+    vectorised ``analyse_flows`` call.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    schedules_path = os.path.join(out_dir, f"schedules.{fmt}")
+    summary_path = os.path.join(out_dir, "summary.csv")
+
+    priced = failed = 0
+    block, unsaved = [], []
+    with open(summary_path, "w", newline="") as summary_file, \
+            BookWriter(schedules_path, fmt) as schedules, \
+            Pool(processes=workers or os.cpu_count()) as pool:
+        summary_writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_FIELDS)
+        summary_writer.writeheader()
+
+        def flush():
+            for (summary, _), analytics in zip(block, analyse_flows(flows for _, flows in block)):
+                summary.update(analytics)
+                summary_writer.writerow(summary)
+            block.clear()
+
+        def save():
+            if store is not None:
+                store.save_many(unsaved)
+            if ladder is not None:
+                ladder.add_many(unsaved)
+            unsaved.clear()
+
+        for summary, deal, schedule in pool.imap_unordered(price_record, records, chunksize=chunksize):
+            if schedule is None:
+                summary_writer.writerow(summary)
+                failed += 1
+                continue
+            schedules.add(summary["deal_id"], schedule)
+            if store is not None or ladder is not None:
+                unsaved.append((deal, schedule))
+                if len(unsaved) >= SAVE_BLOCK:
+                    save()
+            block.append((summary, deal_flows(deal, schedule)))
+            priced += 1
+            if len(block) >= ANALYTICS_BLOCK:
+                flush()
+        flush()
+        save()
+    return priced, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a book of facilities in parallel.")
+    parser.add_argument("book", help="CSV or Parquet file, one row per facility")
+    parser.add_argument("out_dir", help="directory for schedules.csv and summary.csv")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=16, help="deals handed to a worker at a time")
+    parser.add_argument("--format", choices=["csv", "parquet", "xlsx"], default="csv",
+                        help="file format for the combined schedules")
+    parser.add_argument("--store", default=None, help="also save every priced deal to this deal store (SQLite)")
+    parser.add_argument("--ladder", default=None, help="also write the monthly cashflow ladder (.csv, .xlsx, .parquet)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = read_book(args.book)
+    store = DealStore(args.store) if args.store else None
+    ladder = Ladder() if args.ladder else None
+    try:
+        priced, failed = run_batch(records, args.out_dir, workers=args.workers, chunksize=args.chunksize,
+                                   fmt=args.format, store=store, ladder=ladder)
+    finally:
+        if store is not None:
+            store.close()
+    if ladder is not None:
+        write_ladder(args.ladder, ladder.rows())
+    elapsed = time.perf_counter() - start
+    print(f"Priced {priced} deals ({failed} failed) in {elapsed:.1f}s -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
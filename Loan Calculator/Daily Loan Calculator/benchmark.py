@@ -0,0 +1,328 @@
+"""Reproducible benchmark and golden-output check for the amortisation engine.
+
+The case matrix covers every repayment structure, Fixed and Variable rates,
+1/5/20 drawdowns, terms from 12 to 600 months, and with and without custom
+capital and a residual. A smaller matrix repeats the structures under each
+of ``CONVENTIONS``: the daily day counts, integer-cents rounding and
+business-day adjusted payment calendars. Every deal is generated from the
+case parameters alone (no randomness), so runs are comparable across
+releases.
+
+    python benchmark.py                          # time everything, check golden output
+    python benchmark.py --json results.json      # also save the timings
+    python benchmark.py --compare results.json   # flag groups that got slower
+    python benchmark.py --write-golden           # refresh benchmarks/golden.json
+    python benchmark.py --startup                # page time-to-first-render and rerun latency
+
+The golden file holds a SHA-256 of each case's schedule written to the cent,
+plus its headline totals, so any speed-up that moves a single cent fails.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from amortisation import (
+    MONEY_COLUMNS, RATE_STRUCTURES, REPAYMENT_STRUCTURES, SCHEDULE_COLUMNS, Deal, generate_schedule,
+)
+from export import csv_bytes, excel_bytes, parquet_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(HERE, "benchmarks", "golden.json")
+PAGE_PATH = os.path.join(HERE, "Loan_Amort_Daily.py")
+
+TERMS = [12, 60, 120, 240, 360, 600]
+DRAWDOWN_COUNTS = [1, 5, 20]
+# (day count, rounding, month-end rule, business-day roll, holidays); the first is the core matrix's
+MONTHLY = ("Monthly", "Float", "Add Month", "Unadjusted", "None")
+CONVENTIONS = [
+    ("Act/365F", "Float", "Add Month", "Unadjusted", "None"),
+    ("Act/360", "Float", "Add Month", "Unadjusted", "None"),
+    ("30/360", "Float", "Add Month", "Unadjusted", "None"),
+    ("Monthly", "Half Up", "Add Month", "Unadjusted", "None"),
+    ("Monthly", "Half Even", "Add Month", "Unadjusted", "None"),
+    ("Act/365F", "Half Even", "Add Month", "Unadjusted", "None"),
+    ("30/360", "Half Up", "Add Month", "Unadjusted", "None"),
+    ("Monthly", "Float", "Add Month", "Following", "South Africa"),
+    ("Monthly", "Float", "Month End", "Modified Following", "South Africa"),
+    ("Monthly", "Float", "Add Month", "Preceding", "None"),
+    ("Act/365F", "Float", "Month End", "Modified Following", "South Africa"),
+    ("Act/360", "Half Up", "Add Month", "Following", "South Africa"),
+]
+CONVENTION_TERMS = [12, 120]
+FIRST_PAYMENT = date(2025, 4, 1)
+FACILITY = 100_000_000.0
+
+
+# ───────────────────────────────────────────────────────────────
+# CASES
+# ───────────────────────────────────────────────────────────────
+def case_id(structure, rate, drawdowns, term, custom, residual, convention=MONTHLY):
+    cid = f"{structure}|{rate}|dd{drawdowns}|{term}m|{'cc' if custom else '-'}|{'res' if residual else '-'}"
+    return cid if convention == MONTHLY else f"{cid}|{'|'.join(convention)}"
+
+
+def build_deal(structure, rate, drawdowns, term, custom, residual, convention=MONTHLY):
+    """The deterministic deal for one benchmark case."""
+    day_count, rounding, month_end, business_day, holidays = convention
+    kw = dict(
+        day_count=day_count,
+        rounding=rounding,
+        month_end=month_end,
+        business_day=business_day,
+        holidays=holidays,
+        facility_amount=FACILITY,
+        term_months=term,
+        first_payment_date=FIRST_PAYMENT,
+        repayment_structure=structure,
+        residual=FACILITY * 0.2 if residual else 0.0,
+        capitalise_fees=True,
+        custom_fees=[{'name': 'Raising Fee', 'type': '% of Facility', 'amount': FACILITY * 0.015},
+                     {'name': 'Legal Fee', 'type': 'Nominal Amount', 'amount': 250_000.0}],
+        interest_rate=13.75,
+    )
+    if drawdowns > 1:
+        # Spread over the first half of the term, at least a month apart
+        gap = max(1, term // (2 * drawdowns))
+        kw['drawdown_structure'] = "Multiple Drawdowns"
+        kw['drawdown_schedule'] = [
+            {'date': FIRST_PAYMENT + relativedelta(months=i * gap - 1), 'amount': round(FACILITY / drawdowns, 2)}
+            for i in range(drawdowns)
+        ]
+    if rate == "Variable Rate":
+        bands, start = [], 1
+        for prime in (11.75, 11.25, 10.75, 10.5):
+            end = term if prime == 10.5 else min(term, start + term // 4 - 1)
+            if start > term:
+                break
+            bands.append({'from_period': start, 'to_period': max(start, end), 'prime': prime, 'margin': 2.0,
+                          'total_rate': prime + 2.0})
+            start = max(start, end) + 1
+        kw['rate_structure'] = "Variable Rate"
+        kw['rate_schedule'] = bands
+    if custom:
+        kw['custom_capital_schedule'] = [
+            {'date': FIRST_PAYMENT + relativedelta(months=m), 'amount': 2_500_000.0}
+            for m in range(term // 6, term, max(1, term // 6))
+        ]
+    if structure == "Structured Capital":
+        half = max(1, term // 2)
+        kw['structured_payments'] = [{'from_period': 1, 'to_period': half, 'payment': round(FACILITY / term * 0.6, 2)}]
+        if term > half:
+            kw['structured_payments'].append({'from_period': half + 1, 'to_period': term,
+                                              'payment': round(FACILITY / term * 1.4, 2)})
+    if structure == "Capitalised Interest":
+        kw['capitalisation_months'] = min(12, term)
+    return Deal(**kw)
+
+
+def cases():
+    """Every ``(case_id, params)`` in the matrix, in a fixed order: the core matrix, then the conventions."""
+    for params in itertools.product(REPAYMENT_STRUCTURES, RATE_STRUCTURES, DRAWDOWN_COUNTS, TERMS,
+                                    (False, True), (False, True)):
+        yield case_id(*params), params
+    for params in itertools.product(REPAYMENT_STRUCTURES, RATE_STRUCTURES, DRAWDOWN_COUNTS[:2], CONVENTION_TERMS,
+                                    (True,), (False, True), CONVENTIONS):
+        yield case_id(*params), params
+
+
+# ───────────────────────────────────────────────────────────────
+# GOLDEN OUTPUT
+# ───────────────────────────────────────────────────────────────
+def fingerprint(schedule):
+    """SHA-256 of the schedule written to the cent, plus its headline totals."""
+    money = {SCHEDULE_COLUMNS.index(c) for c in MONEY_COLUMNS}
+    digest = hashlib.sha256()
+    totals = defaultdict(float)
+    for row in schedule.iter_rows():
+        cells = [f"{v:.2f}" if i in money else str(v) for i, v in enumerate(row)]
+        digest.update(("|".join(cells) + "\n").encode())
+        totals["Interest"] += row[SCHEDULE_COLUMNS.index("Interest")]
+        totals["Total Payment"] += row[SCHEDULE_COLUMNS.index("Total Payment")]
+    return {
+        "sha256": digest.hexdigest(),
+        "periods": len(schedule),
+        "monthly_payment": round(schedule.monthly_payment, 2),
+        "total_interest": round(totals["Interest"], 2),
+        "total_payment": round(totals["Total Payment"], 2),
+        "final_balance": round(schedule.final_balance, 2),
+    }
+
+
+def check_golden(results, path=GOLDEN_PATH):
+    """Compare fingerprints with the golden file; returns the mismatching case ids."""
+    with open(path) as f:
+        golden = json.load(f)
+    failures = []
+    for cid, fp in results.items():
+        expected = golden.get(cid)
+        if expected != fp:
+            failures.append(cid)
+            if len(failures) <= 5:
+                print(f"  GOLDEN MISMATCH {cid}\n    expected {expected}\n    got      {fp}")
+    missing = set(golden) - set(results)
+    if missing:
+        print(f"  {len(missing)} golden cases were not run")
+    return failures
+
+
+# ───────────────────────────────────────────────────────────────
+# TIMING
+# ───────────────────────────────────────────────────────────────
+def _time(fn, min_time):
+    """Mean seconds per call, repeating ``fn`` for at least ``min_time`` seconds."""
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(min_time=0.02, exports=True):
+    """Time every case. Returns ``(group_stats, export_stats, fingerprints)``."""
+    groups = defaultdict(lambda: {"cases": 0, "seconds": 0.0, "periods": 0, "peak_bytes": 0})
+    fingerprints = {}
+    for cid, params in cases():
+        deal = build_deal(*params)
+        schedule = generate_schedule(deal)
+        fingerprints[cid] = fingerprint(schedule)
+
+        structure, rate, drawdowns = params[:3]
+        if len(params) > 6:
+            group = groups[" | ".join(params[6])]
+        else:
+            group = groups[f"{structure} | {rate} | {drawdowns} drawdown{'s' if drawdowns > 1 else ''}"]
+        group["cases"] += 1
+        group["seconds"] += _time(lambda: generate_schedule(deal), min_time)
+        group["periods"] += len(schedule)
+        group["peak_bytes"] = max(group["peak_bytes"], _peak_memory(lambda: generate_schedule(deal)))
+
+    export_stats = {}
+    if exports:
+        for term in (120, 600):
+            deal = build_deal("Equal Installments", "Variable Rate", 5, term, True, True)
+            schedule = generate_schedule(deal)
+            for name, fn in (("xlsx", lambda: excel_bytes(deal, schedule)),
+                             ("csv", lambda: csv_bytes(schedule)),
+                             ("parquet", lambda: parquet_bytes(schedule))):
+                fn()  # first call pays for imports
+                export_stats[f"{name} {term}m"] = _time(fn, min_time * 5)
+    return dict(groups), export_stats, fingerprints
+
+
+def report(groups, export_stats, previous=None, tolerance=0.15):
+    """Print the timing table; returns the groups more than ``tolerance`` slower than ``previous``."""
+    slower = []
+    print(f"{'group':<66}{'sched/s':>10}{'periods/s':>12}{'peak KiB':>10}{'vs prev':>9}")
+    for name, g in groups.items():
+        per_second = g["cases"] / g["seconds"]
+        change = ""
+        if previous and name in previous.get("groups", {}):
+            before = previous["groups"][name]
+            ratio = (before["cases"] / before["seconds"]) / per_second
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio > 1 + tolerance:
+                slower.append(name)
+        print(f"{name:<66}{per_second:>10,.0f}{g['periods'] / g['seconds']:>12,.0f}"
+              f"{g['peak_bytes'] / 1024:>10,.0f}{change:>9}")
+    for name, seconds in export_stats.items():
+        print(f"export {name:<59}{seconds * 1000:>10,.2f} ms")
+    return slower
+
+
+# ───────────────────────────────────────────────────────────────
+# STARTUP
+# ───────────────────────────────────────────────────────────────
+# Runs in a fresh interpreter so imports are as cold as on a new server process
+_STARTUP_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+start = time.perf_counter()
+app.run()
+first_render = time.perf_counter()
+app.run()
+rerun = time.perf_counter()
+app.button[0].click().run()
+generate = time.perf_counter()
+print(json.dumps({"first render": first_render - start, "rerun": rerun - first_render,
+                  "first generate": generate - rerun}))
+"""
+
+
+def startup(repeats=3):
+    """Best-of-``repeats`` seconds for the page's cold first render, a plain rerun and the first Generate."""
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, PAGE_PATH], cwd=HERE,
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return {name: min(run[name] for run in runs) for name in runs[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine and check golden output.")
+    parser.add_argument("--min-time", type=float, default=0.02, help="seconds to repeat each case for")
+    parser.add_argument("--no-exports", action="store_true", help="skip export timings")
+    parser.add_argument("--json", help="write timings to this file")
+    parser.add_argument("--compare", help="timings file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="slowdown that counts as a regression")
+    parser.add_argument("--write-golden", action="store_true", help="overwrite the golden output file")
+    parser.add_argument("--startup", action="store_true", help="only time the page's cold start and reruns")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        for name, seconds in startup().items():
+            print(f"{name:<20}{seconds * 1000:>10,.0f} ms")
+        return 0
+
+    start = time.perf_counter()
+    groups, export_stats, fingerprints = run(args.min_time, not args.no_exports)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    slower = report(groups, export_stats, previous, args.tolerance)
+    print(f"{len(fingerprints)} cases in {time.perf_counter() - start:.1f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"groups": groups, "exports": export_stats}, f, indent=1)
+
+    if args.write_golden:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump(fingerprints, f, indent=1, sort_keys=True)
+        print(f"Wrote {len(fingerprints)} golden fingerprints to {GOLDEN_PATH}")
+        failures = []
+    else:
+        failures = check_golden(fingerprints)
+        print(f"Golden output: {len(fingerprints) - len(failures)}/{len(fingerprints)} cases match to the cent")
+
+    if slower:
+        print(f"Slower than {args.compare} by more than {args.tolerance:.0%}: {', '.join(slower)}")
+    return 1 if failures or slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
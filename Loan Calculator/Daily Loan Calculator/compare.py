@@ -0,0 +1,138 @@
+"""Side-by-side comparison of one facility under several structures.
+
+Each variant is the deal with a few inputs overridden (its repayment
+structure, or single instead of multiple drawdowns). The deal is compiled
+once; variants that only change the repayment structure reuse its rates,
+payment dates, fees and drawdowns (see ``amortisation.restructure``). A few
+variants of an ordinary term are priced in-process, as starting a process
+pool would cost more than pricing them; larger comparisons go to a pool:
+
+    results = compare_variants(deal, default_variants(deal))
+    rows = comparison_rows(results)                    # one row per variant, with its difference from the first
+    header, periods = period_diff(results, "Total Payment")
+
+The first variant is the baseline every difference is measured against.
+"""
+import os
+from dataclasses import replace
+from multiprocessing import Pool
+
+from amortisation import REPAYMENT_STRUCTURES, compile_deal, restructure, run_compiled, suggested_payment, summarise
+from analytics import ANALYTICS_FIELDS, analyse
+
+SUMMARY_FIELDS = ["Total Drawn", "Total Interest", "Total Principal Repaid", "Total Custom Capital", "Final Balance"]
+COMPARISON_COLUMNS = [
+    "Variant", "Repayment Structure", "Drawdown Structure", "Installment", "Total Payments",
+    *SUMMARY_FIELDS, *ANALYTICS_FIELDS, "Δ Total Interest", "Δ Total Payments",
+]
+DIFF_MEASURES = ["Total Payment", "Interest", "Total Principal", "Ending Balance"]
+POOL_MIN_PERIODS = 20_000  # variant periods below which pricing in-process beats starting a pool
+
+
+def variant_deal(deal, overrides):
+    """``deal`` with ``overrides`` applied, filling in what a new structure needs.
+
+    Switching to Capitalised Interest without capitalisation months uses 12
+    (or the whole term); switching to Structured Capital without a payment
+    structure repays the capital less the residual in equal parts. A
+    variant's installment is its own suggested payment unless it sets one.
+    """
+    if not overrides:
+        return deal
+    variant = replace(deal, monthly_payment=None, **overrides)
+    if variant.repayment_structure == "Capitalised Interest" and not variant.capitalisation_months:
+        variant.capitalisation_months = min(12, variant.term_months)
+    if variant.repayment_structure == "Structured Capital" and not variant.structured_payments:
+        payment = round(max(0.0, variant.full_capital - variant.residual) / variant.term_months, 2)
+        variant.structured_payments = [{'from_period': 1, 'to_period': variant.term_months, 'payment': payment}]
+    if variant.drawdown_structure == "Single Drawdown":
+        variant.drawdown_schedule = None
+    return variant
+
+
+def default_variants(deal):
+    """``(label, overrides)`` for the deal as entered, every other repayment structure and, for a
+    multi-drawdown deal, the same facility drawn in one go."""
+    variants = [(f"{deal.repayment_structure} (as entered)", {})]
+    variants += [(structure, {"repayment_structure": structure})
+                 for structure in REPAYMENT_STRUCTURES if structure != deal.repayment_structure]
+    if deal.drawdown_structure == "Multiple Drawdowns" and deal.drawdown_schedule:
+        variants.append((f"{deal.repayment_structure}, Single Drawdown", {"drawdown_structure": "Single Drawdown"}))
+    return variants
+
+
+def _price_variant(task):
+    label, compiled = task
+    deal = compiled.deal
+    monthly_payment = deal.monthly_payment
+    if monthly_payment is None:
+        monthly_payment = suggested_payment(deal, compiled) if deal.repayment_structure != "Structured Capital" else 0.0
+    return label, deal, run_compiled(compiled, monthly_payment)
+
+
+def compare_variants(deal, variants, workers=None, compiled=None):
+    """Price each ``(label, overrides)`` variant of ``deal``; returns ``(label, deal, schedule)`` in order.
+
+    ``compiled`` is the deal's own ``compile_deal`` output if already built.
+    Raises ``DealError`` if any variant cannot be priced. ``workers=1``
+    prices in-process, as does the default when the variants have fewer
+    than ``POOL_MIN_PERIODS`` periods between them.
+    """
+    compiled = compiled or compile_deal(deal)
+    tasks = [(label, restructure(compiled, variant_deal(deal, overrides))) for label, overrides in variants]
+    if workers is None and sum(variant.deal.term_months for _, variant in tasks) < POOL_MIN_PERIODS:
+        workers = 1
+    workers = min(workers or os.cpu_count(), len(tasks))
+    if workers <= 1:
+        return list(map(_price_variant, tasks))
+    with Pool(processes=workers) as pool:
+        return pool.map(_price_variant, tasks, chunksize=1)
+
+
+# ───────────────────────────────────────────────────────────────
+# DIFF VIEW
+# ───────────────────────────────────────────────────────────────
+def comparison_rows(results):
+    """One dict per variant (keyed by ``COMPARISON_COLUMNS``), with differences from the first variant.
+
+    Total Payments counts any balance left at maturity (a residual) as paid
+    then, so structures that leave different balances compare like for like.
+    """
+    rows = []
+    for (label, deal, schedule), analytics in zip(results, analyse((deal, schedule) for _, deal, schedule in results)):
+        summary = summarise(schedule.columns)
+        rows.append({
+            "Variant": label,
+            "Repayment Structure": deal.repayment_structure,
+            "Drawdown Structure": deal.drawdown_structure,
+            "Installment": round(schedule.monthly_payment, 2),
+            "Total Payments": round(float(schedule.columns["Total Payment"].sum()) + schedule.final_balance, 2),
+            **{name: round(float(summary[name]), 2) for name in SUMMARY_FIELDS},
+            **analytics,
+        })
+    for row in rows:
+        row["Δ Total Interest"] = round(row["Total Interest"] - rows[0]["Total Interest"], 2)
+        row["Δ Total Payments"] = round(row["Total Payments"] - rows[0]["Total Payments"], 2)
+    return rows
+
+
+def period_diff(results, measure="Total Payment"):
+    """``(header, rows)``: ``measure`` per period for every variant, and each one's difference from the first.
+
+    A variant that overrides the term to a shorter one shows blanks after
+    its last period.
+    """
+    labels = [label for label, _, _ in results]
+    header = ["Period", "Payment Date", *labels, *[f"Δ {label}" for label in labels[1:]]]
+    longest = max(results, key=lambda result: len(result[2]))[2]
+    dates = longest.columns["Payment Date"].astype(str).tolist()
+    values = [schedule.columns[measure].tolist() for _, _, schedule in results]
+    rows = []
+    for k, day in enumerate(dates):
+        cells = [series[k] if k < len(series) else None for series in values]
+        base = cells[0]
+        row = {"Period": k + 1, "Payment Date": day, **dict(zip(labels, cells))}
+        for label, value in zip(labels[1:], cells[1:]):
+            row[f"Δ {label}"] = None if value is None or base is None else round(value - base, 2)
+        rows.append(row)
+    return header, rows
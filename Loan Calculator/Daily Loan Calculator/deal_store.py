@@ -0,0 +1,278 @@
+"""Local store of saved deals and their schedules, keyed by content hash.
+
+Deal inputs are saved under ``deal_key(deal)`` in SQLite next to every
+period of the priced schedule, so reopening an unchanged deal reads it back
+instead of pricing it again, and the whole book can be queried in SQL
+without recomputing anything. Deals are indexed by client, facility and
+repayment structure and schedule periods by payment date:
+
+    store = DealStore()
+    key = store.save(deal, schedule)
+    store.load_schedule(key)
+    store.due_between(*quarter("2027-Q3"))   # every payment and balance due in the quarter
+
+    python deal_store.py list --client "Client XYZ"
+    python deal_store.py due 2027-Q3 > due.csv
+
+The database defaults to ``store/deals.sqlite`` beside this file; set
+``AMORT_STORE`` to keep it elsewhere.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+from amortisation import SCHEDULE_COLUMNS, Schedule, deal_from_inputs, deal_inputs, deal_key
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.environ.get("AMORT_STORE", os.path.join(HERE, "store", "deals.sqlite"))
+
+# SQL column name for each schedule column ("Interest Rate %" -> interest_rate)
+PERIOD_COLUMNS = {name: re.sub(r"\W+", "_", name).strip("_").lower() for name in SCHEDULE_COLUMNS}
+DEAL_FIELDS = [
+    "deal_key", "client_name", "facility_name", "repayment_structure", "facility_amount",
+    "term_months", "first_payment_date", "saved_at",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS deals (
+    deal_key TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    facility_name TEXT NOT NULL,
+    repayment_structure TEXT NOT NULL,
+    facility_amount REAL NOT NULL,
+    term_months INTEGER NOT NULL,
+    first_payment_date TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    page_inputs TEXT
+);
+CREATE INDEX IF NOT EXISTS deals_client ON deals (client_name);
+CREATE INDEX IF NOT EXISTS deals_facility ON deals (facility_name);
+CREATE INDEX IF NOT EXISTS deals_structure ON deals (repayment_structure);
+
+CREATE TABLE IF NOT EXISTS schedules (
+    deal_key TEXT PRIMARY KEY REFERENCES deals (deal_key),
+    monthly_payment REAL NOT NULL,
+    expected_final REAL NOT NULL,
+    warnings TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS periods (
+    deal_key TEXT NOT NULL REFERENCES deals (deal_key),
+    {", ".join(f"{column} {'INTEGER' if name == 'Period' else 'TEXT' if name == 'Payment Date' else 'REAL'} NOT NULL"
+               for name, column in PERIOD_COLUMNS.items())},
+    PRIMARY KEY (deal_key, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS periods_payment_date ON periods (payment_date);
+"""
+
+
+def quarter(label):
+    """``"2027-Q3"`` -> ``(date(2027, 7, 1), date(2027, 9, 30))``."""
+    match = re.fullmatch(r"(\d{4})-?Q([1-4])", label.strip().upper())
+    if not match:
+        raise ValueError(f"Quarter must look like 2027-Q3, not {label!r}")
+    year, q = int(match.group(1)), int(match.group(2))
+    start = date(year, 3 * q - 2, 1)
+    end = date(year + 1, 1, 1) if q == 4 else date(year, 3 * q + 1, 1)
+    return start, date.fromordinal(end.toordinal() - 1)
+
+
+class DealStore:
+    """SQLite deal and schedule store; safe to share across threads (one connection, one lock)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            # Stores created before page inputs were kept
+            if "page_inputs" not in {row[1] for row in self._db.execute("PRAGMA table_info(deals)")}:
+                self._db.execute("ALTER TABLE deals ADD COLUMN page_inputs TEXT")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM deals WHERE deal_key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    # ───────────────────────────────────────────────────────────
+    # SAVE / LOAD
+    # ───────────────────────────────────────────────────────────
+    def save(self, deal, schedule=None, key=None, page_inputs=None):
+        """Save ``deal`` (and its priced ``schedule``) under its content hash; returns the key.
+
+        The key covers every input, so saving the same deal again changes
+        nothing but its ``saved_at``. ``page_inputs`` are widget values the
+        deal does not keep (the prime / margin split of a fixed rate, fee
+        percentages), saved as given so reopening restores them exactly.
+        """
+        return self.save_many([(deal, schedule)], [key], [page_inputs])[0]
+
+    def save_many(self, pairs, keys=None, page_inputs=None):
+        """``save`` each ``(deal, schedule)`` pair in one transaction; returns their keys."""
+        pairs = list(pairs)
+        keys = [key or deal_key(deal) for key, (deal, _) in zip(keys or [None] * len(pairs), pairs)]
+        page_inputs = page_inputs or [None] * len(pairs)
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._db:
+            for key, (deal, schedule), widgets in zip(keys, pairs, page_inputs):
+                self._db.execute(
+                    f"INSERT INTO deals ({', '.join(DEAL_FIELDS[:-1])}, inputs, saved_at, page_inputs) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (deal_key) DO UPDATE SET "
+                    "saved_at = excluded.saved_at, page_inputs = COALESCE(excluded.page_inputs, deals.page_inputs)",
+                    (key, deal.client_name, deal.facility_name, deal.repayment_structure, float(deal.facility_amount),
+                     int(deal.term_months), deal.first_payment_date.isoformat(), deal_inputs(deal), saved_at,
+                     json.dumps(widgets) if widgets else None),
+                )
+                if schedule is None or self._db.execute(
+                        "SELECT 1 FROM schedules WHERE deal_key = ?", (key,)).fetchone():
+                    continue
+                self._db.execute(
+                    "INSERT INTO schedules VALUES (?, ?, ?, ?)",
+                    (key, schedule.monthly_payment, schedule.expected_final, json.dumps(schedule.warnings)),
+                )
+                self._db.executemany(
+                    f"INSERT INTO periods VALUES ({', '.join('?' * (len(SCHEDULE_COLUMNS) + 1))})",
+                    ((key, *row) for row in schedule.iter_rows()),
+                )
+        return keys
+
+    def load_deal(self, key):
+        """The saved ``Deal`` for ``key``, or ``None``."""
+        with self._lock:
+            row = self._db.execute("SELECT inputs FROM deals WHERE deal_key = ?", (key,)).fetchone()
+        return deal_from_inputs(row[0]) if row else None
+
+    def load_page_inputs(self, key):
+        """The widget values saved with ``key`` (see ``save``), or ``{}``."""
+        with self._lock:
+            row = self._db.execute("SELECT page_inputs FROM deals WHERE deal_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def load_schedule(self, key):
+        """The saved ``Schedule`` for ``key`` (same column dtypes as the engine's), or ``None``."""
+        with self._lock:
+            head = self._db.execute(
+                "SELECT monthly_payment, expected_final, warnings FROM schedules WHERE deal_key = ?", (key,)
+            ).fetchone()
+            if head is None:
+                return None
+            rows = self._db.execute(
+                f"SELECT {', '.join(PERIOD_COLUMNS.values())} FROM periods WHERE deal_key = ? ORDER BY period",
+                (key,),
+            ).fetchall()
+        values = list(zip(*rows)) or [()] * len(SCHEDULE_COLUMNS)
+        columns = {}
+        for name, column in zip(SCHEDULE_COLUMNS, values):
+            if name == "Period":
+                columns[name] = np.array(column, dtype=np.int64)
+            elif name == "Payment Date":
+                columns[name] = np.array(column, dtype="datetime64[D]")
+            else:
+                columns[name] = np.array(column, dtype=np.float64)
+        monthly_payment, expected_final, warnings = head
+        return Schedule(columns, monthly_payment, expected_final, json.loads(warnings))
+
+    def iter_schedules(self):
+        """Yield ``(Deal, Schedule)`` for every saved deal with a schedule, one deal in memory at a time."""
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT deal_key FROM schedules ORDER BY deal_key")]
+        for key in keys:
+            yield self.load_deal(key), self.load_schedule(key)
+
+    def delete(self, key):
+        with self._lock, self._db:
+            for table in ("periods", "schedules", "deals"):
+                self._db.execute(f"DELETE FROM {table} WHERE deal_key = ?", (key,))
+
+    # ───────────────────────────────────────────────────────────
+    # QUERIES
+    # ───────────────────────────────────────────────────────────
+    def _query(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def find(self, client=None, facility=None, structure=None, limit=None):
+        """Saved deals (newest first), filtered on any of client, facility and repayment structure."""
+        filters = {"client_name": client, "facility_name": facility, "repayment_structure": structure}
+        where = [(f"{column} = ?", value) for column, value in filters.items() if value is not None]
+        sql = f"SELECT {', '.join(DEAL_FIELDS)} FROM deals"
+        if where:
+            sql += " WHERE " + " AND ".join(clause for clause, _ in where)
+        sql += " ORDER BY saved_at DESC, client_name, facility_name, deal_key" + (f" LIMIT {int(limit)}" if limit else "")
+        return self._query(sql, [value for _, value in where])
+
+    def due_between(self, start, end, client=None):
+        """Every saved period with a payment date in ``[start, end]``, by date then client.
+
+        Each row has the deal's key, client and facility plus that period's
+        payment date, interest, principal, total payment and ending balance.
+        """
+        sql = (
+            "SELECT d.deal_key, d.client_name, d.facility_name, p.period, p.payment_date, p.interest, "
+            "p.total_principal, p.total_payment, p.ending_balance "
+            "FROM periods p JOIN deals d ON d.deal_key = p.deal_key "
+            "WHERE p.payment_date BETWEEN ? AND ?"
+        )
+        params = [str(start), str(end)]
+        if client is not None:
+            sql += " AND d.client_name = ?"
+            params.append(client)
+        return self._query(sql + " ORDER BY p.payment_date, d.client_name, d.facility_name", params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the saved deal store.")
+    parser.add_argument("--store", default=DEFAULT_PATH, help="SQLite file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="saved deals")
+    listing.add_argument("--client")
+    listing.add_argument("--facility")
+    listing.add_argument("--structure")
+    due = commands.add_parser("due", help="payments and balances due in a quarter (2027-Q3) or date range")
+    due.add_argument("start", help="quarter like 2027-Q3, or a start date")
+    due.add_argument("end", nargs="?", help="end date (inclusive) when start is a date")
+    due.add_argument("--client")
+    args = parser.parse_args(argv)
+
+    with DealStore(args.store) as store:
+        if args.command == "list":
+            rows = store.find(args.client, args.facility, args.structure)
+        else:
+            start, end = (args.start, args.end) if args.end else quarter(args.start)
+            rows = store.due_between(start, end, args.client)
+    if rows:
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Schedule exports: streaming XLSX, CSV and Parquet, for one deal or a whole book.
+
+Every writer takes rows straight from a ``Schedule`` (no DataFrame) and
+writes them as it goes: XLSX through openpyxl's write-only mode, CSV through
+``csv`` and Parquet one row group per deal. Memory stays flat however long
+the schedule or however many deals go into one file. Nothing here runs until
+an export is actually requested.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+
+from amortisation import SCHEDULE_COLUMNS
+from instrumentation import phase
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+PARQUET_MIME = "application/vnd.apache.parquet"
+XLSX_MAX_ROWS = 1_048_576  # Excel's row limit per sheet, header included
+
+EXPORT_FORMATS = {
+    "Excel": ("xlsx", XLSX_MIME),
+    "CSV": ("csv", CSV_MIME),
+    "Parquet": ("parquet", PARQUET_MIME),
+}
+
+
+def _clean(name):
+    return "".join(c for c in name if c.isalnum() or c in (' ', '_')).replace(' ', '_')
+
+
+def export_filename(deal, extension="xlsx"):
+    """``<Client>_<Facility>_Amort_<YYYYMMDD>.<extension>``."""
+    return f"{_clean(deal.client_name)}_{_clean(deal.facility_name)}_Amort_{datetime.now().strftime('%Y%m%d')}.{extension}"
+
+
+def input_summary(deal):
+    """The Field/Value pairs written to the Inputs sheet."""
+    input_fields = [
+        "Client Name", "Facility Name", "Facility Amount", "Residual",
+        "Repayment Structure", "Rate Structure", "Interest Accrual", "Rounding",
+        "Drawdown Structure",
+        "Term (Months)", "Capitalise Fees", "First Payment Date",
+        "Payment Day Rule", "Business Day Convention", "Holiday Calendar",
+        "Custom Capital Repayments"
+    ]
+    input_values = [
+        deal.client_name, deal.facility_name, f"R{deal.facility_amount:,.2f}", f"R{deal.residual:,.2f}",
+        deal.repayment_structure, deal.rate_structure, deal.day_count, deal.rounding,
+        deal.drawdown_structure,
+        deal.term_months, "Yes" if deal.capitalise_fees else "No",
+        deal.first_payment_date.strftime("%Y-%m-%d"),
+        deal.month_end, deal.business_day, deal.holidays,
+        "Yes" if deal.custom_capital_schedule else "No"
+    ]
+
+    if deal.capitalise_fees:
+        for fee in deal.custom_fees:
+            input_fields.append(f"{fee['name']} ({fee['type']})")
+            input_values.append(f"R{fee['amount']:,.2f}")
+        input_fields.append("Total Fees")
+        input_values.append(f"R{deal.total_fees:,.2f}")
+
+    input_fields.append("Full Capital Amount")
+    input_values.append(f"R{deal.full_capital:,.2f}")
+    return input_fields, input_values
+
+
+def _dated(items):
+    """Drawdown / custom capital dicts with their dates as ``YYYY-MM-DD``."""
+    return [{**item, 'date': item['date'].strftime("%Y-%m-%d")} for item in items]
+
+
+# ───────────────────────────────────────────────────────────────
+# XLSX
+# ───────────────────────────────────────────────────────────────
+def _sheet(workbook, title, header, rows):
+    """Append a write-only sheet with a bold header row."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    sheet = workbook.create_sheet(title)
+    bold = Font(bold=True)
+    header_cells = []
+    for name in header:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = bold
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    for row in rows:
+        sheet.append(row)
+    return sheet
+
+
+def _dict_sheet(workbook, title, items):
+    header = list(items[0].keys())
+    _sheet(workbook, title, header, ([item[k] for k in header] for item in items))
+
+
+def write_xlsx(target, deal, schedule):
+    """Stream the deal's workbook (inputs, schedule, input detail sheets) to ``target``."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    input_fields, input_values = input_summary(deal)
+    _sheet(workbook, "Inputs", ["Field", "Value"], zip(input_fields, input_values))
+    _sheet(workbook, "Schedule", SCHEDULE_COLUMNS, schedule.iter_rows())
+
+    # Additional sheets for complex structures
+    if deal.drawdown_structure == "Multiple Drawdowns":
+        _dict_sheet(workbook, "Drawdown Schedule", _dated(deal.drawdown_schedule))
+    if deal.rate_structure == "Variable Rate":
+        _dict_sheet(workbook, "Rate Schedule", deal.rate_schedule)
+    if deal.repayment_structure == "Structured Capital":
+        _dict_sheet(workbook, "Payment Structure", deal.structured_payments)
+    if deal.custom_capital_schedule:
+        _dict_sheet(workbook, "Custom Capital", _dated(deal.custom_capital_schedule))
+
+    workbook.save(target)
+
+
+def excel_bytes(deal, schedule):
+    buffer = io.BytesIO()
+    write_xlsx(buffer, deal, schedule)
+    return buffer.getvalue()
+
+
+# ───────────────────────────────────────────────────────────────
+# CSV / PARQUET
+# ───────────────────────────────────────────────────────────────
+def csv_bytes(schedule):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCHEDULE_COLUMNS)
+    writer.writerows(schedule.iter_rows())
+    return buffer.getvalue().encode()
+
+
+def _arrow_schema(with_deal_id=False):
+    import pyarrow as pa
+
+    fields = [pa.field("deal_id", pa.string())] if with_deal_id else []
+    for name in SCHEDULE_COLUMNS:
+        if name == "Period":
+            fields.append(pa.field(name, pa.int64()))
+        elif name == "Payment Date":
+            fields.append(pa.field(name, pa.string()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+def _arrow_table(schedule, schema, deal_id=None):
+    """Arrow table over the schedule's column arrays (numeric columns are not copied)."""
+    import pyarrow as pa
+
+    data = dict(schedule.columns)
+    data["Payment Date"] = np.datetime_as_string(data["Payment Date"], unit="D")
+    if deal_id is not None:
+        data = {"deal_id": [str(deal_id)] * len(schedule), **data}
+    return pa.Table.from_pydict(data, schema=schema)
+
+
+def parquet_bytes(schedule):
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(_arrow_table(schedule, _arrow_schema()), buffer)
+    return buffer.getvalue()
+
+
+def export_bytes(fmt, deal, schedule):
+    """Bytes for one deal in an ``EXPORT_FORMATS`` format."""
+    with phase("export"):
+        if fmt == "Excel":
+            return excel_bytes(deal, schedule)
+        if fmt == "CSV":
+            return csv_bytes(schedule)
+        if fmt == "Parquet":
+            return parquet_bytes(schedule)
+    raise ValueError(f"Unknown export format {fmt!r}")
+
+
+def table_bytes(fmt, header, rows, title="Sheet1"):
+    """Bytes for a plain table (``rows`` are dicts keyed by ``header``) in an ``EXPORT_FORMATS`` format."""
+    values = ([row[name] for name in header] for row in rows)
+    if fmt == "Excel":
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        _sheet(workbook, title, header, values)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+    if fmt == "CSV":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(values)
+        return buffer.getvalue().encode()
+    if fmt == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pylist([{name: row[name] for name in header} for row in rows]), buffer)
+        return buffer.getvalue()
+    raise ValueError(f"Unknown export format {fmt!r}")
+
+
+def comparison_bytes(fmt, header, rows, results):
+    """One file for a structure comparison (see ``compare.py``).
+
+    Excel gets the comparison ``rows`` on a first sheet and each variant's
+    schedule on its own; CSV and Parquet hold one table, so they stack the
+    schedules with a leading ``Variant`` column.
+    """
+    with phase("export"):
+        if fmt == "Excel":
+            from openpyxl import Workbook
+
+            workbook = Workbook(write_only=True)
+            _sheet(workbook, "Comparison", header, ([row[name] for name in header] for row in rows))
+            for number, (label, _, schedule) in enumerate(results, 1):
+                # Sheet titles are capped at 31 characters and must be unique
+                _sheet(workbook, f"{number} {_clean(label)}"[:31], SCHEDULE_COLUMNS, schedule.iter_rows())
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            return buffer.getvalue()
+        if fmt == "CSV":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(["Variant"] + SCHEDULE_COLUMNS)
+            for label, _, schedule in results:
+                writer.writerows((label,) + row for row in schedule.iter_rows())
+            return buffer.getvalue().encode()
+        if fmt == "Parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = _arrow_schema(with_deal_id=True)
+            tables = [_arrow_table(schedule, schema, label) for label, _, schedule in results]
+            buffer = io.BytesIO()
+            pq.write_table(pa.concat_tables(tables).rename_columns(["Variant"] + SCHEDULE_COLUMNS), buffer)
+            return buffer.getvalue()
+    raise ValueError(f"Unknown export format {fmt!r}")
+
+
+# ───────────────────────────────────────────────────────────────
+# MULTI-DEAL BOOKS
+# ───────────────────────────────────────────────────────────────
+class BookWriter:
+    """Append many deals' schedules to one CSV, Parquet or XLSX file.
+
+    Each ``add`` writes that deal's rows (prefixed with ``deal_id``) and lets
+    them go, so a book of any size is exported without holding it in RAM.
+    XLSX starts a new "Schedules 2", "Schedules 3"... sheet whenever the next
+    deal would pass Excel's row limit, so a deal never spans two sheets (CSV
+    and Parquet are better suited to books that large)::
+
+        with BookWriter("book.parquet") as book:
+            for deal_id, schedule in results:
+                book.add(deal_id, schedule)
+    """
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+        self.deals = 0
+        header = ["deal_id"] + SCHEDULE_COLUMNS
+        if self.fmt == "csv":
+            self._file = open(path, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(header)
+        elif self.fmt in ("parquet", "pq"):
+            import pyarrow.parquet as pq
+            self._schema = _arrow_schema(with_deal_id=True)
+            self._parquet = pq.ParquetWriter(path, self._schema)
+        elif self.fmt == "xlsx":
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+            self._sheets = 0
+            self._new_sheet()
+        else:
+            raise ValueError(f"Unsupported book format {self.fmt!r} (use csv, parquet or xlsx)")
+
+    def _new_sheet(self):
+        self._sheets += 1
+        self._sheet = self._workbook.create_sheet("Schedules" if self._sheets == 1 else f"Schedules {self._sheets}")
+        self._sheet.append(["deal_id"] + SCHEDULE_COLUMNS)
+        self._sheet_rows = 1
+
+    def add(self, deal_id, schedule):
+        if self.fmt == "csv":
+            self._csv.writerows((deal_id,) + row for row in schedule.iter_rows())
+        elif self.fmt in ("parquet", "pq"):
+            self._parquet.write_table(_arrow_table(schedule, self._schema, deal_id))
+        else:
+            if self._sheet_rows + len(schedule) > XLSX_MAX_ROWS:
+                self._new_sheet()
+            for row in schedule.iter_rows():
+                self._sheet.append((deal_id,) + row)
+            self._sheet_rows += len(schedule)
+        self.deals += 1
+
+    def close(self):
+        if self.fmt == "csv":
+            self._file.close()
+        elif self.fmt in ("parquet", "pq"):
+            self._parquet.close()
+        else:
+            self._workbook.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
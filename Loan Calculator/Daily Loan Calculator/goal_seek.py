@@ -0,0 +1,230 @@
+"""Goal-seek the input that lands a deal's final balance on its residual.
+
+``calculate_pmt`` only knows one fixed rate and one drawdown, so for variable
+rates, multiple drawdowns, custom capital and capitalised interest the
+suggested payment is an estimate. These solvers search on the full engine
+instead: each candidate is priced with ``run_compiled`` and cached, a secant
+step proposes the next candidate and a bracket that only ever narrows keeps
+the search safe. Results land on whole cents (payment, facility) or whole
+months (term).
+"""
+import time
+from dataclasses import dataclass, replace
+
+from amortisation import DealError, Schedule, compile_deal, run_compiled, suggested_payment
+
+MAX_TERM_MONTHS = 1200
+
+
+@dataclass
+class SolveResult:
+    """Outcome of a goal-seek: the solved input and the schedule it produces."""
+    target: str          # "payment", "facility" or "term"
+    value: float
+    final_balance: float
+    expected_final: float
+    iterations: int      # engine evaluations
+    elapsed: float       # seconds
+    converged: bool
+    schedule: Schedule
+
+
+class _Evaluator:
+    """Prices candidates through ``price(x)``, caching each schedule by ``x``."""
+
+    def __init__(self, price):
+        self._price = price
+        self.cache = {}
+
+    def schedule(self, x):
+        if x not in self.cache:
+            self.cache[x] = self._price(x)
+        return self.cache[x]
+
+    def gap(self, x):
+        """Final balance minus the expected final balance at candidate ``x``."""
+        result = self.schedule(x)
+        return result.final_balance - result.expected_final
+
+
+class _Probe:
+    """Wraps a target function and remembers every ``(x, value)`` it returned."""
+
+    def __init__(self, value):
+        self._value = value
+        self.points = []
+
+    def __call__(self, x):
+        y = self._value(x)
+        self.points.append((x, y))
+        return y
+
+
+def _secant(points):
+    """Crossing predicted by the newest usable pair of probed points.
+
+    A usable pair sits on the same side of zero (one side is often a
+    plateau, e.g. a balance already clipped to the residual), at different
+    heights and at least two steps apart, since adjacent cents differ mostly
+    by rounding noise.
+    """
+    for i in range(len(points) - 1, 0, -1):
+        x1, y1 = points[i]
+        for x0, y0 in reversed(points[:i]):
+            if abs(x1 - x0) > 1 and y0 != y1 and (y0 > 0) == (y1 > 0):
+                return round(x1 - y1 * (x1 - x0) / (y1 - y0))
+    return None
+
+
+def _bracket(probe, guess, floor=0, limit=10**15):
+    """Widen geometrically from ``guess`` until ``probe`` changes sign.
+
+    Returns ``(lo, hi)`` with ``probe(lo) > 0 >= probe(hi)``, or ``None``
+    when no crossing exists inside ``[floor, limit]``. The guess's neighbour
+    is tried first (the suggested payment is often already right), and one
+    extra point past the crossing gives the secant a pair on each side.
+    """
+    clip = lambda x: min(max(x, floor), limit)
+    guess = clip(max(guess, floor + 1))
+    up = probe(guess) > 0  # the crossing lies above the guess
+    direction = 1 if up else -1
+    near, step = guess, 1
+    while True:
+        far = clip(near + direction * step)
+        if far == near:
+            return None
+        if (probe(far) > 0) != up:
+            beyond = clip(far + direction * step)
+            if step > 1 and beyond != far:
+                probe(beyond)
+            return (near, far) if up else (far, near)
+        near = far
+        step = max(2, guess // 100) if step == 1 else step * 4
+
+
+def _first_at_or_below(probe, lo, hi):
+    """Smallest integer in ``(lo, hi]`` where the non-increasing target is <= 0.
+
+    Needs ``probe(lo) > 0 >= probe(hi)``. A secant step proposes the crossing
+    and its neighbour is probed too, so a near-linear target closes the
+    bracket in a handful of calls. Whenever a step fails to halve the bracket
+    (plateaus, kinks) the next one bisects, so the worst case stays
+    logarithmic.
+    """
+    bisect = False
+    while hi - lo > 1:
+        width = hi - lo
+        guess = None if bisect else _secant(probe.points)
+        secant_step = guess is not None and lo < guess < hi
+        if not secant_step:
+            guess = (lo + hi) // 2
+
+        if probe(guess) > 0:
+            lo, neighbour = guess, guess + 1
+        else:
+            hi, neighbour = guess, guess - 1
+        if secant_step and lo < neighbour < hi:
+            if probe(neighbour) > 0:
+                lo = neighbour
+            else:
+                hi = neighbour
+        bisect = hi - lo > width // 2
+    return hi
+
+
+def _result(target, key, evaluator, start, converged, scale=1):
+    """Package candidate ``key`` (reported as ``key / scale``) as a ``SolveResult``."""
+    schedule = evaluator.schedule(key)
+    return SolveResult(
+        target=target,
+        value=key / scale if scale != 1 else key,
+        final_balance=schedule.final_balance,
+        expected_final=schedule.expected_final,
+        iterations=len(evaluator.cache),
+        elapsed=time.perf_counter() - start,
+        converged=converged,
+        schedule=schedule,
+    )
+
+
+# ───────────────────────────────────────────────────────────────
+# SOLVERS
+# ───────────────────────────────────────────────────────────────
+def _solve(target, value, evaluator, start, guess, floor=0, limit=10**15, scale=1, below=False):
+    """Bracket around ``guess``, then close in on the crossing of ``value``.
+
+    ``below`` returns the last candidate above zero rather than the first one
+    at or below it (for targets where bigger means "too big").
+    """
+    probe = _Probe(value)
+    bracket = _bracket(probe, guess, floor, limit)
+    if bracket is None:
+        return _result(target, min(max(guess, floor + 1), limit), evaluator, start, False, scale)
+    found = _first_at_or_below(probe, *bracket)
+    return _result(target, found - 1 if below else found, evaluator, start, True, scale)
+
+
+def solve_payment(deal):
+    """Smallest monthly payment (to the cent) that repays ``deal`` down to its residual."""
+    if deal.repayment_structure not in ("Equal Installments", "Capitalised Interest"):
+        raise DealError(f"{deal.repayment_structure} has no single monthly payment to solve for")
+    start = time.perf_counter()
+    compiled = compile_deal(deal)
+    evaluator = _Evaluator(lambda cents: run_compiled(compiled, cents / 100))
+
+    if evaluator.gap(0) <= 0:
+        return _result("payment", 0, evaluator, start, True, scale=100)
+    guess = int(round(suggested_payment(deal, compiled) * 100))
+    return _solve("payment", evaluator.gap, evaluator, start, guess, scale=100)
+
+
+def _fixed_payment(deal):
+    if deal.monthly_payment is not None:
+        return deal.monthly_payment
+    return suggested_payment(deal) if deal.repayment_structure != "Structured Capital" else 0.0
+
+
+def solve_facility(deal):
+    """Largest facility amount (to the cent) the deal's payments repay down to its residual.
+
+    The payment is ``deal.monthly_payment``, or the suggested payment for the
+    deal as entered. Capitalised fees stay at their entered amounts and
+    multiple drawdowns are scaled pro rata with the facility.
+    """
+    if deal.repayment_structure == "Interest Only":
+        raise DealError("Interest Only repays any facility down to its residual")
+    start = time.perf_counter()
+    monthly_payment = _fixed_payment(deal)
+
+    def price(cents):
+        facility = cents / 100
+        drawdowns = deal.drawdown_schedule
+        if drawdowns and deal.facility_amount:
+            scale = facility / deal.facility_amount
+            drawdowns = [{**dd, 'amount': round(dd['amount'] * scale, 2)} for dd in drawdowns]
+        sized = replace(deal, facility_amount=facility, drawdown_schedule=drawdowns)
+        return run_compiled(compile_deal(sized), monthly_payment)
+
+    evaluator = _Evaluator(price)
+    # A balance that ends above the residual means the facility is too big
+    too_big = lambda cents: 0.005 - evaluator.gap(cents)
+    guess = int(round(deal.facility_amount * 100))
+    return _solve("facility", too_big, evaluator, start, guess, scale=100, below=True)
+
+
+def solve_term(deal, max_term=MAX_TERM_MONTHS):
+    """Shortest term in months over which the deal's payment reaches its residual."""
+    if deal.repayment_structure == "Interest Only":
+        raise DealError("Interest Only repays in its final period whatever the term")
+    start = time.perf_counter()
+    monthly_payment = _fixed_payment(deal)
+
+    evaluator = _Evaluator(
+        lambda months: run_compiled(compile_deal(replace(deal, term_months=months)), monthly_payment)
+    )
+    over = lambda months: evaluator.gap(months) - 0.005
+
+    floor = max(1, deal.capitalisation_months)
+    if over(floor) <= 0:
+        return _result("term", floor, evaluator, start, True)
+    return _solve("term", over, evaluator, start, deal.term_months, floor=floor, limit=max_term)
@@ -0,0 +1,180 @@
+"""Per-phase wall time and allocation tracking for a pricing run.
+
+The engine, cache and page wrap each phase in ``with phase("name"):``.
+Nothing is measured unless someone is listening, so the disabled cost is
+one attribute lookup per phase:
+
+* ``collect()`` gathers the phases run on the current thread (the page's
+  debug panel uses it for one rerun), with allocations when ``memory=True``;
+* ``add_hook(fn)`` sends every phase, on every thread, to ``fn`` as a dict
+  (``log_hook`` writes them as JSON log lines to the ``amortisation.timing``
+  logger; setting ``AMORT_TIMING_LOG=1`` installs it at import).
+
+    with collect(memory=True) as records:
+        generate_schedule(deal)
+    records  # [{"phase": "suggested_payment", "ms": 0.4, ...}, ...]
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PHASES = [
+    "imports", "inputs", "fees", "lookups", "suggested_payment", "period_loop",
+    "dataframe", "summary", "table", "export", "rerun",
+]
+
+logger = logging.getLogger("amortisation.timing")
+
+_local = threading.local()
+_hooks = []
+
+
+class _Null:
+    """Shared do-nothing context manager returned while instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def stop(self):
+        pass
+
+
+_NULL = _Null()
+
+
+class _Phase:
+    def __init__(self, name, collector):
+        self.name = name
+        self.collector = collector
+
+    def __enter__(self):
+        collector = self.collector
+        if collector is not None and collector.memory:
+            collector.enter()
+            self.allocated = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record = {"phase": self.name, "ms": round((time.perf_counter() - self.start) * 1000, 3)}
+        collector = self.collector
+        if collector is not None and collector.memory:
+            current, peak = collector.exit()
+            record["alloc_kib"] = round((current - self.allocated) / 1024, 1)
+            record["peak_kib"] = round((peak - self.allocated) / 1024, 1)
+        _emit(record, collector)
+        return False
+
+    def stop(self):
+        self.__exit__(None, None, None)
+
+
+class _Collector:
+    """Records for one ``collect()`` block; tracks peaks across nested phases."""
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.records = []
+        self._peaks = []
+
+    def enter(self):
+        # Fold the running peak into the enclosing phase before resetting it
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._peaks.append(0)
+
+    def exit(self):
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self._peaks.pop())
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        return current, peak
+
+
+def _emit(record, collector):
+    if collector is not None:
+        collector.records.append(record)
+    for hook in _hooks:
+        hook(record)
+
+
+def record_span(name, seconds):
+    """Report a span timed by the caller (e.g. before this module was imported) as a phase."""
+    collector = getattr(_local, "collector", None)
+    if collector is not None or _hooks:
+        _emit({"phase": name, "ms": round(seconds * 1000, 3)}, collector)
+
+
+def phase(name):
+    """Context manager timing ``name``; a shared no-op unless collecting or hooked."""
+    collector = getattr(_local, "collector", None)
+    if collector is None and not _hooks:
+        return _NULL
+    return _Phase(name, collector)
+
+
+def start_phase(name):
+    """``phase(name)`` already entered; call ``.stop()`` on it to record it.
+
+    For spans that are not one block, such as a run of top-level page code.
+    """
+    return phase(name).__enter__()
+
+
+@contextmanager
+def collect(memory=False):
+    """Collect every phase run on this thread inside the block into a list."""
+    collector = _Collector(memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    previous, _local.collector = getattr(_local, "collector", None), collector
+    try:
+        yield collector.records
+    finally:
+        _local.collector = previous
+        if started:
+            tracemalloc.stop()
+
+
+def add_hook(hook):
+    """Call ``hook(record)`` for every phase from now on (e.g. a metrics client)."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def log_hook(record):
+    """Metrics hook that writes each phase as one structured JSON log line."""
+    logger.info(json.dumps({"event": "phase", **record}))
+
+
+def summarise_phases(records):
+    """Records totalled per phase, in ``PHASES`` order, with a ``calls`` count."""
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record["phase"], {"phase": record["phase"], "calls": 0})
+        total["calls"] += 1
+        for name, value in record.items():
+            if name == "peak_kib":
+                total[name] = max(total.get(name, 0.0), value)
+            elif name != "phase":
+                total[name] = round(total.get(name, 0.0) + value, 3)
+    order = {name: i for i, name in enumerate(PHASES)}
+    return sorted(totals.values(), key=lambda total: order.get(total["phase"], len(order)))
+
+
+if os.environ.get("AMORT_TIMING_LOG"):
+    add_hook(log_hook)
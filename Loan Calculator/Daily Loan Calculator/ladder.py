@@ -0,0 +1,190 @@
+"""Monthly cashflow and exposure ladder across a whole book.
+
+Schedules are folded into running totals a block at a time and then let go,
+so a book of any size is aggregated without ever holding its schedules
+(or one big DataFrame) in memory. Totals are kept per client, repayment
+structure and rate structure and per payment month; coarser ladders are
+roll-ups of those:
+
+    ladder = Ladder()
+    ladder.add_many((deal, schedule) for ...)     # any number of times
+    ladder.rows(by=["Client"])                    # one row per client and month
+
+    python ladder.py book.parquet ladder.xlsx --workers 16
+    python ladder.py --from-store store/deals.sqlite ladder.csv --by Client
+
+Each month's Drawdown, Interest, Total Principal and Total Payment are the
+sums over the periods falling due that month (period k of a deal is due in
+the k-th month from its first payment); Ending Balance is the book's
+exposure after those payments and Deals counts the deals paying.
+"""
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+GROUP_FIELDS = ["Client", "Repayment Structure", "Rate Structure"]
+MEASURES = ["Drawdown", "Interest", "Total Principal", "Total Payment", "Ending Balance"]
+LADDER_COLUMNS = GROUP_FIELDS + ["Month", "Deals"] + MEASURES
+LADDER_BLOCK = 1024  # deals folded into the totals per call
+
+
+def group_of(deal):
+    """The ``GROUP_FIELDS`` values for ``deal``."""
+    return deal.client_name, deal.repayment_structure, deal.rate_structure
+
+
+class Ladder:
+    """Running ``groups x months x (Deals + MEASURES)`` totals; grows as new groups and months arrive."""
+
+    def __init__(self):
+        self.groups = {}  # group tuple -> row in the totals
+        self.deals = 0
+        self._first = None  # datetime64[M] of month column 0
+        self._totals = np.zeros((0, 0, len(MEASURES) + 1))
+
+    def _fit(self, groups, first, last):
+        """Grow the totals to hold ``groups`` rows and months ``first..last``."""
+        rows, months = self._totals.shape[:2]
+        start = first if self._first is None else min(self._first, first)
+        shift = 0 if self._first is None else int(self._first - start)
+        width = max(shift + months, int(last - start) + 1)
+        if groups > rows or width > months:
+            # Leave headroom so a growing book reallocates only a handful of times
+            grown = np.zeros((max(groups, 2 * rows), width + (width // 2 if months else 0), self._totals.shape[2]))
+            grown[:rows, shift:shift + months] = self._totals
+            self._totals = grown
+        self._first = start
+
+    def add(self, deal, schedule):
+        self.add_many([(deal, schedule)])
+
+    def add_many(self, pairs):
+        """Fold a block of ``(deal, schedule)`` pairs into the totals."""
+        pairs = [(deal, schedule) for deal, schedule in pairs if len(schedule)]
+        if not pairs:
+            return
+        rows = np.concatenate([
+            np.full(len(schedule), self.groups.setdefault(group_of(deal), len(self.groups)))
+            for deal, schedule in pairs
+        ])
+        # Period k falls in the k-th month from the first payment's, whatever business-day roll moved its date
+        months = np.concatenate([
+            np.datetime64(deal.first_payment_date, "M") + (schedule.columns["Period"] - 1) for deal, schedule in pairs
+        ])
+        self._fit(len(self.groups), months.min(), months.max())
+        width = self._totals.shape[1]
+        cells = rows * width + (months - self._first).astype(np.int64)
+        size = self._totals.shape[0] * width
+        # One bincount per measure instead of a Python loop over periods
+        block = [np.bincount(cells, minlength=size)]
+        for name in MEASURES:
+            values = np.concatenate([schedule.columns[name] for _, schedule in pairs])
+            block.append(np.bincount(cells, weights=values, minlength=size))
+        self._totals += np.stack(block, axis=-1).reshape(self._totals.shape)
+        self.deals += len(pairs)
+
+    def rows(self, by=GROUP_FIELDS):
+        """Ladder rows (dicts keyed by ``LADDER_COLUMNS``) rolled up to the ``by`` fields, by group then month."""
+        keep = [GROUP_FIELDS.index(name) for name in by]
+        rolled = {}
+        for group, row in self.groups.items():
+            key = tuple(group[i] for i in keep)
+            rolled[key] = rolled[key] + self._totals[row] if key in rolled else self._totals[row].copy()
+        out = []
+        for key in sorted(rolled):
+            totals = rolled[key]
+            labels = dict(zip(GROUP_FIELDS, [""] * len(GROUP_FIELDS)))
+            labels.update(zip(by, key))
+            for offset in np.flatnonzero(totals[:, 0]):
+                out.append({
+                    **labels,
+                    "Month": str(self._first + offset),
+                    "Deals": int(totals[offset, 0]),
+                    **{name: round(float(value), 2) for name, value in zip(MEASURES, totals[offset, 1:])},
+                })
+        return out
+
+
+# ───────────────────────────────────────────────────────────────
+# SOURCES
+# ───────────────────────────────────────────────────────────────
+def ladder_from_records(records, workers=None, chunksize=16, block=LADDER_BLOCK):
+    """Price book rows (see ``batch.py``) on a process pool straight into a ``Ladder``.
+
+    Returns ``(ladder, failed)``; schedules are dropped once folded in.
+    """
+    from batch import price_record
+
+    ladder, pending, failed = Ladder(), [], 0
+    with Pool(processes=workers or os.cpu_count()) as pool:
+        for _, deal, schedule in pool.imap_unordered(price_record, records, chunksize=chunksize):
+            if schedule is None:
+                failed += 1
+                continue
+            pending.append((deal, schedule))
+            if len(pending) >= block:
+                ladder.add_many(pending)
+                pending.clear()
+    ladder.add_many(pending)
+    return ladder, failed
+
+
+def ladder_from_store(store, block=LADDER_BLOCK):
+    """A ``Ladder`` of every schedule saved in a ``deal_store.DealStore``, read a block at a time."""
+    ladder, pending = Ladder(), []
+    for pair in store.iter_schedules():
+        pending.append(pair)
+        if len(pending) >= block:
+            ladder.add_many(pending)
+            pending.clear()
+    ladder.add_many(pending)
+    return ladder
+
+
+def write_ladder(path, rows):
+    """Write ladder rows as ``.csv``, ``.xlsx`` or ``.parquet`` (by extension)."""
+    from export import EXPORT_FORMATS, table_bytes
+
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    formats = {ext: name for name, (ext, _) in EXPORT_FORMATS.items()}
+    if extension not in formats:
+        raise ValueError(f"Unsupported ladder format {extension!r} (use {', '.join(formats)})")
+    with open(path, "wb") as f:
+        f.write(table_bytes(formats[extension], LADDER_COLUMNS, rows, "Ladder"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate a book into a monthly cashflow and exposure ladder.")
+    parser.add_argument("book", nargs="?", help="CSV or Parquet file, one row per facility")
+    parser.add_argument("out", help="ladder file (.csv, .xlsx or .parquet)")
+    parser.add_argument("--from-store", metavar="PATH", help="aggregate the schedules saved in this deal store instead")
+    parser.add_argument("--by", nargs="+", choices=GROUP_FIELDS, default=GROUP_FIELDS,
+                        help="group fields to keep (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=16, help="deals handed to a worker at a time")
+    args = parser.parse_args(argv)
+    if bool(args.book) == bool(args.from_store):
+        parser.error("give either a book file or --from-store")
+
+    start = time.perf_counter()
+    failed = 0
+    if args.from_store:
+        from deal_store import DealStore
+
+        with DealStore(args.from_store) as store:
+            ladder = ladder_from_store(store)
+    else:
+        from batch import read_book
+
+        ladder, failed = ladder_from_records(read_book(args.book), workers=args.workers, chunksize=args.chunksize)
+    rows = ladder.rows(args.by)
+    write_ladder(args.out, rows)
+    elapsed = time.perf_counter() - start
+    print(f"Laddered {ladder.deals} deals ({failed} failed) into {len(rows)} rows in {elapsed:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Optional Numba-compiled period loop for the monthly Float engine.
+
+``period_loop`` is ``amortisation._generate_loop`` restated over typed
+arrays (no dicts, lists or strings), so Numba can compile it to machine
+code. It covers every structure the loop does: Capitalised Interest with
+its negative-amortisation guard, Structured Capital and the custom capital
+/ residual caps.
+
+Python's ``round(x, 2)`` is decided on the exact binary value of ``x``; a
+compiled ``round`` scales first and can land a near-tie on the other side.
+``round_to`` makes the same decision with an exact (Dekker) product, so
+the compiled path matches the reference loop to the bit.
+
+Numba is optional and the compiled path is opt-in: the engine only uses
+it when Numba is installed and ``AMORT_JIT=1`` is set, and otherwise keeps
+the pure-Python loop (this module is then never compiled). Run
+``parity.py`` where Numba is installed before switching it on; it checks
+the compiled kernel against the reference loop.
+"""
+import math
+import os
+import types
+from importlib.util import find_spec
+
+import numpy as np
+
+NUMBA_INSTALLED = find_spec("numba") is not None
+JIT_AVAILABLE = NUMBA_INSTALLED and os.environ.get("AMORT_JIT", "0") == "1"  # the engine's switch
+
+# Codes for ``structure``, in ``amortisation.REPAYMENT_STRUCTURES`` order
+EQUAL_INSTALLMENTS, INTEREST_ONLY, CAPITALISED_INTEREST, STRUCTURED_CAPITAL = range(4)
+
+# Rows of ``out``, in ``amortisation._allocate_columns`` order
+OPENING, DRAWDOWN, BEFORE, RATE, INTEREST, REGULAR, CUSTOM, PRINCIPAL, PAYMENT, ENDING = range(10)
+
+_SPLIT = 134217729.0  # 2**27 + 1, Veltkamp splitting constant
+
+
+def round_to(x, scale):
+    """``round(x, digits)`` with ``scale = 10.0 ** digits``, decided on the exact value of ``x``."""
+    # Dekker's two-product: hi + lo == x * scale exactly
+    hi = x * scale
+    t = _SPLIT * x
+    xh = t - (t - x)
+    xl = x - xh
+    t = _SPLIT * scale
+    sh = t - (t - scale)
+    sl = scale - sh
+    lo = ((xh * sh - hi) + xh * sl + xl * sh) + xl * sl
+    if not abs(hi) < 4503599627370496.0:  # 2**52: already whole (or not finite)
+        return x
+    whole = math.floor(hi)
+    half = (hi - whole) - 0.5
+    if half == 0.0:
+        half = lo
+    if half > 0.0 or (half == 0.0 and whole % 2.0 == 1.0):
+        whole += 1.0
+    return math.copysign(whole / scale, x)
+
+
+def period_loop(structure, rates, drawdowns, structured, custom_requested, monthly_payment, residual,
+                capitalisation_months, start, balance, out):
+    """Run periods ``start + 1 .. n`` from ``balance`` into ``out`` (10 x rows); returns the closing balance."""
+    term_months = rates.shape[0]
+    for period in range(start + 1, term_months + 1):
+        k = period - 1
+        row = k - start
+        opening_balance = balance
+
+        drawdown = drawdowns[k]
+        balance += drawdown
+        balance_before_interest = round_to(balance, 100.0)
+        current_rate = rates[k]
+        interest = round_to(balance_before_interest * (current_rate / 100 / 12), 100.0)
+
+        regular_principal = 0.0
+        regular_payment = interest
+        if structure == CAPITALISED_INTEREST and period <= capitalisation_months:
+            regular_principal = -interest
+            regular_payment = 0.0
+        elif structure == EQUAL_INSTALLMENTS or structure == CAPITALISED_INTEREST:
+            regular_principal = monthly_payment - interest
+            if regular_principal < 0:
+                regular_principal = 0.0
+            regular_payment = monthly_payment
+        elif structure == STRUCTURED_CAPITAL:
+            regular_principal = structured[k]
+            regular_payment = interest + regular_principal
+
+        if period == term_months:
+            payable = balance_before_interest - residual
+            payable = payable if payable > 0 else 0.0
+            if structure == INTEREST_ONLY:
+                regular_principal = payable
+                regular_payment = interest + regular_principal
+            elif residual > 0:
+                regular_principal = payable if payable < regular_principal else regular_principal
+                regular_payment = interest + regular_principal
+
+        custom_capital = custom_requested[k]
+        if custom_capital != 0.0:
+            remaining_after_regular = balance_before_interest - regular_principal
+            remaining_after_regular = remaining_after_regular if remaining_after_regular > 0 else 0.0
+            custom_capital = remaining_after_regular if remaining_after_regular < custom_capital else custom_capital
+
+        total_principal = regular_principal + custom_capital
+        total_payment = interest + total_principal
+
+        balance = round_to(balance_before_interest - total_principal, 100.0)
+        balance = balance if balance > 0.0 else 0.0
+
+        out[OPENING, row] = round_to(opening_balance, 100.0)
+        out[DRAWDOWN, row] = round_to(drawdown, 100.0)
+        out[BEFORE, row] = balance_before_interest
+        out[RATE, row] = round_to(current_rate, 10000.0)
+        out[INTEREST, row] = interest
+        out[REGULAR, row] = round_to(regular_principal, 100.0)
+        out[CUSTOM, row] = round_to(custom_capital, 100.0)
+        out[PRINCIPAL, row] = round_to(total_principal, 100.0)
+        out[PAYMENT, row] = round_to(total_payment, 100.0)
+        out[ENDING, row] = balance
+    return balance
+
+
+_compiled = None
+
+
+def compiled_loop():
+    """``period_loop`` compiled with Numba (once per process, cached on disk)."""
+    global _compiled
+    if _compiled is None:
+        from numba import njit
+
+        # Compile a copy whose round_to is the jitted one; the Python kernel keeps the plain function
+        jit_globals = dict(globals(), round_to=njit(cache=True)(round_to))
+        _compiled = njit(cache=True)(types.FunctionType(period_loop.__code__, jit_globals, "period_loop"))
+    return _compiled
+
+
+def run_loop(structure, rates, drawdowns, structured, custom_requested, monthly_payment, residual,
+             capitalisation_months, start=0, balance=0.0, jit=True):
+    """``(out, closing balance)`` for periods after ``start``; ``jit=False`` runs the kernel in Python."""
+    out = np.empty((ENDING + 1, rates.shape[0] - start))
+    loop = compiled_loop() if jit else period_loop
+    closing = loop(structure, rates, drawdowns, structured, custom_requested, float(monthly_payment),
+                   float(residual), int(capitalisation_months), int(start), float(balance), out)
+    return out, closing
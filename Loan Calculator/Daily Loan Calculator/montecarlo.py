@@ -0,0 +1,177 @@
+"""Monte Carlo prime-rate paths for a deal.
+
+Prime follows a mean-reverting (Ornstein-Uhlenbeck / Vasicek) process
+stepped monthly from a fixed seed; each path's rate is prime plus the deal's
+margin for the period. Instead of running the period loop once per path,
+``simulate`` runs it once per period on a vector of every path's balance, so
+10k paths x 240 periods take a fraction of a second.
+
+    result = simulate(deal, start_prime=11.75, long_run=10.5, n_paths=10_000)
+    result.percentiles()["Total Interest"]["P50"]
+"""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from amortisation import DealError, compile_deal, round2, suggested_payment
+
+METRICS = ["Peak Installment", "Average Installment", "Total Interest", "Peak Balance", "Final Balance"]
+PERCENTILES = (5, 50, 95)
+
+
+def simulate_prime(n_paths, n_periods, start, long_run, speed=0.5, volatility=1.5, seed=42, tick=None, floor=0.0):
+    """``n_paths`` x ``n_periods`` matrix of monthly prime rates (%).
+
+    ``speed`` is the annual pull towards ``long_run`` and ``volatility`` the
+    annual standard deviation in percentage points. Column 0 is the first
+    payment period. ``tick`` (e.g. 0.25) snaps rates to the central bank's
+    step size; rates never go below ``floor``.
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1 / 12
+    decay = np.exp(-speed * dt)
+    # Exact OU transition: the discretisation stays stable for any step size
+    step_sd = volatility * np.sqrt((1 - decay ** 2) / (2 * speed)) if speed > 0 else volatility * np.sqrt(dt)
+    shocks = rng.standard_normal((n_periods, n_paths)) * step_sd
+
+    # Built period-major so each step writes one contiguous row; returned transposed
+    paths = np.empty((n_periods, n_paths))
+    rate = np.full(n_paths, float(start))
+    for k in range(n_periods):
+        paths[k] = rate
+        rate = long_run + (rate - long_run) * decay + shocks[k]
+    if tick:
+        paths = np.round(paths / tick) * tick
+    return np.maximum(paths, floor).T
+
+
+def margins(deal, start_prime):
+    """Margin % per period: the variable bands' margins, or the fixed rate over ``start_prime``."""
+    if deal.rate_structure == "Variable Rate" and deal.rate_schedule:
+        bands = sorted(deal.rate_schedule, key=lambda x: x['from_period'])
+        # Like the rates themselves, periods after the last band keep its margin
+        values = np.full(deal.term_months, float(bands[-1]['margin']))
+        for band in bands:
+            values[band['from_period'] - 1:band['to_period']] = band['margin']
+        return values
+    return np.full(deal.term_months, deal.interest_rate - start_prime)
+
+
+def _pmt(rates, periods, balance, residual):
+    """Vectorised ``calculate_pmt`` (positive payment) for each path."""
+    r = rates / 100 / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (1 + r) ** periods
+        pmt = np.where(r == 0, (balance - residual) / periods, r * (balance * z - residual) / (z - 1))
+    return round2(np.abs(pmt))
+
+
+@dataclass
+class MonteCarloResult:
+    """Per-path metrics (``METRICS``) plus the balance fan.
+
+    The simulated prime paths (paths x periods) are not kept: at the page's
+    limits they run to hundreds of MB, and the result is cached.
+    """
+    metrics: dict                # metric -> array with one value per path
+    balance_bands: np.ndarray    # PERCENTILES x periods of the ending balance
+    elapsed: float = 0.0
+
+    def percentiles(self, q=PERCENTILES):
+        """``{metric: {"P5": ..., "P50": ..., "P95": ...}}``."""
+        return {name: {f"P{p}": float(v) for p, v in zip(q, np.percentile(values, q))}
+                for name, values in self.metrics.items()}
+
+
+def simulate(deal, start_prime, long_run, n_paths=10_000, speed=0.5, volatility=1.5, seed=42,
+             tick=None, reprice=True):
+    """Run the schedule for ``n_paths`` simulated prime paths at once.
+
+    The deal's structure, drawdowns, custom capital and margins come from
+    ``compile_deal``; only the rate varies by path. With ``reprice`` the
+    Equal Installments / Capitalised Interest installment is recalculated
+    over the remaining term whenever a path's rate changes (as a lender
+    would); otherwise every path pays the deal's own monthly payment.
+    Only monthly accrual is simulated (the same ``rate / 12`` and float
+    rounding as the period loop).
+    """
+    if deal.day_count != "Monthly":
+        raise DealError("Monte Carlo simulation runs on monthly accrual only")
+    start = time.perf_counter()
+    compiled = compile_deal(deal)
+    n = deal.term_months
+    structure = deal.repayment_structure
+    residual = deal.residual
+    cap_months = deal.capitalisation_months if structure == "Capitalised Interest" else 0
+    amortising = structure in ("Equal Installments", "Capitalised Interest")
+
+    prime = simulate_prime(n_paths, n, start_prime, long_run, speed, volatility, seed, tick)
+    # Period-major (periods x paths) so every step below reads contiguous rows
+    rates = prime.T + margins(deal, start_prime)[:, None]
+    monthly_rates = rates / 100 / 12
+
+    fixed_payment = deal.monthly_payment
+    if fixed_payment is None:
+        fixed_payment = suggested_payment(deal, compiled) if structure != "Structured Capital" else 0.0
+    payment = np.full(n_paths, float(fixed_payment))
+
+    drawdowns = compiled.drawdowns.tolist()
+    custom = compiled.custom_capital.tolist()
+    structured = compiled.structured_principal.tolist()
+
+    balance = np.zeros(n_paths)
+    total_interest = np.zeros(n_paths)
+    peak_balance = np.zeros(n_paths)
+    peak_installment = np.zeros(n_paths)
+    sum_installment = np.zeros(n_paths)
+    endings = np.empty((n, n_paths))
+
+    for k in range(n):
+        period = k + 1
+        balance_before_interest = round2(balance + drawdowns[k])
+        interest = round2(balance_before_interest * monthly_rates[k])
+
+        if period <= cap_months:
+            principal = -interest
+        elif amortising:
+            if reprice:
+                changed = np.ones(n_paths, bool) if period == cap_months + 1 else rates[k] != rates[k - 1]
+                if changed.any():
+                    payment[changed] = _pmt(rates[k, changed], n - k, balance_before_interest[changed], residual)
+            principal = np.maximum(payment - interest, 0.0)
+        elif structure == "Structured Capital":
+            principal = np.full(n_paths, structured[k])
+        else:
+            principal = np.zeros(n_paths)
+
+        # FIX #7: Proper residual handling for final period - ALL structures
+        if period == n:
+            headroom = np.maximum(0, balance_before_interest - residual)
+            if structure == "Interest Only":
+                principal = headroom
+            elif residual > 0:
+                principal = np.minimum(principal, headroom)
+
+        custom_capital = np.minimum(custom[k], np.maximum(0, balance_before_interest - principal)) if custom[k] else 0.0
+        balance = np.maximum(0.0, round2(balance_before_interest - principal - custom_capital))
+
+        installment = np.where(period <= cap_months, 0.0, interest + principal)
+        total_interest += interest
+        peak_balance = np.maximum(peak_balance, balance_before_interest)
+        peak_installment = np.maximum(peak_installment, installment)
+        sum_installment += installment
+        endings[k] = balance
+
+    paying = max(1, n - cap_months)
+    return MonteCarloResult(
+        metrics={
+            "Peak Installment": round2(peak_installment),
+            "Average Installment": round2(sum_installment / paying),
+            "Total Interest": round2(total_interest),
+            "Peak Balance": peak_balance,
+            "Final Balance": balance,
+        },
+        balance_bands=np.percentile(endings, PERCENTILES, axis=1),
+        elapsed=time.perf_counter() - start,
+    )
@@ -0,0 +1,248 @@
+"""Parity checks for the engine's alternative paths.
+
+Every monthly, float-rounded benchmark case, plus seeded random deals with
+odd amounts and rates (so interest lands on half-cent near-ties), is priced
+by ``amortisation._generate_loop`` and by ``loop_kernel`` through
+``_generate_jit``, in full and resumed part-way as ``regenerate`` does. The
+two must agree to the bit in every column, not just to the cent.
+
+Each deal is then edited (rates, drawdowns, custom capital, structured
+payments, capitalisation months, installment, residual) under a monthly,
+day-count or cents convention, and ``regenerate`` from the unedited
+schedule must match pricing the edited deal from scratch:
+
+    python parity.py                 # compiled kernel if Numba is installed (AMORT_JIT aside), else in Python
+    python parity.py --random 5000 --seed 7
+    python parity.py --python        # always run the kernel in Python
+    python parity.py --random 0      # benchmark cases only
+
+Without Numba this still checks the kernel's logic and its exact rounding;
+with it, it checks the machine code the engine runs under ``AMORT_JIT=1``,
+so run it there before switching the compiled path on.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+from dataclasses import replace
+from dateutil.relativedelta import relativedelta
+
+import loop_kernel
+from amortisation import (
+    REPAYMENT_STRUCTURES, Deal, DealError, _generate_jit, _generate_loop, compile_deal, generate_schedule, regenerate,
+    suggested_payment,
+)
+from benchmark import build_deal, cases
+
+
+def random_deal(rng):
+    """A Monthly / Float deal with awkward amounts, rates and dates."""
+    term = rng.choice([1, 2, 7, 12, 37, 60, 121, 240, 360])
+    amount = round(rng.uniform(1_000, 250_000_000), 2)
+    first = date(2025, 1, 1) + relativedelta(days=rng.randrange(730))
+    structure = rng.choice(REPAYMENT_STRUCTURES)
+    kw = dict(
+        facility_amount=amount,
+        term_months=term,
+        first_payment_date=first,
+        repayment_structure=structure,
+        residual=round(amount * rng.choice([0, 0, 0.1, 0.37]), 2),
+        interest_rate=round(rng.uniform(0.5, 29.0), rng.choice([2, 3, 4])),
+    )
+    if rng.random() < 0.4:
+        kw['capitalise_fees'] = True
+        kw['custom_fees'] = [{'name': 'Raising Fee', 'type': 'Nominal Amount', 'amount': round(amount * 0.0123, 2)}]
+    if rng.random() < 0.3:
+        count = rng.randint(2, 6)
+        kw['drawdown_structure'] = "Multiple Drawdowns"
+        kw['drawdown_schedule'] = [
+            {'date': first + relativedelta(months=i * max(1, term // (2 * count)) - 1),
+             'amount': round(amount / count, 2)}
+            for i in range(count)
+        ]
+    if rng.random() < 0.3:
+        bands, start = [], 1
+        while start <= term:
+            end = term if rng.random() < 0.4 else min(term, start + rng.randrange(term))
+            prime = round(rng.uniform(6.0, 14.0), 3)
+            bands.append({'from_period': start, 'to_period': end, 'prime': prime, 'margin': 1.75,
+                          'total_rate': prime + 1.75})
+            start = end + 1
+        kw['rate_structure'] = "Variable Rate"
+        kw['rate_schedule'] = bands
+    if rng.random() < 0.3:
+        kw['custom_capital_schedule'] = [
+            {'date': first + relativedelta(months=m), 'amount': round(amount * rng.uniform(0.01, 0.3), 2)}
+            for m in sorted(rng.sample(range(term), min(term, 3)))
+        ]
+    if structure == "Structured Capital":
+        kw['structured_payments'] = [{'from_period': 1, 'to_period': term,
+                                      'payment': round(amount / term * rng.uniform(0.5, 1.3), 2)}]
+    if structure == "Capitalised Interest":
+        kw['capitalisation_months'] = rng.randint(0, term)
+    if rng.random() < 0.2 and structure != "Structured Capital":
+        kw['monthly_payment'] = round(amount / term * rng.uniform(0.2, 1.5), 2)
+    return Deal(**kw)
+
+
+def compare(reference, candidate):
+    """Names of the columns that differ at all, plus any difference in balance or warnings."""
+    diffs = [name for name, values in reference.columns.items()
+             if values.dtype != candidate.columns[name].dtype
+             or values.tobytes() != np.ascontiguousarray(candidate.columns[name]).tobytes()]
+    if reference.expected_final != candidate.expected_final:
+        diffs.append("expected_final")
+    if reference.warnings != candidate.warnings:
+        diffs.append("warnings")
+    return diffs
+
+
+def check(deal, jit):
+    """Differences between the two paths for ``deal``, in full and resumed at a few periods."""
+    compiled = compile_deal(deal)
+    payment = deal.monthly_payment
+    if payment is None:
+        payment = suggested_payment(deal, compiled) if deal.repayment_structure != "Structured Capital" else 0.0
+    reference = _generate_loop(compiled, payment)
+    diffs = [f"full: {name}" for name in compare(reference, _generate_jit(compiled, payment, jit=jit))]
+    ending = reference.columns["Ending Balance"]
+    for start in sorted({1, deal.term_months // 2, deal.term_months - 1} - {0}):
+        if start >= deal.term_months:
+            continue
+        opening = ending[start - 1].item()
+        resumed = compare(_generate_loop(compiled, payment, start, opening),
+                          _generate_jit(compiled, payment, start, opening, jit=jit))
+        diffs += [f"from period {start + 1}: {name}" for name in resumed]
+    return diffs
+
+
+# ───────────────────────────────────────────────────────────────
+# REGENERATE
+# ───────────────────────────────────────────────────────────────
+CONVENTIONS = [("Monthly", "Float"), ("Act/365F", "Float"), ("Monthly", "Half Even"), ("30/360", "Half Up")]
+
+
+def _shift_last_band(deal):
+    if deal.rate_structure != "Variable Rate":
+        return replace(deal, interest_rate=deal.interest_rate + 0.5)
+    band = deal.rate_schedule[-1]
+    bands = deal.rate_schedule[:-1] + [{**band, 'margin': band['margin'] + 0.5, 'total_rate': band['total_rate'] + 0.5}]
+    return replace(deal, rate_schedule=bands)
+
+
+def _add_custom_capital(deal):
+    extra = {'date': deal.first_payment_date + relativedelta(months=deal.term_months // 2), 'amount': 1_000_000.0}
+    return replace(deal, custom_capital_schedule=(deal.custom_capital_schedule or []) + [extra])
+
+
+def _grow_last_drawdown(deal):
+    if deal.drawdown_structure != "Multiple Drawdowns" or not deal.drawdown_schedule:
+        return None
+    last = deal.drawdown_schedule[-1]
+    return replace(deal, drawdown_schedule=deal.drawdown_schedule[:-1] + [{**last, 'amount': last['amount'] + 1_000_000.0}])
+
+
+def _scale_structured(deal):
+    if deal.repayment_structure != "Structured Capital" or not deal.structured_payments:
+        return None
+    last = deal.structured_payments[-1]
+    return replace(deal, structured_payments=deal.structured_payments[:-1] + [{**last, 'payment': round(last['payment'] * 1.3, 2)}])
+
+
+def _capitalisation(months):
+    def edit(deal):
+        if deal.repayment_structure != "Capitalised Interest" or deal.capitalisation_months == months:
+            return None
+        return replace(deal, capitalisation_months=min(months, deal.term_months))
+    return edit
+
+
+# Edits applied to every deal they fit; None means the edit does not apply
+EDITS = {
+    "rate": _shift_last_band,
+    "custom capital": _add_custom_capital,
+    "drawdown": _grow_last_drawdown,
+    "structured payment": _scale_structured,
+    "capitalisation to 0": _capitalisation(0),
+    "capitalisation to 1": _capitalisation(1),
+    "residual": lambda deal: replace(deal, residual=deal.residual + 1_000.0),
+    "installment": lambda deal: None if deal.repayment_structure == "Structured Capital"
+    else replace(deal, monthly_payment=round(deal.full_capital / deal.term_months, 2)),
+}
+
+
+def check_regenerate(deal, edited):
+    """Differences between ``regenerate`` from ``deal``'s schedule and pricing ``edited`` in full."""
+    old_compiled = compile_deal(deal)
+    previous = generate_schedule(deal, compiled=old_compiled)
+    compiled = compile_deal(edited)
+    full = generate_schedule(edited, compiled=compiled)
+    resumed, _ = regenerate(previous, old_compiled, edited, compiled)
+    diffs = compare(full, resumed)
+    if full.monthly_payment != resumed.monthly_payment:
+        diffs.append("monthly_payment")
+    return diffs
+
+
+def check_edits(deal, rng):
+    """``check_regenerate`` for every edit that fits ``deal``, under a random convention (and with and
+    without a fixed installment)."""
+    day_count, rounding = rng.choice(CONVENTIONS)
+    diffs = []
+    for base in (deal, replace(deal, monthly_payment=None)):
+        base = replace(base, day_count=day_count, rounding=rounding)
+        for name, edit in EDITS.items():
+            edited = edit(base)
+            if edited is None:
+                continue
+            try:
+                found = check_regenerate(base, edited)
+            except DealError:
+                continue
+            diffs += [f"{name} ({day_count}, {rounding}): {column}" for column in found]
+    return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the compiled period loop against the reference loop.")
+    parser.add_argument("--random", type=int, default=1000, help="random deals on top of the benchmark cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--python", action="store_true", help="run the kernel in Python even if Numba is installed")
+    args = parser.parse_args(argv)
+
+    jit = loop_kernel.NUMBA_INSTALLED and not args.python
+    print(f"Kernel: {'compiled with Numba' if jit else 'pure Python'}")
+    start = time.perf_counter()
+    if jit:
+        loop_kernel.compiled_loop()  # compile (or load from the cache) before timing anything
+
+    rng = random.Random(args.seed)
+    # Both loops are the monthly, float engine; the daily and cents cases never reach them
+    deals = [(cid, deal) for cid, deal in ((cid, build_deal(*params)) for cid, params in cases())
+             if deal.day_count == "Monthly" and deal.rounding == "Float"]
+    deals += [(f"random #{i}", random_deal(rng)) for i in range(args.random)]
+    failures = 0
+    for name, deal in deals:
+        diffs = check(deal, jit)
+        if diffs:
+            failures += 1
+            print(f"  {name}: {', '.join(diffs)}")
+    print(f"Parity: {len(deals) - failures}/{len(deals)} deals identical in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    edit_failures = 0
+    for name, deal in deals:
+        diffs = check_edits(deal, rng)
+        if diffs:
+            edit_failures += 1
+            print(f"  {name}: {', '.join(diffs)}")
+    print(f"Regenerate: {len(deals) - edit_failures}/{len(deals)} deals match a full recompute after every edit "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failures or edit_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
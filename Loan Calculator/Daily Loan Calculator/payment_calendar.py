@@ -0,0 +1,128 @@
+"""Payment-date calendar: month-end rules, business-day rolls and holidays.
+
+The whole grid of payment dates is built as one ``datetime64[D]`` array:
+
+    payment_dates(date(2025, 1, 31), 12, month_end="Month End",
+                  business_day="Modified Following", holidays="South Africa")
+
+The South African calendar is the Public Holidays Act list (Easter from the
+Gregorian computus, a Sunday holiday moves to the Monday), generated
+locally and built into a ``np.busdaycalendar`` once per process.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# How each payment's day of month follows from the first payment date
+MONTH_END_RULES = ["Add Month", "Anchor Day", "Month End"]
+BUSINESS_DAY_CONVENTIONS = {
+    "Unadjusted": None,
+    "Following": "following",
+    "Modified Following": "modifiedfollowing",
+    "Preceding": "preceding",
+}
+HOLIDAY_CALENDARS = ["None", "South Africa"]
+
+CALENDAR_YEARS = range(1995, 2151)
+
+
+# ───────────────────────────────────────────────────────────────
+# HOLIDAYS
+# ───────────────────────────────────────────────────────────────
+def easter_sunday(year):
+    """Gregorian Easter Sunday (the Meeus/Jones/Butcher computus)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def south_african_holidays(year):
+    """Statutory public holidays for ``year`` (ad hoc proclaimed days are not included)."""
+    fixed = [(1, 1), (3, 21), (4, 27), (5, 1), (6, 16), (8, 9), (9, 24), (12, 16), (12, 25), (12, 26)]
+    days = {date(year, month, day) for month, day in fixed}
+    # A public holiday on a Sunday is observed on the Monday
+    days |= {day + timedelta(days=1) for day in days if day.weekday() == 6}
+    easter = easter_sunday(year)
+    days |= {easter - timedelta(days=2), easter + timedelta(days=1)}  # Good Friday, Family Day
+    return sorted(days)
+
+
+@lru_cache(maxsize=None)
+def business_calendar(holidays="None"):
+    """Mon–Fri ``np.busdaycalendar`` with the named holidays, built once per process."""
+    if holidays == "None":
+        return np.busdaycalendar()
+    if holidays == "South Africa":
+        days = [day for year in CALENDAR_YEARS for day in south_african_holidays(year)]
+        return np.busdaycalendar(holidays=np.array(days, dtype="datetime64[D]"))
+    raise ValueError(f"Unknown holiday calendar {holidays!r}")
+
+
+# ───────────────────────────────────────────────────────────────
+# PAYMENT DATES
+# ───────────────────────────────────────────────────────────────
+def add_months(day, months):
+    """``day + relativedelta(months=months)``: the day is clipped to the target month's length."""
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, monthrange(year, month)[1]))
+
+
+def payment_months(first_payment_date, n):
+    """The ``datetime64[M]`` month of each of ``n`` payments; period k is in month k."""
+    return np.datetime64(first_payment_date.replace(day=1), "M") + np.arange(n)
+
+
+def period_of_month(months, dates):
+    """Index into ``months`` of the month each date falls in, by binary search.
+
+    Dates before the first month give 0 and dates after the last give
+    ``len(months)``; ``in_month`` tells those apart from an exact match.
+    """
+    wanted = np.array(dates, dtype="datetime64[D]").astype("datetime64[M]")
+    periods = np.searchsorted(months, wanted)
+    in_month = (periods < len(months)) & (months[np.minimum(periods, len(months) - 1)] == wanted)
+    return periods, in_month
+
+
+def unadjusted_dates(first_payment_date, n, month_end="Add Month"):
+    """``n`` monthly dates before any business-day roll.
+
+    ``Add Month`` matches repeated ``+= relativedelta(months=1)``: once a short
+    month clips the day (31 Jan -> 28 Feb) it stays clipped. ``Anchor Day``
+    keeps the first payment's day wherever the month is long enough, and
+    ``Month End`` pays on the last day of every month.
+    """
+    months = payment_months(first_payment_date, n)
+    month_days = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+    if month_end == "Add Month":
+        days = np.minimum.accumulate(np.minimum(month_days, first_payment_date.day))
+    elif month_end == "Anchor Day":
+        days = np.minimum(month_days, first_payment_date.day)
+    elif month_end == "Month End":
+        days = month_days
+    else:
+        raise ValueError(f"Unknown month-end rule {month_end!r}")
+    return months.astype("datetime64[D]") + (days - 1)
+
+
+def adjust(dates, business_day="Unadjusted", holidays="None"):
+    """Roll ``dates`` onto business days under ``business_day``."""
+    roll = BUSINESS_DAY_CONVENTIONS[business_day]
+    if roll is None:
+        return dates
+    return np.busday_offset(dates, 0, roll=roll, busdaycal=business_calendar(holidays))
+
+
+def payment_dates(first_payment_date, n, month_end="Add Month", business_day="Unadjusted", holidays="None"):
+    """``n`` monthly payment dates (``datetime64[D]``) after the month-end rule and business-day roll."""
+    return adjust(unadjusted_dates(first_payment_date, n, month_end), business_day, holidays)
@@ -0,0 +1,167 @@
+"""Memoised schedules shared across Streamlit reruns and sessions.
+
+Every widget change reruns the page, and each Generate click used to
+rebuild the schedule, its DataFrame and the workbook from scratch. Results
+are now kept under ``deal_key(deal)`` in two bounded LRUs: a small one per
+browser session and a process-wide one shared by everyone on the server,
+so identical deals priced by different analysts are only computed once.
+
+A deal that misses both caches is usually an edit of the session's last
+one, so it is priced with ``regenerate``: periods before the first one the
+edit touches are copied from the last schedule and only the rest is rerun.
+Deals saved to a ``deal_store.DealStore`` are read back rather than priced.
+
+Each entry keeps a few cheap artifacts derived from its schedule (the
+DataFrame, analytics, settlement quotes). Heavy ones (export bytes,
+sensitivity grids, Monte Carlo runs, structure comparisons) are not pinned
+to the shared entries: ``session_artifact`` keeps them in a small LRU of the
+session's own, freed with the session.
+"""
+import threading
+from collections import OrderedDict
+
+from amortisation import compile_deal, deal_key, generate_schedule, regenerate, summarise
+from analytics import analyse
+from instrumentation import phase
+
+SESSION_ENTRIES = 16
+PROCESS_ENTRIES = 256
+ENTRY_ARTIFACTS = 8  # cheap derived artifacts kept per cached deal
+SESSION_ARTIFACTS = 8  # heavy results (exports, grids, simulations) kept per session
+
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used entry when full."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def latest(self):
+        """The most recently used value, or ``None`` when empty."""
+        with self._lock:
+            return next(reversed(self._entries.values()), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class CachedResult:
+    """A priced deal plus everything derived from it, built at most once."""
+
+    def __init__(self, deal, schedule, compiled=None, reused_periods=0):
+        self.deal = deal
+        self.schedule = schedule
+        self.compiled = compiled
+        self.reused_periods = reused_periods  # leading periods copied from an earlier schedule
+        with phase("summary"):
+            self.summary = summarise(schedule.columns)
+        self._artifacts = LRUCache(ENTRY_ARTIFACTS)
+        self._lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """The schedule as a DataFrame, built (and pandas imported) on first use."""
+        return self.artifact("frame", self._build_frame)
+
+    @property
+    def analytics(self):
+        """XIRR, effective rate, WAL and durations (``analytics.ANALYTICS_FIELDS``)."""
+        return self.artifact("analytics", lambda: analyse([(self.deal, self.schedule)])[0])
+
+    def _build_frame(self):
+        with phase("dataframe"):
+            return self.schedule.to_frame()
+
+    def artifact(self, name, build):
+        """Return the artifact ``name`` (e.g. settlement quotes), building it on first use.
+
+        Only the ``ENTRY_ARTIFACTS`` most recently used are kept; anything
+        large belongs in ``session_artifact`` instead.
+        """
+        with self._lock:
+            value = self._artifacts.get(name)
+            if value is None:
+                value = build()
+                self._artifacts.put(name, value)
+            return value
+
+
+_process_cache = LRUCache(PROCESS_ENTRIES)
+
+
+def session_cache(state):
+    """The per-session LRU kept in ``st.session_state`` (or any mapping)."""
+    if "schedule_cache" not in state:
+        state["schedule_cache"] = LRUCache(SESSION_ENTRIES)
+    return state["schedule_cache"]
+
+
+def session_artifact(state, key, build):
+    """``build()`` memoised under ``key`` in the session's own LRU (in ``st.session_state`` or any mapping).
+
+    For results too large to pin to an entry every session shares; ``key``
+    must identify the deal as well as the inputs.
+    """
+    if "artifact_cache" not in state:
+        state["artifact_cache"] = LRUCache(SESSION_ARTIFACTS)
+    cache = state["artifact_cache"]
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.put(key, value)
+    return value
+
+
+def _compute(deal, base=None, compiled=None):
+    """Price ``deal``, resuming from ``base`` (an earlier ``CachedResult``) where possible."""
+    if compiled is None:
+        compiled = compile_deal(deal)
+    if base is None or base.compiled is None:
+        return CachedResult(deal, generate_schedule(deal, compiled=compiled), compiled)
+    schedule, reused = regenerate(base.schedule, base.compiled, deal, compiled)
+    return CachedResult(deal, schedule, compiled, reused)
+
+
+def get_or_compute(deal, session=None, key=None, compiled=None, store=None):
+    """Cached result for ``deal``: session LRU, process LRU, saved deals (``store``), then the engine.
+
+    On a miss the engine resumes from the session's most recent result.
+    """
+    key = key or deal_key(deal)
+    if session is not None:
+        result = session.get(key)
+        if result is not None:
+            return result
+    result = _process_cache.get(key)
+    if result is None:
+        schedule = store.load_schedule(key) if store is not None else None
+        if schedule is not None:
+            result = CachedResult(deal, schedule)
+        else:
+            result = _compute(deal, session.latest() if session is not None else None, compiled)
+        _process_cache.put(key, result)
+    if session is not None:
+        session.put(key, result)
+    return result
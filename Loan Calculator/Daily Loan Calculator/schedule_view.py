@@ -0,0 +1,68 @@
+"""Paginated schedule table for the Streamlit page.
+
+Styling the whole DataFrame with ``df.style.format`` formatted every cell of
+the schedule on every rerun and shipped all of it to the browser. The table
+now keeps numeric columns and formats them client-side through column
+configs, and only sends one page of periods at a time.
+"""
+import numpy as np
+import streamlit as st
+
+from amortisation import MONEY_COLUMNS
+from instrumentation import phase
+
+PAGE_SIZES = [12, 60, 120, 360, "All"]
+
+COLUMN_CONFIG = {
+    **{name: st.column_config.NumberColumn(name, format="R%,.2f") for name in MONEY_COLUMNS},
+    "Interest Rate %": st.column_config.NumberColumn("Interest Rate %", format="%.4f%%"),
+    "Period": st.column_config.NumberColumn("Period", format="%d"),
+    "Payment Date": st.column_config.DateColumn("Payment Date", format="YYYY-MM-DD"),
+}
+
+
+def page_bounds(n_rows, page_size, page):
+    """Row slice ``(start, stop)`` for a 1-based ``page``."""
+    if page_size == "All":
+        return 0, n_rows
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows)
+
+
+def period_index(payment_dates, when):
+    """Row of the first payment on or after ``when`` (``payment_dates`` is ``datetime64[D]``)."""
+    return min(int(np.searchsorted(payment_dates, np.datetime64(when, "D"))), len(payment_dates) - 1)
+
+
+def render_schedule(result, key="schedule"):
+    """Show ``result.frame`` one page at a time, with a jump-to-date control."""
+    df = result.frame
+    payment_dates = result.schedule.columns["Payment Date"]
+    page_key, jump_key = f"{key}_page", f"{key}_last_jump"
+
+    size_col, page_col, date_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=2, key=f"{key}_page_size")
+    pages = 1 if page_size == "All" else max(1, -(-len(df) // page_size))
+
+    with date_col:
+        jump = st.date_input("Jump to payment date", value=None, key=f"{key}_jump")
+    if jump is not None and jump != st.session_state.get(jump_key) and page_size != "All":
+        st.session_state[page_key] = period_index(payment_dates, jump) // page_size + 1
+    st.session_state[jump_key] = jump
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    with page_col:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start, stop = page_bounds(len(df), page_size, page)
+    with phase("table"):
+        st.dataframe(
+            df.iloc[start:stop],
+            column_config=COLUMN_CONFIG,
+            hide_index=True,
+            use_container_width=True,
+            height=650,
+        )
+    st.caption(f"Periods {start + 1}–{stop} of {len(df)}")
@@ -0,0 +1,102 @@
+"""Rate / margin / term sensitivity grids for one deal.
+
+Every cell shifts the deal's rates by a prime shock plus a margin change
+(in basis points, across every rate period) and, optionally, changes the
+term. The deal is compiled once per term, up front, and each rate cell only
+swaps shifted rate arrays into its term's compiled deal, so a cell costs one
+engine run. Rows of the grid (one term and one prime shock each) are spread
+over a process pool.
+
+    rows = sensitivity_grid(deal, rate_shocks=range(-300, 301, 50), terms=[60, 120])
+"""
+import os
+from dataclasses import replace
+from multiprocessing import Pool
+
+from amortisation import compile_deal, run_compiled, suggested_payment
+
+GRID_COLUMNS = [
+    "Term (Months)", "Prime Shock (bp)", "Margin Change (bp)", "Rate %",
+    "Installment", "Total Interest", "Final Balance",
+]
+GRID_METRICS = ["Installment", "Total Interest", "Final Balance"]
+
+
+def shift_rates(deal, shift_bp, prime_bp=0, margin_bp=0):
+    """``deal`` with every rate moved by ``shift_bp`` basis points.
+
+    Variable-rate bands keep their prime / margin split: ``prime_bp`` and
+    ``margin_bp`` are added to each, ``shift_bp`` is their sum.
+    """
+    if deal.rate_structure == "Variable Rate" and deal.rate_schedule:
+        bands = [{
+            **band,
+            'prime': band['prime'] + prime_bp / 100,
+            'margin': band['margin'] + margin_bp / 100,
+            'total_rate': band['total_rate'] + shift_bp / 100,
+        } for band in deal.rate_schedule]
+        return replace(deal, rate_schedule=bands, interest_rate=bands[0]['total_rate'])
+    return replace(deal, interest_rate=deal.interest_rate + shift_bp / 100)
+
+
+def _compile_term(deal, term):
+    """``compile_deal`` for ``deal`` over ``term`` months (capitalisation capped at the term)."""
+    return compile_deal(replace(deal, term_months=term, capitalisation_months=min(deal.capitalisation_months, term)))
+
+
+def _price_row(task):
+    """Price one grid row: a compiled term and a prime shock across every margin change."""
+    compiled, shock, margin_changes = task
+    term_deal = compiled.deal
+    term = term_deal.term_months
+
+    rows = []
+    for margin in margin_changes:
+        shift = shock + margin
+        cell_deal = shift_rates(term_deal, shift, shock, margin)
+        cell = replace(compiled, deal=cell_deal, rates=compiled.rates + shift / 100)
+        monthly_payment = cell_deal.monthly_payment
+        if monthly_payment is None:
+            monthly_payment = suggested_payment(cell_deal, cell) if term_deal.repayment_structure != "Structured Capital" else 0.0
+        schedule = run_compiled(cell, monthly_payment)
+        rows.append({
+            "Term (Months)": term,
+            "Prime Shock (bp)": shock,
+            "Margin Change (bp)": margin,
+            "Rate %": round(cell_deal.base_rate, 4),
+            "Installment": schedule.monthly_payment,
+            "Total Interest": round(float(schedule.columns["Interest"].sum()), 2),
+            "Final Balance": schedule.final_balance,
+        })
+    return rows
+
+
+def sensitivity_grid(deal, rate_shocks=range(-300, 301, 100), margin_changes=(0,), terms=None, workers=None):
+    """Price every (term, prime shock, margin change) cell of the grid.
+
+    ``terms`` defaults to the deal's own term. A deal with a fixed
+    ``monthly_payment`` keeps it in every cell (so the final balance shows
+    the shortfall); otherwise each cell gets its own suggested payment.
+    Returns one dict per cell, keyed by ``GRID_COLUMNS``, in grid order.
+    ``workers=1`` prices in-process.
+    """
+    terms = [int(term) for term in (terms or [deal.term_months])]
+    compiled = {term: _compile_term(deal, term) for term in dict.fromkeys(terms)}
+    margin_changes = [int(m) for m in margin_changes]
+    tasks = [(compiled[term], int(shock), margin_changes) for term in terms for shock in rate_shocks]
+    workers = min(workers or os.cpu_count(), len(tasks))
+    if workers <= 1:
+        results = map(_price_row, tasks)
+    else:
+        with Pool(processes=workers) as pool:
+            results = pool.map(_price_row, tasks, chunksize=1)
+    return [row for rows in results for row in rows]
+
+
+def grid_pivot(rows, metric):
+    """``metric`` as a prime-shock x (term, margin change) table for a heatmap."""
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=GRID_COLUMNS)
+    return df.pivot_table(index="Prime Shock (bp)", columns=["Term (Months)", "Margin Change (bp)"],
+                          values=metric, sort=True)
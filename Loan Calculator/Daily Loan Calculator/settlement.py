@@ -0,0 +1,69 @@
+"""Early-settlement quotes for every period of a priced schedule.
+
+Settling on period N's payment date means paying that period's installment
+plus the balance left after it; everything scheduled from period N + 1 on
+(later installments, custom capital, drawdowns and the residual at
+maturity) falls away. All quotes come from suffix sums over the existing
+schedule in one O(term) pass, with no rerun per settlement date:
+
+    rows = settlement_quotes(schedule, rate_shift_bp=-100)
+
+Breakage is the lender's make-whole loss: the value of the cancelled cash
+flows, discounted monthly at a replacement rate (each period's rate plus
+``rate_shift_bp``), less the balance repaid, floored at zero. Variable-rate
+deals discount each period at its own rate.
+"""
+import numpy as np
+
+SETTLEMENT_COLUMNS = [
+    "Period", "Payment Date", "Outstanding Balance", "Settlement Amount", "Remaining Payments",
+    "Interest Saved", "Breakage", "Total Payoff", "Net Saving",
+]
+
+
+def settlement_quotes(schedule, rate_shift_bp=0):
+    """One dict per period (keyed by ``SETTLEMENT_COLUMNS``) for settling on that payment date."""
+    columns = schedule.columns
+    n = len(schedule)
+    if not n:
+        return []
+    balance = columns["Ending Balance"]
+    payments = columns["Total Payment"].copy()
+    payments[-1] += balance[-1]  # whatever is left is repaid at maturity
+    # Cash the lender would still receive after each period, net of the drawdowns it would still fund
+    flows = payments - columns["Drawdown"]
+
+    def after(values):
+        """``after(v)[k]`` = sum of ``v`` over the periods after period k + 1."""
+        suffix = np.zeros(n + 1)
+        suffix[:n] = np.cumsum(values[::-1])[::-1]
+        return suffix[1:]
+
+    # Replacement discount factors to each payment date: PV of the flows after period k, valued at k
+    growth = 1 + (columns["Interest Rate %"] + rate_shift_bp / 100) / 100 / 12
+    discount = np.cumprod(1 / growth)
+    value_after = after(flows * discount) / discount
+
+    remaining = after(payments)
+    interest_saved = after(columns["Interest"])
+    breakage = np.maximum(value_after - balance, 0.0)
+    settlement = columns["Total Payment"] + balance
+    dates = np.datetime_as_string(columns["Payment Date"], unit="D")
+
+    return [
+        {
+            "Period": period,
+            "Payment Date": day,
+            "Outstanding Balance": round(owed, 2),
+            "Settlement Amount": round(amount, 2),
+            "Remaining Payments": round(left, 2),
+            "Interest Saved": round(saved, 2),
+            "Breakage": round(cost, 2),
+            "Total Payoff": round(amount + cost, 2),
+            "Net Saving": round(saved - cost, 2),
+        }
+        for period, day, owed, amount, left, saved, cost in zip(
+            columns["Period"].tolist(), dates.tolist(), balance.tolist(), settlement.tolist(),
+            remaining.tolist(), interest_saved.tolist(), breakage.tolist(),
+        )
+    ]